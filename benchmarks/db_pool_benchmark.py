@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+データベース接続方式のベンチマーク
+
+単一接続モードとWAL接続プールモードを、読み取りと書き込みが
+混在する負荷で比較します。
+
+使用例:
+    python benchmarks/db_pool_benchmark.py --duration 10 --readers 8 --writers 2
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.database import Database
+
+GUILD_COUNT = 20
+
+async def _seed(db: Database, rows: int):
+    """ベンチマーク用の初期データを投入"""
+    for i in range(rows):
+        guild_id = i % GUILD_COUNT
+        await db.add_reaction_role(guild_id, 1, i, "👍", 1000 + i)
+        await db.add_sub_role(guild_id, 2000 + i, f"role-{i}")
+        await db.add_log_event(guild_id, "message_delete", i, 1, i, f"seed message {i}")
+    await db.flush_log_events()
+
+async def _reader(db: Database, stop_at: float, latencies: List[float]):
+    """読み取り負荷"""
+    while time.perf_counter() < stop_at:
+        guild_id = random.randrange(GUILD_COUNT)
+        started = time.perf_counter()
+        choice = random.random()
+        if choice < 0.4:
+            await db.get_all_reaction_roles(guild_id)
+        elif choice < 0.7:
+            await db.get_sub_roles(guild_id)
+        else:
+            await db.get_log_events(guild_id, limit=50)
+        latencies.append(time.perf_counter() - started)
+
+async def _writer(db: Database, stop_at: float, latencies: List[float]):
+    """書き込み負荷"""
+    counter = 0
+    while time.perf_counter() < stop_at:
+        guild_id = random.randrange(GUILD_COUNT)
+        started = time.perf_counter()
+        if counter % 2:
+            await db.add_reaction_role(guild_id, 1, 10_000_000 + counter, "🎮", 1)
+        else:
+            await db.cleanup_old_logs(guild_id, 30)
+        latencies.append(time.perf_counter() - started)
+        counter += 1
+
+def _summarize(latencies: List[float], duration: float) -> Dict[str, Any]:
+    """レイテンシの集計"""
+    if not latencies:
+        return {"ops": 0, "ops_per_sec": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": len(ordered) / duration,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[int(len(ordered) * 0.95) - 1] * 1000
+    }
+
+async def run_mode(label: str, args: argparse.Namespace, **db_kwargs) -> Dict[str, Any]:
+    """1つの接続方式でベンチマークを実行"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(str(Path(tmpdir) / "bench.db"), **db_kwargs)
+        await db.initialize()
+        await _seed(db, args.seed_rows)
+
+        read_latencies: List[float] = []
+        write_latencies: List[float] = []
+        stop_at = time.perf_counter() + args.duration
+
+        tasks = [_reader(db, stop_at, read_latencies) for _ in range(args.readers)]
+        tasks += [_writer(db, stop_at, write_latencies) for _ in range(args.writers)]
+        await asyncio.gather(*tasks)
+        await db.close()
+
+    return {
+        "mode": label,
+        "read": _summarize(read_latencies, args.duration),
+        "write": _summarize(write_latencies, args.duration)
+    }
+
+def _print_result(result: Dict[str, Any]):
+    """結果を表示"""
+    print(f"[{result['mode']}]")
+    for kind in ("read", "write"):
+        stats = result[kind]
+        print(
+            f"  {kind:5}: {stats['ops']:7d} ops "
+            f"({stats['ops_per_sec']:9.1f}/s)  "
+            f"p50={stats['p50_ms']:7.2f}ms  p95={stats['p95_ms']:7.2f}ms"
+        )
+
+async def main():
+    parser = argparse.ArgumentParser(description="単一接続とWAL接続プールの比較ベンチマーク")
+    parser.add_argument("--duration", type=float, default=5.0, help="各モードの計測秒数")
+    parser.add_argument("--readers", type=int, default=8, help="並行する読み取りタスク数")
+    parser.add_argument("--writers", type=int, default=2, help="並行する書き込みタスク数")
+    parser.add_argument("--pool-size", type=int, default=4, help="プールモードの読み取り接続数")
+    parser.add_argument("--seed-rows", type=int, default=2000, help="初期データの件数")
+    args = parser.parse_args()
+
+    results = [
+        await run_mode("single", args),
+        await run_mode(f"pool({args.pool_size})", args, pool_size=args.pool_size)
+    ]
+    for result in results:
+        _print_result(result)
+
+if __name__ == "__main__":
+    asyncio.run(main())
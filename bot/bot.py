@@ -9,6 +9,7 @@ import asyncio
 
 from database.database import Database
 from utils.logger import get_logger
+from utils.role_coalescer import RoleChangeCoalescer
 
 class DiscordManagementBot(commands.Bot):
     """Discord管理Botのメインクラス"""
@@ -32,7 +33,26 @@ class DiscordManagementBot(commands.Bot):
         )
         
         # データベースの初期化
-        self.db = Database(config.get('database_url', 'discord_bot.db'))
+        db_config = config.get('database') or {}
+        self.db = Database(
+            config.get('database_url', 'discord_bot.db'),
+            log_batch_size=db_config.get('log_batch_size', 100),
+            log_flush_interval=db_config.get('log_flush_interval', 1.0),
+            log_queue_size=db_config.get('log_queue_size', 10000),
+            pool_size=db_config.get('pool_size', 0),
+            pragmas=db_config.get('pragmas'),
+            log_partition=db_config.get('log_partition', 'day'),
+            log_cleanup_chunk_size=db_config.get('log_cleanup_chunk_size', 500),
+            log_archive_dir=db_config.get('log_archive_dir')
+        )
+        
+        # メンバーのロール変更（リアクションロール・ロールパネル）は1つのまとめ役を共有し、
+        # 同じメンバーへの変更が互いに上書きしないようにする
+        rr_config = config.get('reaction_roles', {})
+        self.role_changes = RoleChangeCoalescer(
+            window=rr_config.get('coalesce_window', 1.5),
+            max_delay=rr_config.get('coalesce_max_delay', 5.0)
+        )
     
     async def setup_hook(self):
         """Bot起動時のセットアップ"""
@@ -47,6 +67,7 @@ class DiscordManagementBot(commands.Bot):
                 'cogs.setup',
                 'cogs.role_management',
                 'cogs.reaction_roles',
+                'cogs.role_panels',
                 'cogs.template',
                 'cogs.logging'
             ]
@@ -83,6 +104,11 @@ class DiscordManagementBot(commands.Bot):
         )
         await self.change_presence(activity=activity)
     
+    async def on_guild_remove(self, guild: discord.Guild):
+        """サーバーから退出した時のイベント"""
+        self.db.evict_guild_cache(guild.id)
+        self.logger.info(f"サーバー '{guild.name}' から退出しました")
+    
     async def on_error(self, event_method, *args, **kwargs):
         """エラーハンドリング"""
         self.logger.error(f"イベント '{event_method}' でエラーが発生", exc_info=True)
@@ -101,6 +127,8 @@ class DiscordManagementBot(commands.Bot):
     async def close(self):
         """Bot終了時のクリーンアップ"""
         self.logger.info("Bot を終了しています...")
+        # 書き込み待ちのログイベントを保存してから接続を閉じる
+        await self.db.flush_log_events()
         await self.db.close()
         await super().close()
     
@@ -4,176 +4,642 @@
 
 import discord
 from discord.ext import commands, tasks
-from typing import Optional
+from discord import app_commands
+from typing import Optional, Dict, FrozenSet, Set, Callable, Awaitable
+from dataclasses import dataclass
+from collections import OrderedDict
+import asyncio
+import io
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from database.partitions import utc_now, format_timestamp, TIMESTAMP_FORMAT
+from database.search import MIN_TERM_LENGTH
+from database.message_store import PersistentMessageStore
 
 from utils.helpers import create_embed, format_user, format_channel, truncate_text
 from utils.logger import get_logger
+from utils.log_delivery import LogDeliveryQueue
+from utils.message_cache import MessageContentCache, CachedMessage
+from utils.text_diff import word_diff, inserted_text, render_diff
+from utils.audit_log import AuditLogEnricher, AuditActor
+from utils.raid_mode import RaidDetector, RaidJoin, RaidState
+from utils.log_export import LogExportWriter, ExportPart
+
+# /logs search の1ページあたりの件数
+SEARCH_PAGE_SIZE = 10
+
+# /logs stats の棒グラフの最大幅
+STATS_BAR_WIDTH = 20
+
+# 配信キューで他より先に送るイベント
+PRIORITY_EVENTS = frozenset({'member_ban', 'member_unban', 'role_update'})
+
+# 元の本文を保存済みのメッセージIDを覚えておく件数
+EDIT_BASE_HISTORY = 10000
+
+@dataclass(frozen=True)
+class LoggingPolicy:
+    """ギルドのログ設定をイベントごとの判定用に変換したもの"""
+    enabled: bool
+    events: FrozenSet[str]
+    channel_id: Optional[int]
+    auto_delete_days: int
+
+@dataclass
+class PendingEdit:
+    """まとめて記録するまで保留している編集"""
+    guild_id: int
+    message: CachedMessage
+    original: str
+    latest: str
+    edits: int = 1
+    task: Optional[asyncio.Task] = None
 
 class LoggingCog(commands.Cog):
     """ログ機能"""
     
+    logs_group = app_commands.Group(name="logs", description="記録されたログを検索します")
+    
     def __init__(self, bot):
         self.bot = bot
         self.logger = get_logger(__name__)
+        
+        # ギルドID -> コンパイル済みのログ設定
+        # （設定の変更はチャンネルの作成・削除・名前変更、ギルドからの退出、
+        # config_reload イベントでのみ反映される。bot.config を差し替えた場合は
+        # bot.dispatch('config_reload') で通知すること）
+        self._policies: Dict[int, LoggingPolicy] = {}
+        
+        # ログチャンネルへの送信はチャンネルごとにまとめて行う
+        delivery_window = bot.config.get('logging', {}).get('delivery_window', 1.0)
+        self.delivery = LogDeliveryQueue(window=delivery_window)
+        
+        # 削除・編集のログ用のメッセージ内容キャッシュ
+        cache_config = bot.config.get('logging', {}).get('message_cache') or {}
+        self.message_cache = MessageContentCache(
+            max_bytes=cache_config.get('max_bytes', 32 * 1024 * 1024),
+            compress=cache_config.get('compress', True)
+        )
+        
+        # 再起動前のメッセージ用のディスク上のストア（任意）
+        store_config = bot.config.get('logging', {}).get('message_store') or {}
+        self.message_store: Optional[PersistentMessageStore] = None
+        if store_config.get('enabled', False):
+            self.message_store = PersistentMessageStore(
+                store_config.get('path', 'message_store.db'),
+                ttl_days=store_config.get('ttl_days', 7),
+                max_bytes=store_config.get('max_bytes', 256 * 1024 * 1024)
+            )
+        
+        # 実行者の補完に使う監査ログ（ギルドごとに一定間隔でまとめて取得）
+        self.audit = AuditLogEnricher(window=bot.config.get('logging', {}).get('audit_log_window', 5.0))
+        # 実行者の確認待ちのログ（イベントは先に記録し、分かった時点で実行者を追加して送信）
+        self._audit_tasks: Set[asyncio.Task] = set()
+        
+        # 連続した編集をまとめる秒数と、保留中の編集
+        self.edit_coalesce_window = max(0.0, bot.config.get('logging', {}).get('edit_coalesce_window', 10.0))
+        self._pending_edits: Dict[int, PendingEdit] = {}
+        # 編集ログに元の本文を保存済みのメッセージ（以降の編集は差分だけを保存）
+        self._edit_bases: "OrderedDict[int, None]" = OrderedDict()
+        
+        # 参加の急増を検知したら個別のログをやめて要約にまとめる
+        raid_config = bot.config.get('logging', {}).get('raid_mode') or {}
+        self.raid: Optional[RaidDetector] = None
+        self.raid_new_account_days = raid_config.get('new_account_days', 7)
+        if raid_config.get('enabled', True):
+            self.raid = RaidDetector(
+                threshold=raid_config.get('join_threshold', 10),
+                window=raid_config.get('window_seconds', 10),
+                quiet=raid_config.get('quiet_seconds', 60)
+            )
+            self.raid_summary.change_interval(seconds=max(5, raid_config.get('summary_interval', 30)))
+            self.raid_summary.start()
+        
         self.cleanup_logs.start()  # 定期的なログクリーンアップを開始
+        self.report_delivery_metrics.start()
     
-    def cog_unload(self):
+    async def cog_load(self):
+        """Cog読み込み時の処理"""
+        if self.message_store:
+            await self.message_store.open()
+            self.compact_message_store.start()
+    
+    async def cog_unload(self):
         """Cog終了時の処理"""
         self.cleanup_logs.cancel()
+        self.report_delivery_metrics.cancel()
+        # 保留中の編集・実行者の確認待ち・レイド中の参加と送信待ちのログを送ってから終了
+        for message_id in list(self._pending_edits):
+            await self._flush_edit(message_id)
+        if self._audit_tasks:
+            await asyncio.gather(*self._audit_tasks, return_exceptions=True)
+        if self.raid:
+            self.raid_summary.cancel()
+            for guild_id, state in list(self.raid.raids.items()):
+                guild = self.bot.get_guild(guild_id)
+                if guild and state.pending:
+                    await self._flush_raid(guild, state)
+        await self.delivery.close()
+        
+        if self.message_store:
+            self.compact_message_store.cancel()
+            await self.message_store.close()
     
-    def _is_logging_enabled(self, guild_id: int) -> bool:
-        """ロギングが有効かどうかを確認"""
-        config = self.bot.get_guild_config(guild_id)
-        return config.get('logging', {}).get('enabled', False)
+    def _deliver(self, log_channel: discord.TextChannel, embed: discord.Embed, event_type: str):
+        """ログメッセージを配信キューに追加"""
+        self.delivery.enqueue(log_channel, embed, priority=event_type in PRIORITY_EVENTS)
     
-    def _get_log_channel(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
-        """ログチャンネルを取得"""
-        config = self.bot.get_guild_config(guild.id)
-        log_channel_name = config.get('logging', {}).get('log_channel')
+    def _after_audit(self, guild: discord.Guild, action: discord.AuditLogAction, target_id: int,
+                     finish: Callable[[Optional[AuditActor]], Awaitable[None]],
+                     channel_id: Optional[int] = None):
+        """監査ログの取得を待たずに戻り、実行者が分かった時点で finish(actor) を実行"""
+        async def resolve():
+            try:
+                actor = await self.audit.find_actor(guild, action, target_id, channel_id)
+            except Exception as e:
+                self.logger.error(f"監査ログの実行者取得エラー: {e}")
+                actor = None
+            try:
+                await finish(actor)
+            except Exception as e:
+                self.logger.error(f"実行者付きログの送信エラー: {e}")
         
-        if not log_channel_name:
-            return None
+        task = asyncio.create_task(resolve())
+        self._audit_tasks.add(task)
+        task.add_done_callback(self._audit_tasks.discard)
+    
+    def _add_actor_field(self, embed: discord.Embed, actor: Optional[AuditActor], name: str = "実行者"):
+        """監査ログから分かった実行者をEmbedに追加"""
+        if actor is None:
+            return
         
-        return discord.utils.get(guild.text_channels, name=log_channel_name)
+        value = f"<@{actor.user_id}> ({actor.name})"
+        if actor.reason:
+            value += f"\n理由: {truncate_text(actor.reason, 200)}"
+        embed.add_field(name=name, value=value, inline=False)
     
-    def _should_log_event(self, guild_id: int, event_type: str) -> bool:
-        """指定されたイベントをログに記録すべきかどうかを判定"""
-        config = self.bot.get_guild_config(guild_id)
+    def _compile_policy(self, guild: discord.Guild) -> LoggingPolicy:
+        """ギルドのログ設定を読み取り、ログチャンネルを解決する"""
+        config = self.bot.get_guild_config(guild.id)
         logging_config = config.get('logging', {})
+        enabled = bool(logging_config.get('enabled', False))
         
-        if not logging_config.get('enabled', False):
-            return False
+        channel_id = None
+        log_channel_name = logging_config.get('log_channel')
+        if enabled and log_channel_name:
+            channel = discord.utils.get(guild.text_channels, name=log_channel_name)
+            channel_id = channel.id if channel else None
         
-        events_to_log = logging_config.get('events', [])
-        return event_type in events_to_log
+        return LoggingPolicy(
+            enabled=enabled,
+            events=frozenset(logging_config.get('events', [])) if enabled else frozenset(),
+            channel_id=channel_id,
+            auto_delete_days=logging_config.get('auto_delete_days', 7)
+        )
+    
+    def _get_policy(self, guild: discord.Guild) -> LoggingPolicy:
+        """ギルドのログ設定を取得（初回のみコンパイル）"""
+        policy = self._policies.get(guild.id)
+        if policy is None:
+            policy = self._policies[guild.id] = self._compile_policy(guild)
+        return policy
+    
+    def _invalidate_policy(self, guild_id: Optional[int] = None):
+        """コンパイル済みのログ設定を破棄（省略時は全ギルド）"""
+        if guild_id is None:
+            self._policies.clear()
+        else:
+            self._policies.pop(guild_id, None)
+    
+    def _get_log_channel(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
+        """ログチャンネルを取得"""
+        channel_id = self._get_policy(guild).channel_id
+        if channel_id is None:
+            return None
+        return guild.get_channel(channel_id)
+    
+    def _should_log_event(self, guild: discord.Guild, event_type: str) -> bool:
+        """指定されたイベントをログに記録すべきかどうかを判定"""
+        return event_type in self._get_policy(guild).events
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        """チャンネル作成時にログチャンネルを解決し直す"""
+        self._invalidate_policy(channel.guild.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        """チャンネル削除時にログチャンネルを解決し直す"""
+        self._invalidate_policy(channel.guild.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        """チャンネル名の変更時にログチャンネルを解決し直す"""
+        if before.name != after.name:
+            self._invalidate_policy(after.guild.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        """退出したギルドのログ設定を破棄"""
+        self._invalidate_policy(guild.id)
+        self.audit.evict(guild.id)
+        if self.raid:
+            self.raid.evict(guild.id)
+    
+    @commands.Cog.listener()
+    async def on_config_reload(self):
+        """設定の再読み込み時に全ギルドのログ設定を破棄
+
+        設定を差し替える処理は bot.config を更新した後に bot.dispatch('config_reload') を呼ぶ。
+        """
+        self._invalidate_policy()
+    
+    def _caches_messages(self, guild: discord.Guild) -> bool:
+        """メッセージ内容をキャッシュする必要があるか（削除・編集をログに残すギルドのみ）"""
+        events = self._get_policy(guild).events
+        return 'message_delete' in events or 'message_edit' in events
     
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        """メッセージ削除のログ"""
+    async def on_message(self, message: discord.Message):
+        """削除・編集のログ用にメッセージ内容を保持"""
         if not message.guild or message.author.bot:
             return
         
-        if not self._should_log_event(message.guild.id, 'message_delete'):
+        if self._caches_messages(message.guild):
+            entry = self.message_cache.put_message(message)
+            if entry and self.message_store:
+                self.message_store.put(entry)
+    
+    async def _find_cached_message(self, message_id: int) -> Optional[CachedMessage]:
+        """メモリのキャッシュ、なければディスクのストアからメッセージを探す"""
+        entry = self.message_cache.get(message_id)
+        if entry is None and self.message_store:
+            entry = await self.message_store.get(message_id)
+        return entry
+    
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """メッセージ削除のログ（discord.pyのキャッシュ外のメッセージも対象）"""
+        if payload.guild_id is None:
+            return
+        
+        # 保留中の編集は削除より先に記録する
+        await self._flush_edit(payload.message_id)
+        
+        # 削除を記録しないギルドではディスクの保存内容を参照しない
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild or not self._should_log_event(guild, 'message_delete'):
+            if guild and self._caches_messages(guild):
+                # 編集のログ用に保持していた内容だけを破棄する
+                self.message_cache.pop(payload.message_id)
+                if self.message_store:
+                    self.message_store.delete(payload.message_id)
             return
         
-        log_channel = self._get_log_channel(message.guild)
+        message = payload.cached_message
+        if message is not None:
+            if message.author.bot:
+                return
+            entry = CachedMessage.from_message(message)
+        else:
+            entry = await self._find_cached_message(payload.message_id)
+        
+        self.message_cache.pop(payload.message_id)
+        if self.message_store:
+            self.message_store.delete(payload.message_id)
+        if entry is None:
+            return
+        
+        log_channel = self._get_log_channel(guild)
         if not log_channel:
             return
         
         try:
-            # データベースにログを記録
+            content = entry.content
+            
+            # データベースにログを記録（実行者は監査ログから分かった時点で追加）
+            timestamp = format_timestamp(utc_now())
             await self.bot.db.add_log_event(
-                message.guild.id,
+                guild.id,
                 'message_delete',
-                message.author.id,
-                message.channel.id,
-                message.id,
-                message.content[:2000] if message.content else None,
+                entry.author_id,
+                entry.channel_id,
+                entry.message_id,
+                content[:2000] if content else None,
                 json.dumps({
-                    'attachments': [att.filename for att in message.attachments],
-                    'embeds': len(message.embeds)
-                })
+                    'attachments': list(entry.attachments),
+                    'embeds': len(message.embeds) if message else 0,
+                    'actor_id': None
+                }),
+                timestamp=timestamp
             )
             
             # ログメッセージの作成
+            channel = guild.get_channel_or_thread(entry.channel_id)
             embed = create_embed(
                 title="🗑️ メッセージ削除",
                 color=discord.Color.red(),
                 fields=[
-                    {"name": "ユーザー", "value": format_user(message.author), "inline": True},
-                    {"name": "チャンネル", "value": format_channel(message.channel), "inline": True},
-                    {"name": "メッセージID", "value": str(message.id), "inline": True}
+                    {"name": "ユーザー", "value": entry.author_name, "inline": True},
+                    {"name": "チャンネル", "value": format_channel(channel) if channel else f"<#{entry.channel_id}>", "inline": True},
+                    {"name": "メッセージID", "value": str(entry.message_id), "inline": True}
                 ]
             )
             
-            if message.content:
+            if content:
                 embed.add_field(
                     name="内容",
-                    value=f"```\n{truncate_text(message.content, 1000)}\n```",
+                    value=f"```\n{truncate_text(content, 1000)}\n```",
                     inline=False
                 )
             
-            if message.attachments:
-                attachment_list = [att.filename for att in message.attachments]
+            if entry.attachments:
                 embed.add_field(
                     name="添付ファイル",
-                    value=", ".join(attachment_list),
+                    value=", ".join(entry.attachments),
                     inline=False
                 )
             
-            await log_channel.send(embed=embed)
+            async def finish(actor: Optional[AuditActor]):
+                if actor:
+                    await self.bot.db.attach_log_event_actor(
+                        guild.id, 'message_delete', timestamp, actor.user_id, message_id=entry.message_id
+                    )
+                self._add_actor_field(embed, actor, "削除者")
+                self._deliver(log_channel, embed, 'message_delete')
+            
+            # 本人以外が削除した場合は監査ログに記録される
+            self._after_audit(
+                guild, discord.AuditLogAction.message_delete, entry.author_id, finish, entry.channel_id
+            )
             
         except Exception as e:
             self.logger.error(f"メッセージ削除ログエラー: {e}")
     
     @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message):
-        """メッセージ編集のログ"""
-        if not before.guild or before.author.bot:
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        """メッセージ編集のログ（discord.pyのキャッシュ外のメッセージも対象）"""
+        if payload.guild_id is None:
+            return
+        
+        # 埋め込みの展開など本文を含まない更新は無視
+        after_content = payload.data.get('content')
+        if after_content is None or payload.data.get('author', {}).get('bot'):
             return
         
+        pending = self._pending_edits.get(payload.message_id)
+        if pending is not None:
+            before = pending.message
+            before_content = pending.latest
+        else:
+            message = payload.cached_message
+            if message is not None:
+                before = CachedMessage.from_message(message)
+            else:
+                before = await self._find_cached_message(payload.message_id)
+            if before is None:
+                return
+            # キャッシュのエントリは更新で書き換わるため先に編集前の本文を取り出す
+            before_content = before.content
+        
+        updated = self.message_cache.update_content(payload.message_id, after_content)
+        if self.message_store:
+            if updated is None:
+                updated = CachedMessage(
+                    before.message_id, before.guild_id, before.channel_id, before.author_id,
+                    before.author_name, after_content, before.attachments,
+                    self.message_cache.compress_min_length
+                )
+            self.message_store.put(updated)
+        
         # 内容が変わっていない場合は無視
-        if before.content == after.content:
+        if before_content == after_content:
             return
         
-        if not self._should_log_event(before.guild.id, 'message_edit'):
+        # 連続した編集は最初の内容と最新の内容だけを残す
+        if pending is not None:
+            pending.latest = after_content
+            pending.edits += 1
             return
         
-        log_channel = self._get_log_channel(before.guild)
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild or not self._should_log_event(guild, 'message_edit'):
+            return
+        
+        if not self._get_log_channel(guild):
+            return
+        
+        pending = PendingEdit(guild.id, before, before_content, after_content)
+        self._pending_edits[payload.message_id] = pending
+        if self.edit_coalesce_window:
+            pending.task = asyncio.create_task(self._flush_edit_later(payload.message_id))
+        else:
+            await self._flush_edit(payload.message_id)
+    
+    async def _flush_edit_later(self, message_id: int):
+        """まとめる時間が過ぎたら編集をログに記録"""
+        await asyncio.sleep(self.edit_coalesce_window)
+        await self._flush_edit(message_id)
+    
+    async def _flush_edit(self, message_id: int):
+        """保留中の編集を1件のログとして記録"""
+        pending = self._pending_edits.pop(message_id, None)
+        if pending is None:
+            return
+        if pending.task and pending.task is not asyncio.current_task():
+            pending.task.cancel()
+        if pending.original == pending.latest:
+            return
+        
+        guild = self.bot.get_guild(pending.guild_id)
+        log_channel = self._get_log_channel(guild) if guild else None
         if not log_channel:
             return
         
+        before = pending.message
         try:
+            ops = word_diff(pending.original, pending.latest)
+            
+            # メッセージごとに最初の編集だけ元の本文を保存し、以降は差分だけを保存する
+            has_base = message_id in self._edit_bases
+            content = inserted_text(ops) if has_base else pending.original
+            self._edit_bases[message_id] = None
+            self._edit_bases.move_to_end(message_id)
+            while len(self._edit_bases) > EDIT_BASE_HISTORY:
+                self._edit_bases.popitem(last=False)
+            
             # データベースにログを記録
             await self.bot.db.add_log_event(
-                before.guild.id,
+                guild.id,
                 'message_edit',
-                before.author.id,
-                before.channel.id,
-                before.id,
-                f"編集前: {before.content}\n編集後: {after.content}",
+                before.author_id,
+                before.channel_id,
+                before.message_id,
+                content[:2000] if content else None,
                 json.dumps({
-                    'before_length': len(before.content) if before.content else 0,
-                    'after_length': len(after.content) if after.content else 0
-                })
+                    'base': not has_base,
+                    'diff': ops,
+                    'edits': pending.edits,
+                    'before_length': len(pending.original),
+                    'after_length': len(pending.latest)
+                }, ensure_ascii=False)
             )
             
             # ログメッセージの作成
+            channel = guild.get_channel_or_thread(before.channel_id)
+            jump_url = f"https://discord.com/channels/{guild.id}/{before.channel_id}/{before.message_id}"
             embed = create_embed(
                 title="✏️ メッセージ編集",
                 color=discord.Color.orange(),
                 fields=[
-                    {"name": "ユーザー", "value": format_user(before.author), "inline": True},
-                    {"name": "チャンネル", "value": format_channel(before.channel), "inline": True},
-                    {"name": "メッセージ", "value": f"[リンク]({after.jump_url})", "inline": True}
+                    {"name": "ユーザー", "value": before.author_name, "inline": True},
+                    {"name": "チャンネル", "value": format_channel(channel) if channel else f"<#{before.channel_id}>", "inline": True},
+                    {"name": "メッセージ", "value": f"[リンク]({jump_url})", "inline": True}
                 ]
             )
             
-            if before.content:
-                embed.add_field(
-                    name="編集前",
-                    value=f"```\n{truncate_text(before.content, 500)}\n```",
-                    inline=False
-                )
+            embed.add_field(
+                name="変更内容" if pending.edits == 1 else f"変更内容（{pending.edits}回の編集）",
+                value=truncate_text(render_diff(pending.original, ops), 1000) or "（空）",
+                inline=False
+            )
             
-            if after.content:
+            self._deliver(log_channel, embed, 'message_edit')
+            
+        except Exception as e:
+            self.logger.error(f"メッセージ編集ログエラー: {e}")
+    
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """メッセージ一括削除のログ（1件の要約とトランスクリプトにまとめる）"""
+        if payload.guild_id is None:
+            return
+        
+        # 保留中の編集は削除より先に記録する
+        for message_id in payload.message_ids & self._pending_edits.keys():
+            await self._flush_edit(message_id)
+        
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild or not self._should_log_event(guild, 'message_delete'):
+            return
+        
+        log_channel = self._get_log_channel(guild)
+        if not log_channel:
+            return
+        
+        try:
+            channel = guild.get_channel_or_thread(payload.channel_id)
+            
+            # discord.pyのキャッシュになければ内容キャッシュから補う
+            cached: Dict[int, CachedMessage] = {}
+            bot_message_ids = set()
+            for message in payload.cached_messages:
+                if message.author.bot:
+                    bot_message_ids.add(message.id)
+                else:
+                    cached[message.id] = CachedMessage.from_message(message)
+            for message_id in payload.message_ids:
+                entry = self.message_cache.pop(message_id)
+                if entry is not None and message_id not in cached:
+                    cached[message_id] = entry
+            if self.message_store:
+                missing = [message_id for message_id in payload.message_ids if message_id not in cached]
+                for message_id, entry in (await self.message_store.get_many(missing)).items():
+                    cached[message_id] = entry
+                for message_id in payload.message_ids:
+                    self.message_store.delete(message_id)
+            
+            # Botのメッセージは単体削除と同様に記録しない
+            message_ids = sorted(payload.message_ids - bot_message_ids)
+            if not message_ids:
+                return
+            
+            events = []
+            transcript = []
+            authors: Dict[str, int] = {}
+            for message_id in message_ids:
+                entry = cached.get(message_id)
+                created_at = discord.utils.snowflake_time(message_id)
+                
+                if entry is None:
+                    events.append({
+                        'guild_id': guild.id,
+                        'event_type': 'message_delete',
+                        'channel_id': payload.channel_id,
+                        'message_id': message_id,
+                        'additional_data': json.dumps({'bulk': True, 'cached': False})
+                    })
+                    transcript.append(f"[{created_at:%Y-%m-%d %H:%M:%S}] (キャッシュなし) メッセージID: {message_id}")
+                    continue
+                
+                content = entry.content
+                events.append({
+                    'guild_id': guild.id,
+                    'event_type': 'message_delete',
+                    'user_id': entry.author_id,
+                    'channel_id': payload.channel_id,
+                    'message_id': message_id,
+                    'content': content[:2000] if content else None,
+                    'additional_data': json.dumps({
+                        'bulk': True,
+                        'attachments': list(entry.attachments)
+                    })
+                })
+                line = f"[{created_at:%Y-%m-%d %H:%M:%S}] {entry.author_name} ({entry.author_id}): {content}"
+                if entry.attachments:
+                    line += f" [添付: {', '.join(entry.attachments)}]"
+                transcript.append(line)
+                authors[entry.author_name] = authors.get(entry.author_name, 0) + 1
+            
+            # 全件を1トランザクションで記録（実行者は監査ログから分かった時点で追加）
+            timestamp = format_timestamp(utc_now())
+            await self.bot.db.add_log_events_bulk(events, timestamp=timestamp)
+            
+            cached_count = sum(authors.values())
+            
+            embed = create_embed(
+                title="🧹 メッセージ一括削除",
+                color=discord.Color.dark_red(),
+                fields=[
+                    {"name": "チャンネル", "value": format_channel(channel) if channel else f"<#{payload.channel_id}>", "inline": True},
+                    {"name": "件数", "value": f"{len(message_ids)}件", "inline": True},
+                    {"name": "内容を取得できた件数", "value": f"{cached_count}件", "inline": True}
+                ]
+            )
+            
+            if authors:
+                top_authors = sorted(authors.items(), key=lambda item: item[1], reverse=True)[:10]
                 embed.add_field(
-                    name="編集後",
-                    value=f"```\n{truncate_text(after.content, 500)}\n```",
+                    name="投稿者",
+                    value="\n".join(f"{author}: {count}件" for author, count in top_authors),
                     inline=False
                 )
             
-            await log_channel.send(embed=embed)
+            file = discord.File(
+                io.BytesIO("\n".join(transcript).encode('utf-8')),
+                filename=f"bulk_delete_{payload.channel_id}_{message_ids[-1]}.txt"
+            )
+            
+            async def finish(actor: Optional[AuditActor]):
+                if actor:
+                    await self.bot.db.attach_log_event_actor(
+                        guild.id, 'message_delete', timestamp, actor.user_id, channel_id=payload.channel_id
+                    )
+                self._add_actor_field(embed, actor, "削除者")
+                # ファイルはまとめて送れないため配信キューを通さず送信
+                await log_channel.send(embed=embed, file=file)
+            
+            # 一括削除の監査ログは対象がチャンネルになる
+            self._after_audit(guild, discord.AuditLogAction.message_bulk_delete, payload.channel_id, finish)
             
         except Exception as e:
-            self.logger.error(f"メッセージ編集ログエラー: {e}")
+            self.logger.error(f"メッセージ一括削除ログエラー: {e}")
     
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         """メンバー参加のログ"""
-        if not self._should_log_event(member.guild.id, 'member_join'):
+        if not self._should_log_event(member.guild, 'member_join'):
             return
         
         log_channel = self._get_log_channel(member.guild)
@@ -181,6 +647,15 @@ class LoggingCog(commands.Cog):
             return
         
         try:
+            # レイドモード中は個別のログを出さず、定期的な要約にまとめる
+            if self.raid:
+                state, started = self.raid.record_join(member.guild.id)
+                if state is not None:
+                    state.add(self._raid_join(member))
+                    if started:
+                        self._announce_raid(log_channel, state)
+                    return
+            
             # データベースにログを記録
             await self.bot.db.add_log_event(
                 member.guild.id,
@@ -211,15 +686,104 @@ class LoggingCog(commands.Cog):
             if member.display_avatar:
                 embed.set_thumbnail(url=member.display_avatar.url)
             
-            await log_channel.send(embed=embed)
+            self._deliver(log_channel, embed, 'member_join')
             
         except Exception as e:
             self.logger.error(f"メンバー参加ログエラー: {e}")
     
+    def _raid_join(self, member: discord.Member) -> RaidJoin:
+        """レイド中の参加を記録用にまとめる"""
+        joined_at = member.joined_at or discord.utils.utcnow()
+        account_age = joined_at - member.created_at
+        return RaidJoin(
+            user_id=member.id,
+            name=str(member),
+            created_at=member.created_at,
+            joined_at=joined_at,
+            new_account=account_age < timedelta(days=self.raid_new_account_days)
+        )
+    
+    def _announce_raid(self, log_channel: discord.TextChannel, state: RaidState):
+        """レイドモードの開始を通知"""
+        self.logger.warning(f"ギルド {log_channel.guild.name}: レイドモード開始")
+        embed = create_embed(
+            title="🚨 レイドモード開始",
+            description=(
+                f"{self.raid.window:g}秒間に{self.raid.threshold}人以上が参加したため、"
+                "参加ログを定期的な要約に切り替えます。"
+            ),
+            color=discord.Color.red(),
+            fields=[
+                {"name": "開始日時", "value": discord.utils.format_dt(state.started_at, style='F'), "inline": True}
+            ]
+        )
+        self.delivery.enqueue(log_channel, embed, priority=True)
+    
+    async def _flush_raid(self, guild: discord.Guild, state: RaidState, ended: bool = False):
+        """レイド中の参加をまとめて記録し、要約を送信"""
+        joins = state.take_pending()
+        
+        if joins:
+            await self.bot.db.add_log_events_bulk([
+                {
+                    'guild_id': guild.id,
+                    'event_type': 'member_join',
+                    'user_id': join.user_id,
+                    'content': f"{join.name} がサーバーに参加しました",
+                    'additional_data': json.dumps({
+                        'account_created': join.created_at.isoformat(),
+                        'joined_at': join.joined_at.isoformat(),
+                        'raid': True,
+                        'new_account': join.new_account
+                    })
+                }
+                for join in joins
+            ])
+        
+        log_channel = self._get_log_channel(guild)
+        if not log_channel:
+            return
+        
+        # アカウント作成からの日数で分類
+        day_old = sum(1 for join in joins if join.joined_at - join.created_at < timedelta(days=1))
+        new_accounts = sum(1 for join in joins if join.new_account)
+        
+        embed = create_embed(
+            title="✅ レイドモード終了" if ended else "🚨 レイドモード中",
+            color=discord.Color.green() if ended else discord.Color.red(),
+            fields=[
+                {"name": "この期間の参加", "value": f"{len(joins)}人", "inline": True},
+                {"name": "累計の参加", "value": f"{state.total}人", "inline": True},
+                {"name": "開始日時", "value": discord.utils.format_dt(state.started_at, style='F'), "inline": True},
+                {"name": "作成1日未満", "value": f"{day_old}人", "inline": True},
+                {"name": f"作成{self.raid_new_account_days}日未満", "value": f"{new_accounts}人", "inline": True},
+                {"name": f"作成{self.raid_new_account_days}日未満（累計）", "value": f"{state.total_new_accounts}人", "inline": True}
+            ]
+        )
+        
+        if not joins:
+            await log_channel.send(embed=embed)
+            return
+        
+        lines = ["user_id\tname\taccount_created\taccount_age_days\tflag"]
+        for join in joins:
+            age_days = (join.joined_at - join.created_at).days
+            lines.append(
+                f"{join.user_id}\t{join.name}\t{join.created_at:%Y-%m-%d %H:%M:%S}\t{age_days}\t"
+                f"{'NEW' if join.new_account else ''}"
+            )
+        file = discord.File(
+            io.BytesIO("\n".join(lines).encode('utf-8')),
+            filename=f"raid_joins_{guild.id}_{joins[-1].user_id}.tsv"
+        )
+        
+        # ファイルはまとめて送れないため配信キューを通さず送信
+        await log_channel.send(embed=embed, file=file)
+    
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
         """メンバー退出のログ"""
-        if not self._should_log_event(member.guild.id, 'member_leave'):
+        if not self._should_log_event(member.guild, 'member_leave'):
             return
         
         log_channel = self._get_log_channel(member.guild)
@@ -227,7 +791,8 @@ class LoggingCog(commands.Cog):
             return
         
         try:
-            # データベースにログを記録
+            # データベースにログを記録（キックした実行者は監査ログから分かった時点で追加）
+            timestamp = format_timestamp(utc_now())
             await self.bot.db.add_log_event(
                 member.guild.id,
                 'member_leave',
@@ -235,8 +800,10 @@ class LoggingCog(commands.Cog):
                 content=f"{member.display_name} がサーバーから退出しました",
                 additional_data=json.dumps({
                     'roles': [role.name for role in member.roles if role != member.guild.default_role],
-                    'joined_at': member.joined_at.isoformat() if member.joined_at else None
-                })
+                    'joined_at': member.joined_at.isoformat() if member.joined_at else None,
+                    'kicked_by': None
+                }),
+                timestamp=timestamp
             )
             
             # 在籍期間の計算
@@ -268,7 +835,18 @@ class LoggingCog(commands.Cog):
             if member.display_avatar:
                 embed.set_thumbnail(url=member.display_avatar.url)
             
-            await log_channel.send(embed=embed)
+            async def finish(actor: Optional[AuditActor]):
+                if actor:
+                    await self.bot.db.attach_log_event_actor(
+                        member.guild.id, 'member_leave', timestamp, actor.user_id,
+                        key='kicked_by', user_id=member.id
+                    )
+                    embed.title = "👢 メンバーキック"
+                self._add_actor_field(embed, actor)
+                self._deliver(log_channel, embed, 'member_leave')
+            
+            # キックされた場合は監査ログに記録される
+            self._after_audit(member.guild, discord.AuditLogAction.kick, member.id, finish)
             
         except Exception as e:
             self.logger.error(f"メンバー退出ログエラー: {e}")
@@ -276,7 +854,7 @@ class LoggingCog(commands.Cog):
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
         """メンバー更新のログ"""
-        if not self._should_log_event(before.guild.id, 'member_update'):
+        if not self._should_log_event(before.guild, 'member_update'):
             return
         
         log_channel = self._get_log_channel(before.guild)
@@ -306,7 +884,8 @@ class LoggingCog(commands.Cog):
             if not changes:
                 return
             
-            # データベースにログを記録
+            # データベースにログを記録（実行者は監査ログから分かった時点で追加）
+            timestamp = format_timestamp(utc_now())
             await self.bot.db.add_log_event(
                 before.guild.id,
                 'member_update',
@@ -315,8 +894,10 @@ class LoggingCog(commands.Cog):
                 additional_data=json.dumps({
                     'changes': changes,
                     'before_roles': [role.name for role in before.roles],
-                    'after_roles': [role.name for role in after.roles]
-                })
+                    'after_roles': [role.name for role in after.roles],
+                    'actor_id': None
+                }),
+                timestamp=timestamp
             )
             
             # ログメッセージの作成
@@ -329,7 +910,17 @@ class LoggingCog(commands.Cog):
                 ]
             )
             
-            await log_channel.send(embed=embed)
+            async def finish(actor: Optional[AuditActor]):
+                if actor:
+                    await self.bot.db.attach_log_event_actor(
+                        before.guild.id, 'member_update', timestamp, actor.user_id, user_id=before.id
+                    )
+                self._add_actor_field(embed, actor)
+                self._deliver(log_channel, embed, 'member_update')
+            
+            action = (discord.AuditLogAction.member_role_update if added_roles or removed_roles
+                      else discord.AuditLogAction.member_update)
+            self._after_audit(before.guild, action, before.id, finish)
             
         except Exception as e:
             self.logger.error(f"メンバー更新ログエラー: {e}")
@@ -337,7 +928,7 @@ class LoggingCog(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
         """ロール更新のログ"""
-        if not self._should_log_event(before.guild.id, 'role_update'):
+        if not self._should_log_event(before.guild, 'role_update'):
             return
         
         log_channel = self._get_log_channel(before.guild)
@@ -365,15 +956,19 @@ class LoggingCog(commands.Cog):
             if not changes:
                 return
             
-            # データベースにログを記録
+            # データベースにログを記録（実行者は監査ログから分かった時点で追加）
+            timestamp = format_timestamp(utc_now())
             await self.bot.db.add_log_event(
                 before.guild.id,
                 'role_update',
+                None,
                 content=f"ロール '{after.name}' が更新されました",
                 additional_data=json.dumps({
                     'role_id': after.id,
-                    'changes': changes
-                })
+                    'changes': changes,
+                    'actor_id': None
+                }),
+                timestamp=timestamp
             )
             
             # ログメッセージの作成
@@ -386,30 +981,402 @@ class LoggingCog(commands.Cog):
                 ]
             )
             
-            await log_channel.send(embed=embed)
+            async def finish(actor: Optional[AuditActor]):
+                if actor:
+                    await self.bot.db.attach_log_event_actor(
+                        before.guild.id, 'role_update', timestamp, actor.user_id, role_id=after.id
+                    )
+                self._add_actor_field(embed, actor)
+                self._deliver(log_channel, embed, 'role_update')
+            
+            self._after_audit(before.guild, discord.AuditLogAction.role_update, after.id, finish)
             
         except Exception as e:
             self.logger.error(f"ロール更新ログエラー: {e}")
     
+    @logs_group.command(name="search", description="ログに記録されたメッセージ内容を全文検索します")
+    @app_commands.describe(
+        query="検索する語句（空白区切りで全てを含むものを検索）",
+        user="発言したユーザー",
+        days="過去何日分を検索するか",
+        until_days_ago="何日前までを検索するか",
+        page="表示するページ"
+    )
+    async def logs_search(
+        self,
+        interaction: discord.Interaction,
+        query: str,
+        user: Optional[discord.User] = None,
+        days: Optional[app_commands.Range[int, 1, 3650]] = None,
+        until_days_ago: Optional[app_commands.Range[int, 0, 3650]] = None,
+        page: app_commands.Range[int, 1, 100] = 1
+    ):
+        """ログの全文検索"""
+        
+        # 削除されたメッセージの内容を含むためメッセージ管理権限を要求
+        if not (interaction.user.guild_permissions.manage_messages or 
+                interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message(
+                "❌ このコマンドを実行するにはメッセージ管理権限が必要です。",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            now = utc_now()
+            since = now - timedelta(days=days) if days else None
+            until = now - timedelta(days=until_days_ago) if until_days_ago else None
+            
+            results = await self.bot.db.search_log_events(
+                interaction.guild.id,
+                query,
+                user_id=user.id if user else None,
+                since=since,
+                until=until,
+                limit=SEARCH_PAGE_SIZE + 1,
+                offset=(page - 1) * SEARCH_PAGE_SIZE
+            )
+            
+            if results is None:
+                await interaction.followup.send(
+                    f"❌ {MIN_TERM_LENGTH}文字以上の語句を1つ以上含めてください。",
+                    ephemeral=True
+                )
+                return
+            
+            if not results:
+                await interaction.followup.send(
+                    "🔍 条件に一致するログはありません。",
+                    ephemeral=True
+                )
+                return
+            
+            # 1件多く取得して次のページがあるかを判定
+            has_next = len(results) > SEARCH_PAGE_SIZE
+            results = results[:SEARCH_PAGE_SIZE]
+            
+            embed = create_embed(
+                title=f"🔍 ログ検索: {truncate_text(query, 100)}",
+                color=discord.Color.blue(),
+                footer={"text": f"ページ {page}" + ("（次のページあり）" if has_next else "")}
+            )
+            
+            for result in results:
+                timestamp = datetime.strptime(result['timestamp'], TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+                details = [discord.utils.format_dt(timestamp, style='f')]
+                if result['user_id']:
+                    details.append(f"<@{result['user_id']}>")
+                if result['channel_id']:
+                    details.append(f"<#{result['channel_id']}>")
+                
+                embed.add_field(
+                    name=f"{result['event_type']} (#{result['id']})",
+                    value=truncate_text(f"{' '.join(details)}\n{result['snippet']}", 1000),
+                    inline=False
+                )
+            
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            self.logger.error(f"ログ検索エラー: {e}")
+            await interaction.followup.send(
+                "❌ ログの検索中にエラーが発生しました。",
+                ephemeral=True
+            )
+    
+    @logs_group.command(name="stats", description="ログに記録されたイベント数の推移を表示します")
+    @app_commands.describe(
+        period="集計の単位",
+        count="表示する期間の数（日単位は最大90、週単位は最大52）",
+        event_type="イベント種別で絞り込む（例: message_delete）"
+    )
+    @app_commands.choices(period=[
+        app_commands.Choice(name="日", value="day"),
+        app_commands.Choice(name="週", value="week")
+    ])
+    async def logs_stats(
+        self,
+        interaction: discord.Interaction,
+        period: str = "day",
+        count: Optional[app_commands.Range[int, 1, 90]] = None,
+        event_type: Optional[str] = None
+    ):
+        """集計テーブルからイベント数の推移を表示"""
+        
+        if not (interaction.user.guild_permissions.manage_messages or 
+                interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message(
+                "❌ このコマンドを実行するにはメッセージ管理権限が必要です。",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            # 集計はUTCの時間単位のため、期間の区切りもUTCで揃える
+            today = utc_now().replace(hour=0, minute=0, second=0, microsecond=0)
+            if period == "week":
+                count = min(count or 8, 52)
+                step = timedelta(weeks=1)
+                current = today - timedelta(days=today.weekday())
+            else:
+                count = count or 14
+                step = timedelta(days=1)
+                current = today
+            since = current - step * (count - 1)
+            periods = [(since + step * i).strftime('%Y-%m-%d') for i in range(count)]
+            
+            rows = await self.bot.db.get_log_stats(
+                interaction.guild.id, since, period=period, event_type=event_type
+            )
+            channels = await self.bot.db.get_log_channel_stats(interaction.guild.id, since)
+            
+            totals = dict.fromkeys(periods, 0)
+            by_type: Dict[str, int] = {}
+            for row in rows:
+                if row['period'] in totals:
+                    totals[row['period']] += row['count']
+                by_type[row['event_type']] = by_type.get(row['event_type'], 0) + row['count']
+            
+            if not by_type:
+                await interaction.followup.send(
+                    "📊 この期間に記録されたイベントはありません。",
+                    ephemeral=True
+                )
+                return
+            
+            # 期間ごとの件数を棒グラフで表示
+            peak = max(totals.values()) or 1
+            lines = [
+                f"{key} {'█' * round(total / peak * STATS_BAR_WIDTH):<{STATS_BAR_WIDTH}} {total}"
+                for key, total in totals.items()
+            ]
+            
+            label = "日" if period == "day" else "週"
+            embed = create_embed(
+                title=f"📊 ログ統計（{label}別・直近{count}{label}）",
+                description=f"```\n{chr(10).join(lines)}\n```",
+                color=discord.Color.blue(),
+                footer={"text": "UTC基準" + (f" / {event_type}" if event_type else "")}
+            )
+            
+            if len(periods) >= 2:
+                latest, previous = totals[periods[-1]], totals[periods[-2]]
+                if previous:
+                    change = f"{(latest - previous) / previous:+.0%}"
+                else:
+                    change = "—"
+                embed.add_field(
+                    name=f"前{label}比",
+                    value=f"{previous} → {latest} ({change})",
+                    inline=True
+                )
+            
+            embed.add_field(name="合計", value=f"{sum(totals.values())}件", inline=True)
+            
+            top_types = sorted(by_type.items(), key=lambda item: item[1], reverse=True)[:10]
+            embed.add_field(
+                name="イベント種別",
+                value="\n".join(f"{name}: {total}件" for name, total in top_types),
+                inline=False
+            )
+            
+            if channels and not event_type:
+                embed.add_field(
+                    name="チャンネル",
+                    value="\n".join(f"<#{row['channel_id']}>: {row['count']}件" for row in channels),
+                    inline=False
+                )
+            
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            self.logger.error(f"ログ統計エラー: {e}")
+            await interaction.followup.send(
+                "❌ ログ統計の取得中にエラーが発生しました。",
+                ephemeral=True
+            )
+    
+    @logs_group.command(name="export", description="ログを圧縮したCSVまたはJSONLファイルでエクスポートします")
+    @app_commands.describe(
+        format="出力形式",
+        days="過去何日分をエクスポートするか",
+        until_days_ago="何日前までをエクスポートするか",
+        event_type="イベント種別で絞り込む（例: message_delete）",
+        user="対象のユーザー"
+    )
+    @app_commands.choices(format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSONL", value="jsonl")
+    ])
+    async def logs_export(
+        self,
+        interaction: discord.Interaction,
+        format: str = "csv",
+        days: app_commands.Range[int, 1, 3650] = 7,
+        until_days_ago: Optional[app_commands.Range[int, 0, 3650]] = None,
+        event_type: Optional[str] = None,
+        user: Optional[discord.User] = None
+    ):
+        """ログをページ単位で読み出し、圧縮しながらファイルに分割して送信"""
+        
+        # 削除されたメッセージの内容を含むためメッセージ管理権限を要求
+        if not (interaction.user.guild_permissions.manage_messages or 
+                interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message(
+                "❌ このコマンドを実行するにはメッセージ管理権限が必要です。",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        writer = None
+        try:
+            now = utc_now()
+            since = now - timedelta(days=days)
+            until = now - timedelta(days=until_days_ago) if until_days_ago else None
+            
+            writer = LogExportWriter(
+                format,
+                max_bytes=interaction.guild.filesize_limit,
+                basename=f"logs_{interaction.guild.id}_{since:%Y%m%d}"
+            )
+            
+            async def send_part(part: ExportPart):
+                try:
+                    await interaction.followup.send(
+                        f"📦 パート{writer.parts_written}: {part.rows}件",
+                        file=discord.File(part.file, filename=part.filename),
+                        ephemeral=True
+                    )
+                finally:
+                    part.file.close()
+            
+            # 古い順に1ページずつ読み、上限に達したファイルから順に送信する
+            async for row in self.bot.db.iter_log_events(
+                interaction.guild.id,
+                event_type=event_type,
+                user_id=user.id if user else None,
+                since=since,
+                until=until,
+                descending=False
+            ):
+                part = writer.write(row)
+                if part:
+                    await send_part(part)
+            
+            part = writer.finish()
+            if part:
+                await send_part(part)
+            
+            if writer.rows_written == 0:
+                await interaction.followup.send(
+                    "📦 条件に一致するログはありません。",
+                    ephemeral=True
+                )
+                return
+            
+            await interaction.followup.send(
+                f"✅ {writer.rows_written}件のログを{writer.parts_written}個のファイルでエクスポートしました。",
+                ephemeral=True
+            )
+            
+        except Exception as e:
+            self.logger.error(f"ログエクスポートエラー: {e}")
+            await interaction.followup.send(
+                "❌ ログのエクスポート中にエラーが発生しました。",
+                ephemeral=True
+            )
+        finally:
+            if writer:
+                writer.discard()
+    
     @tasks.loop(hours=24)
     async def cleanup_logs(self):
         """古いログの定期削除"""
         try:
+            # 集計はログ本体より長く残し、長期の推移に使う
+            rollup_retention_days = self.bot.config.get('logging', {}).get('rollup_retention_days', 365)
+            if rollup_retention_days > 0:
+                await self.bot.db.cleanup_log_rollups(rollup_retention_days)
+            
+            retention = {}
             for guild in self.bot.guilds:
-                if not self._is_logging_enabled(guild.id):
+                policy = self._get_policy(guild)
+                if not policy.enabled:
                     continue
                 
-                config = self.bot.get_guild_config(guild.id)
-                auto_delete_days = config.get('logging', {}).get('auto_delete_days', 7)
+                auto_delete_days = policy.auto_delete_days
                 
                 if auto_delete_days > 0:
-                    deleted_count = await self.bot.db.cleanup_old_logs(guild.id, auto_delete_days)
-                    if deleted_count > 0:
-                        self.logger.info(f"ギルド {guild.name}: {deleted_count}件の古いログを削除")
+                    retention[guild] = auto_delete_days
+            
+            if not retention:
+                return
+            
+            # 全ギルドの保持期間を過ぎたパーティションは丸ごと削除
+            # （ログ無効・保持期間0・退出済みのギルドの行を含むパーティションは残す）
+            await self.bot.db.drop_expired_log_partitions(
+                {guild.id: days for guild, days in retention.items()}
+            )
+            
+            # 残りはギルドごとの保持期間に合わせて一定件数ずつ削除
+            for guild, auto_delete_days in retention.items():
+                deleted_count = await self.bot.db.cleanup_old_logs(guild.id, auto_delete_days)
+                if deleted_count > 0:
+                    self.logger.info(f"ギルド {guild.name}: {deleted_count}件の古いログを削除")
             
         except Exception as e:
             self.logger.error(f"ログクリーンアップエラー: {e}")
     
+    @tasks.loop(minutes=5)
+    async def report_delivery_metrics(self):
+        """ログ配信キューとメッセージキャッシュの状況を定期的に記録"""
+        metrics = self.delivery.metrics()
+        if metrics['messages_sent'] or metrics['queue_depth']:
+            self.logger.info(
+                "ログ配信状況: " + ", ".join(f"{key}={value}" for key, value in metrics.items())
+            )
+
+        cache_stats = self.message_cache.stats()
+        if cache_stats['hits'] or cache_stats['misses']:
+            self.logger.info(
+                "メッセージキャッシュ: " + ", ".join(f"{key}={value}" for key, value in cache_stats.items())
+            )
+    
+    @tasks.loop(seconds=30)
+    async def raid_summary(self):
+        """レイドモード中のギルドの参加をまとめて記録し、落ち着いたら終了"""
+        for guild_id, state in list(self.raid.raids.items()):
+            try:
+                guild = self.bot.get_guild(guild_id)
+                if guild is None:
+                    self.raid.evict(guild_id)
+                    continue
+                
+                ended = self.raid.should_end(guild_id)
+                if ended:
+                    self.raid.end(guild_id)
+                    self.logger.info(f"ギルド {guild.name}: レイドモード終了（参加 {state.total}人）")
+                
+                if state.pending or ended:
+                    await self._flush_raid(guild, state, ended)
+                    
+            except Exception as e:
+                self.logger.error(f"レイドモード要約エラー: {e}")
+    
+    @tasks.loop(minutes=30)
+    async def compact_message_store(self):
+        """メッセージストアの期限切れ・容量超過分を削除"""
+        try:
+            await self.message_store.compact()
+        except Exception as e:
+            self.logger.error(f"メッセージストア圧縮エラー: {e}")
+    
     @cleanup_logs.before_loop
     async def before_cleanup_logs(self):
         """ログクリーンアップ開始前の待機"""
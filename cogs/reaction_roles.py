@@ -9,6 +9,10 @@ from typing import Optional, Union
 
 from utils.helpers import parse_emoji, find_role_by_name, create_embed, format_role
 from utils.logger import get_logger
+from utils.message_locator import MessageLocator, parse_message_reference
+from utils.reaction_cleanup import ReactionCleanupQueue, StaleReaction
+from utils.reaction_reconciler import ReactionRoleReconciler
+from database.cache import ReactionRoleGroup
 
 class ReactionRolesCog(commands.Cog):
     """リアクションロール機能"""
@@ -16,11 +20,44 @@ class ReactionRolesCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = get_logger(__name__)
+        
+        # メッセージIDからの検索（リンク・保存済みチャンネル・キャッシュ・並列検索の順）
+        self.locator = MessageLocator(bot.db)
+        
+        # 連続したリアクションによるロール変更はメンバーごとにまとめて1回で適用
+        # （ロールパネルと共有し、同じメンバーへの変更が互いに上書きしないようにする）
+        rr_config = bot.config.get('reaction_roles', {})
+        self.role_changes = bot.role_changes
+        
+        # グループのルールで不要になったリアクションはバックグラウンドで外す
+        self.reaction_cleanup = ReactionCleanupQueue(
+            bot, self._is_stale_reaction,
+            interval=rr_config.get('reaction_cleanup_interval', 0.3)
+        )
+        
+        # 停止中のリアクションをロールに反映する同期処理
+        self.reconciler = ReactionRoleReconciler(
+            bot, self.role_changes,
+            guild_concurrency=rr_config.get('reconcile_guild_concurrency', 2),
+            interval=rr_config.get('reconcile_interval', 0.5),
+            remove_unreacted=rr_config.get('reconcile_remove_unreacted', False)
+        )
+        self.reconcile_on_ready = rr_config.get('reconcile_on_ready', True)
+    
+    async def cog_unload(self):
+        """Cog終了時の処理"""
+        # 適用待ちのロール変更を反映してから終了
+        await self.role_changes.flush()
+        await self.reaction_cleanup.close()
+        metrics = self.role_changes.metrics()
+        self.logger.info(
+            "ロール変更のまとめ適用: " + ", ".join(f"{key}={value}" for key, value in metrics.items())
+        )
     
     @app_commands.command(name="rr", description="リアクションロールを管理します")
     @app_commands.describe(
         action="実行する操作",
-        message_id="対象メッセージのID",
+        message_id="対象メッセージのID・リンク・チャンネルID:メッセージID",
         emoji="使用する絵文字",
         role="付与するロール"
     )
@@ -28,7 +65,8 @@ class ReactionRolesCog(commands.Cog):
         app_commands.Choice(name="add", value="add"),
         app_commands.Choice(name="remove", value="remove"),
         app_commands.Choice(name="list", value="list"),
-        app_commands.Choice(name="clear", value="clear")
+        app_commands.Choice(name="clear", value="clear"),
+        app_commands.Choice(name="sync", value="sync")
     ])
     async def reaction_role_command(
         self,
@@ -48,6 +86,113 @@ class ReactionRolesCog(commands.Cog):
             await self._list_reaction_roles(interaction)
         elif action == "clear":
             await self._clear_reaction_roles(interaction, message_id)
+        elif action == "sync":
+            await self._sync_reaction_roles(interaction)
+    
+    @app_commands.command(name="rrgroup", description="メッセージのリアクションロールをグループとして制限します")
+    @app_commands.describe(
+        message_id="対象メッセージのID・リンク・チャンネルID:メッセージID",
+        mode="グループの種類",
+        max_roles="同時に選べるロールの数（上限を選んだ場合）",
+        required_role="選ぶために必要なロール"
+    )
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="1つだけ選択（選び直すと入れ替え）", value="exclusive"),
+        app_commands.Choice(name="上限まで選択", value="limit"),
+        app_commands.Choice(name="制限なし（必須ロールのみ）", value="none"),
+        app_commands.Choice(name="グループを解除", value="remove")
+    ])
+    async def reaction_role_group_command(
+        self,
+        interaction: discord.Interaction,
+        message_id: str,
+        mode: str,
+        max_roles: Optional[app_commands.Range[int, 1, 25]] = None,
+        required_role: Optional[discord.Role] = None
+    ):
+        """リアクションロールのグループ設定"""
+        
+        # モデレーター権限チェック
+        if not (interaction.user.guild_permissions.manage_roles or 
+                interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message(
+                "❌ このコマンドを実行するにはロール管理権限が必要です。",
+                ephemeral=True
+            )
+            return
+        
+        reference = parse_message_reference(message_id)
+        if reference is None:
+            await interaction.response.send_message(
+                "❌ 無効なメッセージIDです。",
+                ephemeral=True
+            )
+            return
+        _, msg_id = reference
+        
+        if not self.bot.db.is_reaction_role_message(msg_id):
+            await interaction.response.send_message(
+                "❌ 指定されたメッセージにリアクションロール設定はありません。",
+                ephemeral=True
+            )
+            return
+        
+        if mode == "limit" and not max_roles:
+            await interaction.response.send_message(
+                "❌ 上限を選んだ場合は同時に選べるロールの数を指定してください。",
+                ephemeral=True
+            )
+            return
+        
+        try:
+            if mode == "remove":
+                removed = await self.bot.db.remove_reaction_role_group(msg_id)
+                await interaction.response.send_message(
+                    f"✅ メッセージ `{msg_id}` のグループ設定を解除しました。" if removed
+                    else "❌ 指定されたメッセージにグループ設定はありません。",
+                    ephemeral=not removed
+                )
+                return
+            
+            group = ReactionRoleGroup(
+                exclusive=mode == "exclusive",
+                max_roles=max_roles if mode == "limit" else 0,
+                required_role_id=required_role.id if required_role else None
+            )
+            
+            if not await self.bot.db.set_reaction_role_group(interaction.guild.id, msg_id, group):
+                await interaction.response.send_message(
+                    "❌ データベースへの保存に失敗しました。",
+                    ephemeral=True
+                )
+                return
+            
+            embed = create_embed(
+                title="✅ リアクションロールのグループ設定完了",
+                description=f"メッセージ `{msg_id}` のリアクションロールを{self._describe_group(group)}に設定しました。",
+                color=discord.Color.green()
+            )
+            await interaction.response.send_message(embed=embed)
+            self.logger.info(f"リアクションロールのグループ設定: {msg_id} ({mode}) by {interaction.user}")
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロールのグループ設定エラー: {e}")
+            await interaction.response.send_message(
+                f"❌ グループ設定中にエラーが発生しました: {str(e)}",
+                ephemeral=True
+            )
+    
+    def _describe_group(self, group: ReactionRoleGroup) -> str:
+        """グループ設定の説明"""
+        if group.exclusive:
+            text = "1つだけ選択"
+        elif group.max_roles:
+            text = f"{group.max_roles}つまで選択"
+        else:
+            text = "制限なし"
+        if group.required_role_id:
+            text += f"（<@&{group.required_role_id}> が必要）"
+        return text
     
     async def _add_reaction_role(self, interaction: discord.Interaction, message_id: Optional[str], 
                                emoji: Optional[str], role: Optional[discord.Role]):
@@ -82,25 +227,17 @@ class ReactionRolesCog(commands.Cog):
         
         try:
             # メッセージIDの変換
-            try:
-                msg_id = int(message_id)
-            except ValueError:
+            reference = parse_message_reference(message_id)
+            if reference is None:
                 await interaction.followup.send(
                     "❌ 無効なメッセージIDです。",
                     ephemeral=True
                 )
                 return
+            channel_id, msg_id = reference
             
             # メッセージの取得
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(msg_id)
-                    break
-                except discord.NotFound:
-                    continue
-                except discord.Forbidden:
-                    continue
+            message = await self.locator.locate(interaction.guild, msg_id, channel_id)
             
             if not message:
                 await interaction.followup.send(
@@ -197,14 +334,14 @@ class ReactionRolesCog(commands.Cog):
         
         try:
             # メッセージIDの変換
-            try:
-                msg_id = int(message_id)
-            except ValueError:
+            reference = parse_message_reference(message_id)
+            if reference is None:
                 await interaction.followup.send(
                     "❌ 無効なメッセージIDです。",
                     ephemeral=True
                 )
                 return
+            channel_id, msg_id = reference
             
             # 絵文字の解析
             parsed_emoji = parse_emoji(emoji)
@@ -214,18 +351,16 @@ class ReactionRolesCog(commands.Cog):
             else:
                 emoji_str = parsed_emoji
             
+            # 最後の設定を削除すると保存済みのチャンネルも分からなくなるため先に取得
+            if channel_id is None:
+                channel_id = await self.bot.db.get_reaction_role_channel(msg_id)
+            
             # データベースから削除
             success = await self.bot.db.remove_reaction_role(msg_id, emoji_str)
             
             if success:
                 # メッセージからリアクションも削除
-                message = None
-                for channel in interaction.guild.text_channels:
-                    try:
-                        message = await channel.fetch_message(msg_id)
-                        break
-                    except (discord.NotFound, discord.Forbidden):
-                        continue
+                message = await self.locator.locate(interaction.guild, msg_id, channel_id)
                 
                 if message:
                     try:
@@ -277,18 +412,19 @@ class ReactionRolesCog(commands.Cog):
             
             # メッセージとロールの存在確認
             valid_entries = []
+            stale_entries = []
             for rr in reaction_roles:
                 # ロールの確認
                 role = interaction.guild.get_role(rr['role_id'])
                 if not role:
-                    # 存在しないロールのエントリを削除
-                    await self.bot.db.remove_reaction_role(rr['message_id'], rr['emoji'])
+                    # 存在しないロールのエントリは後でまとめて削除
+                    stale_entries.append((rr['message_id'], rr['emoji']))
                     continue
                 
                 # チャンネルの確認
                 channel = interaction.guild.get_channel(rr['channel_id'])
                 if not channel:
-                    await self.bot.db.remove_reaction_role(rr['message_id'], rr['emoji'])
+                    stale_entries.append((rr['message_id'], rr['emoji']))
                     continue
                 
                 # メッセージの確認（非同期なので軽量チェックのみ）
@@ -299,6 +435,9 @@ class ReactionRolesCog(commands.Cog):
                     'role': role
                 })
             
+            # 無効なエントリを1回のコミットで削除
+            await self.bot.db.remove_reaction_roles_bulk(stale_entries)
+            
             if not valid_entries:
                 embed = create_embed(
                     title="📋 リアクションロール一覧",
@@ -312,8 +451,10 @@ class ReactionRolesCog(commands.Cog):
             rr_list = []
             for entry in valid_entries:
                 channel_name = entry['channel'].name
+                group = self.bot.db.reaction_role_index.get_group(entry['message_id'])
+                group_text = f" [{self._describe_group(group)}]" if group else ""
                 rr_list.append(
-                    f"**#{channel_name}** - メッセージ `{entry['message_id']}`\n"
+                    f"**#{channel_name}** - メッセージ `{entry['message_id']}`{group_text}\n"
                     f"　{entry['emoji']} → {format_role(entry['role'])}"
                 )
             
@@ -362,14 +503,14 @@ class ReactionRolesCog(commands.Cog):
         
         try:
             # メッセージIDの変換
-            try:
-                msg_id = int(message_id)
-            except ValueError:
+            reference = parse_message_reference(message_id)
+            if reference is None:
                 await interaction.followup.send(
                     "❌ 無効なメッセージIDです。",
                     ephemeral=True
                 )
                 return
+            channel_id, msg_id = reference
             
             # 該当メッセージのリアクションロールを取得
             all_rr = await self.bot.db.get_all_reaction_roles(interaction.guild.id)
@@ -382,21 +523,16 @@ class ReactionRolesCog(commands.Cog):
                 )
                 return
             
-            # 削除の実行
-            removed_count = 0
-            for rr in target_rr:
-                success = await self.bot.db.remove_reaction_role(msg_id, rr['emoji'])
-                if success:
-                    removed_count += 1
+            # 削除の実行（1回のコミットでまとめて削除）
+            removed_count = await self.bot.db.remove_reaction_roles_bulk(
+                [(msg_id, rr['emoji']) for rr in target_rr]
+            )
+            await self.bot.db.remove_reaction_role_group(msg_id)
             
             # メッセージからすべてのリアクションを削除
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(msg_id)
-                    break
-                except (discord.NotFound, discord.Forbidden):
-                    continue
+            message = await self.locator.locate(
+                interaction.guild, msg_id, channel_id or target_rr[0]['channel_id']
+            )
             
             if message:
                 try:
@@ -420,16 +556,80 @@ class ReactionRolesCog(commands.Cog):
                 ephemeral=True
             )
     
+    async def _sync_reaction_roles(self, interaction: discord.Interaction):
+        """リアクションとロールの付与状況を同期"""
+        
+        # モデレーター権限チェック
+        if not (interaction.user.guild_permissions.manage_roles or 
+                interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message(
+                "❌ このコマンドを実行するにはロール管理権限が必要です。",
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer()
+        
+        try:
+            result = await self.reconciler.reconcile_guild(interaction.guild)
+            
+            embed = create_embed(
+                title="✅ リアクションロール同期完了",
+                color=discord.Color.green(),
+                fields=[
+                    {"name": "確認したメッセージ", "value": f"{result.messages}件", "inline": True},
+                    {"name": "付与", "value": f"{result.roles_added}件", "inline": True},
+                    {"name": "解除", "value": f"{result.roles_removed}件", "inline": True},
+                    {"name": "変更したメンバー", "value": f"{result.members_changed}人", "inline": True}
+                ]
+            )
+            if result.missing_messages:
+                embed.add_field(
+                    name="⚠️ 見つからないメッセージ",
+                    value=f"{result.missing_messages}件（このメッセージのロールは解除していません）",
+                    inline=False
+                )
+            if result.failures:
+                embed.add_field(name="⚠️ 失敗", value=f"{result.failures}人", inline=False)
+            
+            await interaction.followup.send(embed=embed)
+            self.logger.info(f"リアクションロール同期 by {interaction.user}")
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロール同期エラー: {e}")
+            await interaction.followup.send(
+                f"❌ リアクションロール同期中にエラーが発生しました: {str(e)}",
+                ephemeral=True
+            )
+    
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """起動・再接続時に停止中のリアクションを反映"""
+        if not self.reconcile_on_ready:
+            return
+        
+        try:
+            result = await self.reconciler.reconcile_all()
+            self.logger.info(
+                f"リアクションロール同期完了: 付与{result.roles_added}件, 解除{result.roles_removed}件"
+            )
+        except Exception as e:
+            self.logger.error(f"リアクションロール同期エラー: {e}")
+    
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
         """リアクション追加時のイベント"""
         if payload.user_id == self.bot.user.id:
             return  # Bot自身のリアクションは無視
         
+        # リアクションロール対象外のメッセージはDBを参照せずに除外
+        if not self.bot.db.is_reaction_role_message(payload.message_id):
+            return
+        
         try:
             # リアクションロールの確認
             emoji_str = str(payload.emoji)
-            role_id = await self.bot.db.get_reaction_role(payload.message_id, emoji_str)
+            role_id = self.bot.db.reaction_role_index.get(payload.message_id, emoji_str)
             
             if not role_id:
                 return  # 設定されていないリアクション
@@ -449,24 +649,86 @@ class ReactionRolesCog(commands.Cog):
                 await self.bot.db.remove_reaction_role(payload.message_id, emoji_str)
                 return
             
-            # ロールを付与
-            if role not in member.roles:
-                await member.add_roles(role, reason="リアクションロール")
-                self.logger.info(f"リアクションロール付与: {role.name} to {member.display_name}")
+            self.reconciler.touch(payload.guild_id, payload.user_id)
+            
+            # グループのルールをメモリ上のロールで確認
+            group = self.bot.db.reaction_role_index.get_group(payload.message_id)
+            if group and not self._apply_group_rules(member, payload, role, group):
+                return
+            
+            # ロールの付与を予約（短時間の変更はまとめて適用）
+            self.role_changes.request(member, role, add=True)
                 
         except Exception as e:
             self.logger.error(f"リアクション追加処理エラー: {e}")
     
+    def _apply_group_rules(self, member: discord.Member, payload: discord.RawReactionActionEvent,
+                           role: discord.Role, group: ReactionRoleGroup) -> bool:
+        """グループのルールを確認し、ロールを付与してよいかを返す
+        
+        排他グループでは他のロールの解除を同じまとめ適用に入れるため、入れ替えは1回のAPI呼び出しになる。
+        付与できないリアクションと入れ替えで不要になったリアクションはバックグラウンドで外す。
+        """
+        held = self.role_changes.effective_role_ids(member)
+        
+        if group.required_role_id and group.required_role_id not in held:
+            self._enqueue_stale_reaction(payload, str(payload.emoji), role.id)
+            return False
+        
+        limit = group.limit
+        if not limit:
+            return True
+        
+        others = {
+            emoji: role_id
+            for emoji, role_id in self.bot.db.reaction_role_index.roles_for(payload.message_id).items()
+            if role_id != role.id and role_id in held
+        }
+        
+        if group.exclusive:
+            for emoji, role_id in others.items():
+                self.role_changes.request(member, discord.Object(id=role_id), add=False)
+                self._enqueue_stale_reaction(payload, emoji, role_id)
+            return True
+        
+        if len(others) >= limit:
+            self._enqueue_stale_reaction(payload, str(payload.emoji), role.id)
+            return False
+        return True
+    
+    def _enqueue_stale_reaction(self, payload: discord.RawReactionActionEvent, emoji: str, role_id: int):
+        """メンバーのリアクションを削除待ちに追加"""
+        self.reaction_cleanup.enqueue(StaleReaction(
+            guild_id=payload.guild_id,
+            channel_id=payload.channel_id,
+            message_id=payload.message_id,
+            emoji=emoji,
+            user_id=payload.user_id,
+            role_id=role_id
+        ))
+    
+    def _is_stale_reaction(self, item: StaleReaction) -> bool:
+        """削除の直前に、メンバーがそのロールを選び直していないか確認"""
+        guild = self.bot.get_guild(item.guild_id)
+        member = guild.get_member(item.user_id) if guild else None
+        if member is None:
+            return True
+        return item.role_id not in self.role_changes.effective_role_ids(member)
+    
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
         """リアクション削除時のイベント"""
         if payload.user_id == self.bot.user.id:
             return  # Bot自身のリアクションは無視
         
+        # リアクションロール対象外のメッセージはDBを参照せずに除外
+        if not self.bot.db.is_reaction_role_message(payload.message_id):
+            return
+        
         try:
             # リアクションロールの確認
             emoji_str = str(payload.emoji)
-            role_id = await self.bot.db.get_reaction_role(payload.message_id, emoji_str)
+            role_id = self.bot.db.reaction_role_index.get(payload.message_id, emoji_str)
             
             if not role_id:
                 return  # 設定されていないリアクション
@@ -486,10 +748,10 @@ class ReactionRolesCog(commands.Cog):
                 await self.bot.db.remove_reaction_role(payload.message_id, emoji_str)
                 return
             
-            # ロールを削除
-            if role in member.roles:
-                await member.remove_roles(role, reason="リアクションロール解除")
-                self.logger.info(f"リアクションロール削除: {role.name} from {member.display_name}")
+            self.reconciler.touch(payload.guild_id, payload.user_id)
+            
+            # ロールの解除を予約（短時間の変更はまとめて適用）
+            self.role_changes.request(member, role, add=False)
                 
         except Exception as e:
             self.logger.error(f"リアクション削除処理エラー: {e}")
@@ -227,13 +227,16 @@ class RoleManagementCog(commands.Cog):
             
             # 現在存在するロールをフィルタリング
             valid_roles = []
+            missing_role_ids = []
             for role_data in sub_roles_data:
                 role = interaction.guild.get_role(role_data['role_id'])
                 if role:
                     valid_roles.append(role)
                 else:
-                    # 存在しないロールをデータベースから削除
-                    await self.bot.db.remove_sub_role(interaction.guild.id, role_data['role_id'])
+                    missing_role_ids.append(role_data['role_id'])
+            
+            # 存在しないロールをデータベースからまとめて削除
+            await self.bot.db.remove_sub_roles_bulk(interaction.guild.id, missing_role_ids)
             
             if not valid_roles:
                 embed = create_embed(
@@ -0,0 +1,588 @@
+"""
+ロールパネル（ボタン・セレクトメニュー）機能のCog
+"""
+
+import re
+import discord
+from discord.ext import commands
+from discord import app_commands
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.helpers import create_embed, truncate_text
+from utils.logger import get_logger
+from utils.message_locator import MessageLocator, parse_message_reference
+from database.cache import RolePanel, RolePanelItem
+
+# ボタン・セレクトメニューの custom_id（メッセージIDは含めず、ビューをメッセージに紐付ける）
+PANEL_BUTTON_PREFIX = "role_panel:role:"
+PANEL_SELECT_ID = "role_panel:select"
+
+# 1つのパネルに置けるロールの数（ボタン5行×5個、セレクトメニューの選択肢25個）
+MAX_PANEL_ITEMS = 25
+
+# ロール指定の区切り（メンション・ID・ロール名を空白またはカンマで区切る）
+ROLE_TOKEN_PATTERN = re.compile(r'<@&(\d+)>|[^\s,]+')
+
+# ボタン・セレクトメニューの選択肢のラベルの最大長（ロール名は100文字まで）
+MAX_LABEL_LENGTH = 80
+
+PANEL_STYLES = {
+    "buttons": "ボタン",
+    "select": "セレクトメニュー"
+}
+
+class RolePanelButton(discord.ui.Button):
+    """ロールを付け外しするボタン"""
+
+    def __init__(self, cog: 'RolePanelsCog', item: RolePanelItem):
+        super().__init__(
+            label=item.label[:MAX_LABEL_LENGTH],
+            emoji=discord.PartialEmoji.from_str(item.emoji) if item.emoji else None,
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"{PANEL_BUTTON_PREFIX}{item.role_id}"
+        )
+        self.cog = cog
+        self.role_id = item.role_id
+
+    async def callback(self, interaction: discord.Interaction):
+        await self.cog.handle_button(interaction, self.role_id)
+
+class RolePanelSelect(discord.ui.Select):
+    """選んだロールに置き換えるセレクトメニュー"""
+
+    def __init__(self, cog: 'RolePanelsCog', items: Sequence[RolePanelItem], max_roles: int):
+        super().__init__(
+            placeholder="ロールを選択してください",
+            min_values=0,
+            max_values=min(max_roles or len(items), len(items)),
+            options=[
+                discord.SelectOption(
+                    label=item.label[:MAX_LABEL_LENGTH],
+                    value=str(item.role_id),
+                    emoji=discord.PartialEmoji.from_str(item.emoji) if item.emoji else None
+                )
+                for item in items
+            ],
+            custom_id=PANEL_SELECT_ID
+        )
+        self.cog = cog
+
+    async def callback(self, interaction: discord.Interaction):
+        await self.cog.handle_select(interaction, [int(value) for value in self.values])
+
+class RolePanelView(discord.ui.View):
+    """ロールパネルの永続ビュー"""
+
+    def __init__(self, cog: 'RolePanelsCog', style: str, items: Sequence[RolePanelItem], max_roles: int = 0):
+        super().__init__(timeout=None)
+        if style == "select":
+            self.add_item(RolePanelSelect(cog, items, max_roles))
+        else:
+            for item in items:
+                self.add_item(RolePanelButton(cog, item))
+
+class RolePanelsCog(commands.Cog):
+    """ロールパネル機能"""
+
+    panel_group = app_commands.Group(name="panel", description="ボタン・セレクトメニューのロールパネルを管理します")
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.logger = get_logger(__name__)
+        self.locator = MessageLocator(bot.db)
+
+        # クリックごとの変更は待たずに1回の member.edit で適用（連打は前回の結果を基準にする）
+        # リアクションロールと共有し、同じメンバーへの変更が互いに上書きしないようにする
+        self.role_changes = bot.role_changes
+
+        # メッセージID -> 登録済みのビュー
+        self._views: Dict[int, RolePanelView] = {}
+
+    async def cog_load(self):
+        """起動時（setup_hook 内）に保存済みのパネルを永続ビューとして登録"""
+        # パネルは Database.initialize で1回のクエリにより読み込み済み
+        for panel in self.bot.db.role_panel_index:
+            self._register_view(panel)
+        self.logger.info(f"ロールパネルのビューを登録しました: {len(self._views)}件")
+
+    async def cog_unload(self):
+        """Cog終了時の処理"""
+        for view in self._views.values():
+            view.stop()
+        self._views.clear()
+
+    def _register_view(self, panel: RolePanel):
+        """パネルのビューをメッセージに紐付けて登録"""
+        old = self._views.pop(panel.message_id, None)
+        if old:
+            old.stop()
+        if not panel.items:
+            return
+        view = RolePanelView(self, panel.style, panel.items, panel.max_roles)
+        self.bot.add_view(view, message_id=panel.message_id)
+        self._views[panel.message_id] = view
+
+    def _unregister_view(self, message_id: int):
+        """パネルのビューの登録を解除"""
+        view = self._views.pop(message_id, None)
+        if view:
+            view.stop()
+
+    # --- クリックの処理 ---
+
+    def _resolve_panel(self, interaction: discord.Interaction) -> Tuple[Optional[RolePanel], Optional[str]]:
+        """クリックされたパネルをインメモリ索引から取得し、使えない場合は理由を返す"""
+        panel = self.bot.db.role_panel_index.get(interaction.message.id) if interaction.message else None
+        if panel is None:
+            return None, "❌ このパネルは無効になっています。"
+
+        if panel.required_role_id and not interaction.user.get_role(panel.required_role_id):
+            return None, f"❌ このパネルを使うには <@&{panel.required_role_id}> が必要です。"
+
+        return panel, None
+
+    async def handle_button(self, interaction: discord.Interaction, role_id: int):
+        """ボタンのクリックでロールを付け外し"""
+        try:
+            panel, error = self._resolve_panel(interaction)
+            if error is None and role_id not in panel.role_ids:
+                error = "❌ このロールはパネルから削除されています。"
+            role = interaction.guild.get_role(role_id)
+            if error is None and (role is None or not role.is_assignable()):
+                error = "❌ このロールは現在付与できません。管理者にお知らせください。"
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+
+            member = interaction.user
+            held = self.role_changes.effective_role_ids(member)
+
+            if role_id in held:
+                changes = {role_id: False}
+                result = f"✅ {role.mention} を外しました。"
+            else:
+                changes = {role_id: True}
+                result = f"✅ {role.mention} を付与しました。"
+                others = [other for other in panel.role_ids if other in held and other != role_id]
+                if panel.max_roles == 1:
+                    # 1つだけ選べるパネルは選び直すと入れ替え
+                    changes.update({other: False for other in others})
+                elif panel.max_roles and len(others) >= panel.max_roles:
+                    await interaction.response.send_message(
+                        f"❌ このパネルで選べるロールは{panel.max_roles}つまでです。",
+                        ephemeral=True
+                    )
+                    return
+
+            await self._apply(interaction, member, changes, result)
+
+        except Exception as e:
+            self.logger.error(f"ロールパネルのボタン処理エラー: {e}")
+            await self._send_error(interaction)
+
+    async def handle_select(self, interaction: discord.Interaction, selected_ids: List[int]):
+        """セレクトメニューで選んだロールに置き換え"""
+        try:
+            panel, error = self._resolve_panel(interaction)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+
+            member = interaction.user
+            held = self.role_changes.effective_role_ids(member)
+            selected = set(selected_ids) & panel.role_ids
+
+            changes = {}
+            for role_id in panel.role_ids:
+                role = interaction.guild.get_role(role_id)
+                if role is None or not role.is_assignable():
+                    continue
+                if (role_id in selected) != (role_id in held):
+                    changes[role_id] = role_id in selected
+
+            added = [f"<@&{role_id}>" for role_id, add in changes.items() if add]
+            removed = [f"<@&{role_id}>" for role_id, add in changes.items() if not add]
+            lines = []
+            if added:
+                lines.append(f"付与: {' '.join(added)}")
+            if removed:
+                lines.append(f"解除: {' '.join(removed)}")
+            result = "✅ ロールを更新しました。\n" + "\n".join(lines) if lines else "✅ 変更はありません。"
+
+            await self._apply(interaction, member, changes, result)
+
+        except Exception as e:
+            self.logger.error(f"ロールパネルのセレクト処理エラー: {e}")
+            await self._send_error(interaction)
+
+    async def _send_error(self, interaction: discord.Interaction):
+        """クリックの処理に失敗したことを応答"""
+        message = "❌ エラーが発生しました。管理者にお知らせください。"
+        try:
+            if interaction.response.is_done():
+                await interaction.followup.send(message, ephemeral=True)
+            else:
+                await interaction.response.send_message(message, ephemeral=True)
+        except discord.HTTPException:
+            pass
+
+    async def _apply(self, interaction: discord.Interaction, member: discord.Member,
+                     changes: Dict[int, bool], result: str):
+        """変更を1回の member.edit で適用して応答"""
+        if not changes:
+            await interaction.response.send_message(result, ephemeral=True)
+            return
+
+        # レート制限で適用が遅れても応答期限（3秒）を過ぎないよう先に応答を保留する
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        applied = await self.role_changes.apply(member, changes, reason="ロールパネル")
+        if applied is None:
+            result = "❌ ロールの変更に失敗しました。管理者にお知らせください。"
+        await interaction.followup.send(result, ephemeral=True)
+
+    # --- 管理コマンド ---
+
+    async def _check_permission(self, interaction: discord.Interaction) -> bool:
+        """ロール管理権限の確認"""
+        if (interaction.user.guild_permissions.manage_roles or
+                interaction.user.guild_permissions.administrator):
+            return True
+        await interaction.response.send_message(
+            "❌ このコマンドを実行するにはロール管理権限が必要です。",
+            ephemeral=True
+        )
+        return False
+
+    async def _validate_roles(self, roles: Sequence[discord.Role]) -> Optional[str]:
+        """パネルに置けないロールがあれば理由を返す"""
+        if not roles:
+            return "❌ ロールを1つ以上指定してください。"
+        if len(roles) > MAX_PANEL_ITEMS:
+            return f"❌ 1つのパネルに置けるロールは{MAX_PANEL_ITEMS}個までです。"
+        for role in roles:
+            if await self.bot.is_core_role(role):
+                return f"❌ 基幹ロール `{role.name}` はロールパネルに設定できません。サブロールのみ設定可能です。"
+            if not role.is_assignable():
+                return f"❌ ロール `{role.name}` はBotが付与できません。"
+        return None
+
+    def _parse_roles(self, guild: discord.Guild, text: str) -> Tuple[List[discord.Role], List[str]]:
+        """メンション・ID・ロール名の並びをロールに変換（見つからないものは別に返す）"""
+        roles: List[discord.Role] = []
+        missing: List[str] = []
+        for match in ROLE_TOKEN_PATTERN.finditer(text):
+            token = match.group(1) or match.group(0)
+            if token.isdigit():
+                role = guild.get_role(int(token))
+            else:
+                role = discord.utils.get(guild.roles, name=token)
+            if role is None:
+                missing.append(match.group(0))
+            elif role not in roles:
+                roles.append(role)
+        return roles, missing
+
+    def _panel_embed(self, title: str, items: Sequence[RolePanelItem], style: str,
+                     max_roles: int, required_role_id: Optional[int],
+                     description: Optional[str] = None) -> discord.Embed:
+        """パネルの説明のEmbed"""
+        lines = [description] if description else []
+        lines.extend(
+            f"{item.emoji + ' ' if item.emoji else ''}<@&{item.role_id}>" for item in items
+        )
+
+        if style == "select":
+            footer = "メニューで選んだロールに置き換わります"
+        else:
+            footer = "ボタンを押すとロールを付け外しできます"
+        if max_roles == 1:
+            footer += "（1つだけ選択）"
+        elif max_roles:
+            footer += f"（{max_roles}つまで選択）"
+
+        fields = []
+        if required_role_id:
+            fields.append({"name": "必要なロール", "value": f"<@&{required_role_id}>", "inline": False})
+
+        return create_embed(
+            title=title,
+            description="\n".join(lines),
+            color=discord.Color.blue(),
+            footer={"text": footer},
+            fields=fields
+        )
+
+    @panel_group.command(name="create", description="ロールパネルを作成します")
+    @app_commands.describe(
+        style="パネルの種類",
+        title="パネルのタイトル",
+        roles="パネルに置くロール（メンション・ID・ロール名を空白またはカンマで区切る）",
+        description="パネルの説明文",
+        max_roles="同時に選べるロールの数（1で入れ替え、省略で無制限）",
+        required_role="パネルを使うために必要なロール",
+        channel="パネルを送信するチャンネル"
+    )
+    @app_commands.choices(style=[
+        app_commands.Choice(name="ボタン", value="buttons"),
+        app_commands.Choice(name="セレクトメニュー", value="select")
+    ])
+    async def panel_create(
+        self,
+        interaction: discord.Interaction,
+        style: str,
+        title: str,
+        roles: str,
+        description: Optional[str] = None,
+        max_roles: Optional[app_commands.Range[int, 1, 25]] = None,
+        required_role: Optional[discord.Role] = None,
+        channel: Optional[discord.TextChannel] = None
+    ):
+        """ロールパネルを作成"""
+        if not await self._check_permission(interaction):
+            return
+
+        panel_roles, missing = self._parse_roles(interaction.guild, roles)
+        if missing:
+            await interaction.response.send_message(
+                f"❌ ロールが見つかりません: {', '.join(missing)}",
+                ephemeral=True
+            )
+            return
+
+        error = await self._validate_roles(panel_roles)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+
+        target = channel or interaction.channel
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            items = tuple(RolePanelItem(role.id, role.name) for role in panel_roles)
+            required_role_id = required_role.id if required_role else None
+            max_roles = max_roles or 0
+
+            embed = self._panel_embed(title, items, style, max_roles, required_role_id, description)
+            message = await target.send(embed=embed, view=RolePanelView(self, style, items, max_roles))
+
+            panel = RolePanel(
+                message.id, interaction.guild.id, target.id, style, title,
+                items, max_roles, required_role_id
+            )
+            if not await self.bot.db.add_role_panel(panel):
+                await message.delete()
+                await interaction.followup.send("❌ データベースへの保存に失敗しました。", ephemeral=True)
+                return
+
+            self._register_view(panel)
+            await interaction.followup.send(
+                f"✅ {target.mention} にロールパネルを作成しました（{len(items)}個のロール）。\n{message.jump_url}",
+                ephemeral=True
+            )
+            self.logger.info(f"ロールパネル作成: {message.id} ({style}, {len(items)}件) by {interaction.user}")
+
+        except discord.Forbidden:
+            await interaction.followup.send(
+                f"❌ {target.mention} にメッセージを送信する権限がありません。",
+                ephemeral=True
+            )
+        except Exception as e:
+            self.logger.error(f"ロールパネル作成エラー: {e}")
+            await interaction.followup.send(
+                f"❌ ロールパネル作成中にエラーが発生しました: {str(e)}",
+                ephemeral=True
+            )
+
+    @panel_group.command(name="migrate", description="リアクションロールのメッセージをロールパネルに移行します")
+    @app_commands.describe(
+        message_id="リアクションロールを設定したメッセージのID・リンク・チャンネルID:メッセージID",
+        style="パネルの種類",
+        title="パネルのタイトル（新しくパネルを送信する場合）",
+        clear_reactions="移行元のメッセージのリアクションを外すか"
+    )
+    @app_commands.choices(style=[
+        app_commands.Choice(name="ボタン", value="buttons"),
+        app_commands.Choice(name="セレクトメニュー", value="select")
+    ])
+    async def panel_migrate(
+        self,
+        interaction: discord.Interaction,
+        message_id: str,
+        style: str = "buttons",
+        title: str = "ロールを選択",
+        clear_reactions: bool = True
+    ):
+        """リアクションロールをロールパネルに移行
+
+        Botのメッセージにはそのままボタン・メニューを付け、それ以外のメッセージの
+        場合は同じチャンネルに新しくパネルを送信する。グループ設定（1つだけ・上限・
+        必須ロール）はパネルに引き継ぐ。
+        """
+        if not await self._check_permission(interaction):
+            return
+
+        reference = parse_message_reference(message_id)
+        if reference is None:
+            await interaction.response.send_message("❌ 無効なメッセージIDです。", ephemeral=True)
+            return
+        channel_id, msg_id = reference
+
+        index = self.bot.db.reaction_role_index
+        entries = index.roles_for(msg_id)
+        if not entries:
+            await interaction.response.send_message(
+                "❌ 指定されたメッセージにリアクションロール設定はありません。",
+                ephemeral=True
+            )
+            return
+
+        items = []
+        for emoji, role_id in entries.items():
+            role = interaction.guild.get_role(role_id)
+            if role is not None:
+                items.append(RolePanelItem(role.id, role.name, emoji))
+
+        error = await self._validate_roles([interaction.guild.get_role(item.role_id) for item in items])
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            source = await self.locator.locate(interaction.guild, msg_id, channel_id)
+            if source is None:
+                await interaction.followup.send("❌ 指定されたメッセージが見つかりません。", ephemeral=True)
+                return
+
+            group = index.get_group(msg_id)
+            max_roles = 0
+            required_role_id = None
+            if group:
+                max_roles = 1 if group.exclusive else group.max_roles
+                required_role_id = group.required_role_id
+
+            items = tuple(items)
+            view = RolePanelView(self, style, items, max_roles)
+            in_place = source.author.id == self.bot.user.id
+            if in_place:
+                # Botのメッセージにはそのままコンポーネントを付ける
+                panel_message = source
+                await source.edit(view=view)
+                title = source.embeds[0].title if source.embeds and source.embeds[0].title else title
+            else:
+                embed = self._panel_embed(title, items, style, max_roles, required_role_id)
+                panel_message = await source.channel.send(embed=embed, view=view)
+
+            panel = RolePanel(
+                panel_message.id, interaction.guild.id, panel_message.channel.id, style, title,
+                items, max_roles, required_role_id
+            )
+            if not await self.bot.db.migrate_reaction_roles_to_panel(msg_id, panel):
+                if in_place:
+                    await source.edit(view=None)
+                else:
+                    await panel_message.delete()
+                await interaction.followup.send("❌ データベースへの保存に失敗しました。", ephemeral=True)
+                return
+
+            self._register_view(panel)
+
+            notes = []
+            if clear_reactions:
+                try:
+                    await source.clear_reactions()
+                except discord.HTTPException:
+                    notes.append("⚠️ 移行元のリアクションを外せませんでした（メッセージ管理権限が必要です）。")
+
+            await interaction.followup.send(
+                "\n".join([
+                    f"✅ リアクションロール{len(items)}件をロールパネルに移行しました。",
+                    panel_message.jump_url,
+                    *notes
+                ]),
+                ephemeral=True
+            )
+            self.logger.info(f"リアクションロールをロールパネルに移行: {msg_id} -> {panel_message.id} by {interaction.user}")
+
+        except Exception as e:
+            self.logger.error(f"ロールパネル移行エラー: {e}")
+            await interaction.followup.send(
+                f"❌ ロールパネル移行中にエラーが発生しました: {str(e)}",
+                ephemeral=True
+            )
+
+    @panel_group.command(name="delete", description="ロールパネルを削除します")
+    @app_commands.describe(message_id="パネルのメッセージID・リンク・チャンネルID:メッセージID")
+    async def panel_delete(self, interaction: discord.Interaction, message_id: str):
+        """ロールパネルを削除（メッセージは残し、ボタン・メニューを外す）"""
+        if not await self._check_permission(interaction):
+            return
+
+        reference = parse_message_reference(message_id)
+        panel = self.bot.db.role_panel_index.get(reference[1]) if reference else None
+        if panel is None or panel.guild_id != interaction.guild.id:
+            await interaction.response.send_message("❌ 指定されたロールパネルはありません。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            if not await self.bot.db.remove_role_panel(panel.message_id):
+                await interaction.followup.send("❌ データベースからの削除に失敗しました。", ephemeral=True)
+                return
+            self._unregister_view(panel.message_id)
+
+            channel = interaction.guild.get_channel_or_thread(panel.channel_id)
+            if channel is not None:
+                try:
+                    await channel.get_partial_message(panel.message_id).edit(view=None)
+                except discord.HTTPException:
+                    pass
+
+            await interaction.followup.send(f"✅ ロールパネル `{panel.message_id}` を削除しました。", ephemeral=True)
+            self.logger.info(f"ロールパネル削除: {panel.message_id} by {interaction.user}")
+
+        except Exception as e:
+            self.logger.error(f"ロールパネル削除エラー: {e}")
+            await interaction.followup.send(
+                f"❌ ロールパネル削除中にエラーが発生しました: {str(e)}",
+                ephemeral=True
+            )
+
+    @panel_group.command(name="list", description="ロールパネルの一覧を表示します")
+    async def panel_list(self, interaction: discord.Interaction):
+        """ロールパネルの一覧"""
+        panels = [panel for panel in self.bot.db.role_panel_index if panel.guild_id == interaction.guild.id]
+        if not panels:
+            description = "設定されているロールパネルはありません。"
+        else:
+            lines = []
+            for panel in panels:
+                roles = " ".join(f"<@&{item.role_id}>" for item in panel.items)
+                lines.append(
+                    f"**{panel.title}** ({PANEL_STYLES.get(panel.style, panel.style)}) - "
+                    f"<#{panel.channel_id}> `{panel.message_id}`\n　{roles}"
+                )
+            description = truncate_text("\n\n".join(lines), 4096)
+
+        embed = create_embed(
+            title="📋 ロールパネル一覧",
+            description=description,
+            color=discord.Color.blue(),
+            footer={"text": f"総数: {len(panels)}個のパネル"}
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """パネルのメッセージが削除されたら設定も削除"""
+        if self.bot.db.role_panel_index.get(payload.message_id) is None:
+            return
+
+        self._unregister_view(payload.message_id)
+        await self.bot.db.remove_role_panel(payload.message_id)
+        self.logger.info(f"削除されたメッセージのロールパネルを削除: {payload.message_id}")
+
+async def setup(bot):
+    await bot.add_cog(RolePanelsCog(bot))
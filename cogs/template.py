@@ -169,9 +169,8 @@ class TemplateCog(commands.Cog):
             if role == guild.default_role or role >= bot_role:
                 continue
             
-            # 基幹ロールかサブロールかを判定
+            # 基幹ロールのみテンプレートに含める（サブロールは対象外）
             is_core_role = await self.bot.is_core_role(role)
-            is_sub_role = await self.bot.db.is_sub_role(guild.id, role.id)
             
             if is_core_role:
                 # 基幹ロールの場合は権限セットを推定
@@ -0,0 +1,115 @@
+"""
+期限切れログイベントの圧縮アーカイブ
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator, AsyncIterator, Optional, Tuple
+
+from .partitions import format_timestamp
+from utils.logger import get_logger
+
+class LogArchive:
+    """ギルド・月ごとの追記専用 JSONL.gz セグメントとしてログを保存する
+
+    セグメントは <root>/<guild_id>/<YYYY-MM>.jsonl.gz に置かれ、書き込みの
+    たびに新しいgzipメンバーとして追記される（連結されたgzipとして読める）。
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.logger = get_logger(__name__)
+
+    def segment_path(self, guild_id: int, month: str) -> Path:
+        """ギルドと月（YYYY-MM）に対応するセグメントファイル"""
+        return self.root / str(guild_id) / f"{month}.jsonl.gz"
+
+    def append(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """ログイベントをセグメントに追記し、書き込んだ件数を返す"""
+        segments: Dict[Tuple[int, str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            month = str(row['timestamp'])[:7]
+            segments.setdefault((row['guild_id'], month), []).append(row)
+
+        written = 0
+        for (guild_id, month), segment_rows in segments.items():
+            path = self.segment_path(guild_id, month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(path, 'at', encoding='utf-8') as file:
+                for row in segment_rows:
+                    file.write(json.dumps(row, ensure_ascii=False, default=str))
+                    file.write('\n')
+            written += len(segment_rows)
+
+        return written
+
+    def segments(self, guild_id: int, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> List[Path]:
+        """期間と重なる可能性のあるセグメントを古い順に取得"""
+        guild_dir = self.root / str(guild_id)
+        if not guild_dir.is_dir():
+            return []
+
+        start_month = start.strftime('%Y-%m') if start else None
+        end_month = end.strftime('%Y-%m') if end else None
+
+        paths = []
+        for path in sorted(guild_dir.glob('*.jsonl.gz')):
+            month = path.name[:7]
+            if start_month and month < start_month:
+                continue
+            if end_month and month > end_month:
+                continue
+            paths.append(path)
+        return paths
+
+    def iter_events(self, guild_id: int, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, user_id: Optional[int] = None,
+                    event_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """条件に合うアーカイブ済みイベントを1行ずつ読み出す（古い順）"""
+        start_str = format_timestamp(start) if start else None
+        end_str = format_timestamp(end) if end else None
+
+        for path in self.segments(guild_id, start, end):
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as file:
+                    for line in file:
+                        event = json.loads(line)
+                        timestamp = event.get('timestamp') or ''
+                        if start_str and timestamp < start_str:
+                            continue
+                        if end_str and timestamp >= end_str:
+                            continue
+                        if user_id is not None and event.get('user_id') != user_id:
+                            continue
+                        if event_type and event.get('event_type') != event_type:
+                            continue
+                        yield event
+            except (OSError, EOFError, json.JSONDecodeError) as e:
+                # 書き込み途中で壊れたセグメントは読める所まで使う
+                self.logger.error(f"アーカイブ読み込みエラー ({path}): {e}")
+
+    async def aiter_events(self, guild_id: int, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, user_id: Optional[int] = None,
+                           event_type: Optional[str] = None,
+                           batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """iter_events を別スレッドで読み進める非同期版"""
+        iterator = self.iter_events(guild_id, start, end, user_id, event_type)
+
+        def next_batch() -> List[Dict[str, Any]]:
+            batch = []
+            for event in iterator:
+                batch.append(event)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        while True:
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                return
+            for event in batch:
+                yield event
@@ -0,0 +1,175 @@
+"""
+データベース内容のインメモリキャッシュ
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Iterable, Tuple, FrozenSet, Mapping
+
+@dataclass(frozen=True)
+class ReactionRoleGroup:
+    """メッセージ内のリアクションロールをまとめるルール"""
+    # 1つだけ選べる（別のロールを選ぶと入れ替える）
+    exclusive: bool = False
+    # 同時に持てるロールの上限（0は無制限）
+    max_roles: int = 0
+    # 選ぶために必要なロール
+    required_role_id: Optional[int] = None
+
+    @property
+    def limit(self) -> int:
+        """同時に持てるロールの上限（0は無制限）"""
+        return 1 if self.exclusive else self.max_roles
+
+class ReactionRoleIndex:
+    """(message_id, emoji) -> role_id のインメモリ索引"""
+
+    def __init__(self):
+        self._messages: Dict[int, Dict[str, int]] = {}
+        self._groups: Dict[int, ReactionRoleGroup] = {}
+
+    def load(self, rows: Iterable[Tuple[int, str, int]],
+             groups: Iterable[Tuple[int, ReactionRoleGroup]] = ()):
+        """(message_id, emoji, role_id) の行とグループ設定から索引を再構築"""
+        messages: Dict[int, Dict[str, int]] = {}
+        for message_id, emoji, role_id in rows:
+            messages.setdefault(message_id, {})[emoji] = role_id
+        self._messages = messages
+        self._groups = dict(groups)
+
+    def has_message(self, message_id: int) -> bool:
+        """リアクションロールが設定されたメッセージかどうか"""
+        return message_id in self._messages
+
+    def get(self, message_id: int, emoji: str) -> Optional[int]:
+        """リアクションに対応するロールIDを取得"""
+        emojis = self._messages.get(message_id)
+        if emojis is None:
+            return None
+        return emojis.get(emoji)
+
+    def add(self, message_id: int, emoji: str, role_id: int):
+        """索引にエントリを追加"""
+        self._messages.setdefault(message_id, {})[emoji] = role_id
+
+    def remove(self, message_id: int, emoji: str):
+        """索引からエントリを削除"""
+        emojis = self._messages.get(message_id)
+        if emojis is None:
+            return
+
+        emojis.pop(emoji, None)
+        if not emojis:
+            del self._messages[message_id]
+
+    def roles_for(self, message_id: int) -> Mapping[str, int]:
+        """メッセージに設定された 絵文字 -> ロールID"""
+        return self._messages.get(message_id, {})
+
+    def get_group(self, message_id: int) -> Optional[ReactionRoleGroup]:
+        """メッセージのグループ設定を取得"""
+        return self._groups.get(message_id)
+
+    def set_group(self, message_id: int, group: ReactionRoleGroup):
+        """グループ設定を追加・更新"""
+        self._groups[message_id] = group
+
+    def remove_group(self, message_id: int):
+        """グループ設定を削除"""
+        self._groups.pop(message_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(emojis) for emojis in self._messages.values())
+
+class SubRoleCache:
+    """ギルドごとのサブロールIDの集合（必要になった時点で読み込む）"""
+
+    def __init__(self):
+        # 読み取りでコピーが発生しないよう、更新時に新しいfrozensetへ置き換える
+        self._guilds: Dict[int, FrozenSet[int]] = {}
+        # 読み込み中に書き込みがあったかを判定するための世代番号
+        self._generations: Dict[int, int] = {}
+
+    def get(self, guild_id: int) -> Optional[FrozenSet[int]]:
+        """読み込み済みならサブロールIDの集合を返す"""
+        return self._guilds.get(guild_id)
+
+    def generation(self, guild_id: int) -> int:
+        """ギルドの現在の世代番号"""
+        return self._generations.get(guild_id, 0)
+
+    def store(self, guild_id: int, role_ids: Iterable[int], generation: int) -> bool:
+        """読み込み結果を保存（読み込み中に更新があった場合は保存しない）"""
+        if self.generation(guild_id) != generation:
+            return False
+        self._guilds[guild_id] = frozenset(role_ids)
+        return True
+
+    def add(self, guild_id: int, role_id: int):
+        """サブロールの追加を反映"""
+        self._generations[guild_id] = self.generation(guild_id) + 1
+        if guild_id in self._guilds:
+            self._guilds[guild_id] = self._guilds[guild_id] | {role_id}
+
+    def discard(self, guild_id: int, role_id: int):
+        """サブロールの削除を反映"""
+        self._generations[guild_id] = self.generation(guild_id) + 1
+        if guild_id in self._guilds:
+            self._guilds[guild_id] = self._guilds[guild_id] - {role_id}
+
+    def evict(self, guild_id: int):
+        """ギルドのキャッシュを破棄"""
+        self._guilds.pop(guild_id, None)
+        self._generations[guild_id] = self.generation(guild_id) + 1
+
+@dataclass(frozen=True)
+class RolePanelItem:
+    """ロールパネルの1項目"""
+    role_id: int
+    label: str
+    emoji: Optional[str] = None
+
+@dataclass(frozen=True)
+class RolePanel:
+    """ボタンまたはセレクトメニューでロールを選ぶパネル"""
+    message_id: int
+    guild_id: int
+    channel_id: int
+    # "buttons" または "select"
+    style: str
+    title: str
+    items: Tuple[RolePanelItem, ...]
+    # 同時に選べるロールの上限（0は無制限、1はボタンでも入れ替え）
+    max_roles: int = 0
+    required_role_id: Optional[int] = None
+
+    @property
+    def role_ids(self) -> FrozenSet[int]:
+        return frozenset(item.role_id for item in self.items)
+
+class RolePanelIndex:
+    """message_id -> ロールパネル のインメモリ索引"""
+
+    def __init__(self):
+        self._panels: Dict[int, RolePanel] = {}
+
+    def load(self, panels: Iterable[RolePanel]):
+        """索引を再構築"""
+        self._panels = {panel.message_id: panel for panel in panels}
+
+    def get(self, message_id: int) -> Optional[RolePanel]:
+        """パネルを取得"""
+        return self._panels.get(message_id)
+
+    def set(self, panel: RolePanel):
+        """パネルを追加・更新"""
+        self._panels[panel.message_id] = panel
+
+    def remove(self, message_id: int):
+        """パネルを削除"""
+        self._panels.pop(message_id, None)
+
+    def __iter__(self):
+        return iter(list(self._panels.values()))
+
+    def __len__(self) -> int:
+        return len(self._panels)
@@ -4,99 +4,179 @@
 
 import aiosqlite
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable, FrozenSet
 from pathlib import Path
 
 from utils.logger import get_logger
+from .pool import ConnectionPool, build_pragma_profile, apply_pragmas
+from .cache import ReactionRoleIndex, ReactionRoleGroup, SubRoleCache, RolePanel, RolePanelItem, RolePanelIndex
+from .migrations import MigrationRunner, check_query_plans
+from .models import DatabaseSchema
+from .partitions import LogPartitionManager, format_timestamp, utc_now
+from .archive import LogArchive
+from .search import build_match_query, like_pattern
+from .rollups import UPSERT_HOURLY_COUNT, aggregate_hourly
+
+# ログ書き込みキューの停止用センチネル
+_LOG_QUEUE_STOP = object()
+
+# 現在のタスクがトランザクション中のDatabase（入れ子の transaction() を外側に合流させる）
+_active_transaction: ContextVar[Optional['Database']] = ContextVar('active_transaction', default=None)
 
 class Database:
     """データベース操作を管理するクラス"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, log_batch_size: int = 100,
+                 log_flush_interval: float = 1.0, log_queue_size: int = 10000,
+                 pool_size: int = 0, pragmas: Optional[Dict[str, Any]] = None,
+                 log_partition: str = 'day', log_cleanup_chunk_size: int = 500,
+                 log_archive_dir: Optional[str] = None):
         self.db_path = Path(db_path)
         self.logger = get_logger(__name__)
         self._connection = None
         self._lock = asyncio.Lock()
+        
+        # 書き込みはトランザクション単位で直列化する
+        self._write_lock = asyncio.Lock()
+        self._commit_callbacks: List[Callable[[], None]] = []
+        
+        # pool_size > 0 の場合はWALモードの接続プールを使用
+        self.pool_size = max(0, pool_size)
+        self._pragmas = pragmas or {}
+        self._pool: Optional[ConnectionPool] = None
+        
+        # リアクションロールのインメモリ索引
+        self.reaction_role_index = ReactionRoleIndex()
+        
+        # ロールパネルのインメモリ索引
+        self.role_panel_index = RolePanelIndex()
+        
+        # ギルドごとのサブロールIDキャッシュ
+        self._sub_role_cache = SubRoleCache()
+        
+        # ログイベントの書き込みキュー（write-behind）
+        self.log_batch_size = max(1, log_batch_size)
+        self.log_flush_interval = max(0.0, log_flush_interval)
+        self._log_queue: Optional[asyncio.Queue] = None
+        self._log_queue_size = max(1, log_queue_size)
+        self._log_writer_task: Optional[asyncio.Task] = None
+        
+        # ログイベントの時間パーティション
+        self._log_partitions = LogPartitionManager(log_partition)
+        self.log_cleanup_chunk_size = max(1, log_cleanup_chunk_size)
+        self._last_log_id = 0
+        
+        # 削除前に期限切れログを書き出すアーカイブ（未設定なら無効）
+        self.log_archive: Optional[LogArchive] = LogArchive(log_archive_dir) if log_archive_dir else None
     
     async def initialize(self):
         """データベースの初期化"""
         self.logger.info(f"データベースを初期化しています: {self.db_path}")
         
         async with aiosqlite.connect(self.db_path) as db:
-            await self._create_tables(db)
-            await db.commit()
+            await self._migrate(db)
+        
+        self._start_log_writer()
+        await self.load_reaction_role_index()
+        await self.load_role_panels()
         
         self.logger.info("データベースの初期化が完了しました")
     
-    async def _create_tables(self, db: aiosqlite.Connection):
-        """テーブルの作成"""
-        
-        # リアクションロールテーブル
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS reaction_roles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                message_id INTEGER NOT NULL,
-                emoji TEXT NOT NULL,
-                role_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(message_id, emoji)
-            )
-        """)
-        
-        # ウェルカムゲートテーブル
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS welcome_gates (
-                guild_id INTEGER PRIMARY KEY,
-                channel_id INTEGER NOT NULL,
-                message_id INTEGER,
-                initial_role_id INTEGER NOT NULL,
-                final_role_id INTEGER NOT NULL,
-                message_content TEXT NOT NULL,
-                enabled BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    async def _migrate(self, db: aiosqlite.Connection):
+        """スキーママイグレーションの適用とクエリ計画の確認"""
+        version = await MigrationRunner().run(db)
+        self.logger.info(f"スキーマバージョン: {version}")
         
-        # ログイベントテーブル
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS log_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                event_type TEXT NOT NULL,
-                user_id INTEGER,
-                channel_id INTEGER,
-                message_id INTEGER,
-                content TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                additional_data TEXT
-            )
-        """)
+        # ログイベントのパーティションと採番状態を読み込む
+        await self._log_partitions.load(db)
+        current_table = self._log_partitions.table_for(format_timestamp(utc_now()))
+        await self._log_partitions.ensure(db, current_table)
+        await db.commit()
+        self._last_log_id = await self._load_last_log_id(db)
         
-        # サブロールテーブル
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS sub_roles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                role_id INTEGER NOT NULL,
-                role_name TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(guild_id, role_id)
-            )
-        """)
+        problems = await check_query_plans(db, log_table=current_table)
+        for name, steps in problems.items():
+            self.logger.warning(f"クエリ '{name}' がインデックスを使用していません: {'; '.join(steps)}")
     
     async def get_connection(self) -> aiosqlite.Connection:
-        """データベース接続を取得"""
+        """データベース接続を取得（プールモードでは書き込み用接続）"""
         async with self._lock:
+            if self.pool_size:
+                if self._pool is None:
+                    pool = ConnectionPool(self.db_path, self.pool_size, self._pragmas)
+                    await pool.open()
+                    self._pool = pool
+                return self._pool.writer
+            
             if self._connection is None:
                 self._connection = await aiosqlite.connect(self.db_path)
                 self._connection.row_factory = aiosqlite.Row
+                if self._pragmas:
+                    await apply_pragmas(self._connection, build_pragma_profile(self._pragmas))
             return self._connection
     
+    @asynccontextmanager
+    async def _read_connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """読み取り用の接続を取得（プールモードでは読み取り専用接続を借りる）"""
+        db = await self.get_connection()
+        if self._pool is None:
+            yield db
+            return
+        
+        async with self._pool.reader() as reader:
+            yield reader
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """複数の書き込みを1つのコミットにまとめるユニットオブワーク
+        
+        ブロック内の各操作はコミットせず、正常終了時に一度だけコミットする。
+        例外が発生した場合はロールバックして例外を再送出する。
+        """
+        if _active_transaction.get() is self:
+            # 入れ子の場合は外側のトランザクションに合流
+            yield await self.get_connection()
+            return
+        
+        async with self._write_lock:
+            db = await self.get_connection()
+            token = _active_transaction.set(self)
+            self._commit_callbacks = []
+            try:
+                if not db.in_transaction:
+                    await db.execute("BEGIN")
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                self._commit_callbacks = []
+                raise
+            finally:
+                _active_transaction.reset(token)
+            
+            callbacks, self._commit_callbacks = self._commit_callbacks, []
+            for callback in callbacks:
+                callback()
+    
+    def _on_commit(self, callback: Callable[[], None]):
+        """トランザクションのコミット後に実行する処理を登録（インメモリ索引の更新用）"""
+        if _active_transaction.get() is self:
+            self._commit_callbacks.append(callback)
+        else:
+            callback()
+    
     async def close(self):
         """データベース接続を閉じる"""
+        # 未書き込みのログイベントを書き出してから接続を閉じる
+        await self._stop_log_writer()
+        
         async with self._lock:
+            if self._pool:
+                await self._pool.close()
+                self._pool = None
             if self._connection:
                 await self._connection.close()
                 self._connection = None
@@ -106,13 +186,13 @@ class Database:
                               emoji: str, role_id: int) -> bool:
         """リアクションロールを追加"""
         try:
-            db = await self.get_connection()
-            await db.execute("""
-                INSERT OR REPLACE INTO reaction_roles 
-                (guild_id, channel_id, message_id, emoji, role_id)
-                VALUES (?, ?, ?, ?, ?)
-            """, (guild_id, channel_id, message_id, emoji, role_id))
-            await db.commit()
+            async with self.transaction() as db:
+                await db.execute("""
+                    INSERT OR REPLACE INTO reaction_roles 
+                    (guild_id, channel_id, message_id, emoji, role_id)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (guild_id, channel_id, message_id, emoji, role_id))
+                self._on_commit(lambda: self.reaction_role_index.add(message_id, emoji, role_id))
             
             self.logger.info(f"リアクションロールを追加: {emoji} -> {role_id}")
             return True
@@ -124,12 +204,12 @@ class Database:
     async def remove_reaction_role(self, message_id: int, emoji: str) -> bool:
         """リアクションロールを削除"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                DELETE FROM reaction_roles 
-                WHERE message_id = ? AND emoji = ?
-            """, (message_id, emoji))
-            await db.commit()
+            async with self.transaction() as db:
+                cursor = await db.execute("""
+                    DELETE FROM reaction_roles 
+                    WHERE message_id = ? AND emoji = ?
+                """, (message_id, emoji))
+                self._on_commit(lambda: self.reaction_role_index.remove(message_id, emoji))
             
             if cursor.rowcount > 0:
                 self.logger.info(f"リアクションロールを削除: {emoji}")
@@ -140,48 +220,269 @@ class Database:
             self.logger.error(f"リアクションロール削除エラー: {e}")
             return False
     
+    async def add_reaction_roles_bulk(self, entries: List[Tuple[int, int, int, str, int]]) -> int:
+        """(guild_id, channel_id, message_id, emoji, role_id) のリストを1コミットで追加"""
+        if not entries:
+            return 0
+        
+        try:
+            async with self.transaction() as db:
+                await db.executemany("""
+                    INSERT OR REPLACE INTO reaction_roles 
+                    (guild_id, channel_id, message_id, emoji, role_id)
+                    VALUES (?, ?, ?, ?, ?)
+                """, entries)
+                
+                def update_index():
+                    for _, _, message_id, emoji, role_id in entries:
+                        self.reaction_role_index.add(message_id, emoji, role_id)
+                self._on_commit(update_index)
+            
+            self.logger.info(f"リアクションロールを一括追加: {len(entries)}件")
+            return len(entries)
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロール一括追加エラー: {e}")
+            return 0
+    
+    async def remove_reaction_roles_bulk(self, entries: List[Tuple[int, str]]) -> int:
+        """(message_id, emoji) のリストを1コミットで削除し、削除件数を返す"""
+        if not entries:
+            return 0
+        
+        try:
+            async with self.transaction() as db:
+                cursor = await db.executemany("""
+                    DELETE FROM reaction_roles 
+                    WHERE message_id = ? AND emoji = ?
+                """, entries)
+                removed = cursor.rowcount
+                
+                def update_index():
+                    for message_id, emoji in entries:
+                        self.reaction_role_index.remove(message_id, emoji)
+                self._on_commit(update_index)
+            
+            if removed > 0:
+                self.logger.info(f"リアクションロールを一括削除: {removed}件")
+            return removed
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロール一括削除エラー: {e}")
+            return 0
+    
+    async def load_reaction_role_index(self) -> int:
+        """リアクションロールの索引を1回のクエリで読み込む"""
+        try:
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT message_id, emoji, role_id FROM reaction_roles
+                """)
+                rows = await cursor.fetchall()
+                cursor = await db.execute("""
+                    SELECT message_id, exclusive, max_roles, required_role_id FROM reaction_role_groups
+                """)
+                group_rows = await cursor.fetchall()
+            
+            self.reaction_role_index.load(
+                ((row['message_id'], row['emoji'], row['role_id']) for row in rows),
+                ((row['message_id'], ReactionRoleGroup(
+                    bool(row['exclusive']), row['max_roles'], row['required_role_id']
+                )) for row in group_rows)
+            )
+            self.logger.info(f"リアクションロール索引を読み込みました: {len(rows)}件")
+            return len(rows)
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロール索引読み込みエラー: {e}")
+            return 0
+    
+    async def set_reaction_role_group(self, guild_id: int, message_id: int,
+                                      group: ReactionRoleGroup) -> bool:
+        """メッセージのリアクションロールのグループ設定を保存"""
+        try:
+            async with self.transaction() as db:
+                await db.execute("""
+                    INSERT OR REPLACE INTO reaction_role_groups
+                    (message_id, guild_id, exclusive, max_roles, required_role_id)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (message_id, guild_id, int(group.exclusive), group.max_roles, group.required_role_id))
+                self._on_commit(lambda: self.reaction_role_index.set_group(message_id, group))
+            
+            self.logger.info(f"リアクションロールのグループを設定: {message_id}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロールのグループ設定エラー: {e}")
+            return False
+    
+    async def remove_reaction_role_group(self, message_id: int) -> bool:
+        """メッセージのリアクションロールのグループ設定を削除"""
+        try:
+            async with self.transaction() as db:
+                cursor = await db.execute("""
+                    DELETE FROM reaction_role_groups WHERE message_id = ?
+                """, (message_id,))
+                self._on_commit(lambda: self.reaction_role_index.remove_group(message_id))
+            
+            return cursor.rowcount > 0
+            
+        except Exception as e:
+            self.logger.error(f"リアクションロールのグループ削除エラー: {e}")
+            return False
+    
+    def is_reaction_role_message(self, message_id: int) -> bool:
+        """リアクションロールが設定されたメッセージかどうかを判定（DBアクセスなし）"""
+        return self.reaction_role_index.has_message(message_id)
+    
     async def get_reaction_role(self, message_id: int, emoji: str) -> Optional[int]:
-        """リアクションに対応するロールIDを取得"""
+        """リアクションに対応するロールIDを取得（インメモリ索引から）"""
+        return self.reaction_role_index.get(message_id, emoji)
+    
+    async def get_reaction_role_channel(self, message_id: int) -> Optional[int]:
+        """リアクションロールが設定されたメッセージのチャンネルIDを取得"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT role_id FROM reaction_roles 
-                WHERE message_id = ? AND emoji = ?
-            """, (message_id, emoji))
-            row = await cursor.fetchone()
-            return row['role_id'] if row else None
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT channel_id FROM reaction_roles WHERE message_id = ? LIMIT 1
+                """, (message_id,))
+                row = await cursor.fetchone()
+                return row['channel_id'] if row else None
             
         except Exception as e:
-            self.logger.error(f"リアクションロール取得エラー: {e}")
+            self.logger.error(f"リアクションロールのチャンネル取得エラー: {e}")
             return None
     
     async def get_all_reaction_roles(self, guild_id: int) -> List[Dict[str, Any]]:
         """ギルドの全リアクションロールを取得"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT * FROM reaction_roles WHERE guild_id = ?
-                ORDER BY message_id, emoji
-            """, (guild_id,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM reaction_roles WHERE guild_id = ?
+                    ORDER BY message_id, emoji
+                """, (guild_id,))
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
             
         except Exception as e:
             self.logger.error(f"全リアクションロール取得エラー: {e}")
             return []
     
+    # ロールパネル操作
+    async def load_role_panels(self) -> List[RolePanel]:
+        """ロールパネルと項目を1回のクエリで読み込み、索引を再構築"""
+        try:
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT p.message_id, p.guild_id, p.channel_id, p.style, p.title,
+                           p.max_roles, p.required_role_id, i.role_id, i.label, i.emoji
+                    FROM role_panels p
+                    LEFT JOIN role_panel_items i ON i.message_id = p.message_id
+                    ORDER BY p.message_id, i.position
+                """)
+                rows = await cursor.fetchall()
+            
+            panels: Dict[int, Tuple[Any, List[RolePanelItem]]] = {}
+            for row in rows:
+                _, items = panels.setdefault(row['message_id'], (row, []))
+                if row['role_id'] is not None:
+                    items.append(RolePanelItem(row['role_id'], row['label'], row['emoji']))
+            
+            self.role_panel_index.load(
+                RolePanel(
+                    row['message_id'], row['guild_id'], row['channel_id'], row['style'], row['title'],
+                    tuple(items), row['max_roles'], row['required_role_id']
+                )
+                for row, items in panels.values()
+            )
+            self.logger.info(f"ロールパネルを読み込みました: {len(panels)}件")
+            return list(self.role_panel_index)
+            
+        except Exception as e:
+            self.logger.error(f"ロールパネル読み込みエラー: {e}")
+            return []
+    
+    async def _insert_role_panel(self, db: aiosqlite.Connection, panel: RolePanel):
+        """ロールパネルと項目を保存（既存の項目は置き換える）"""
+        await db.execute("""
+            INSERT OR REPLACE INTO role_panels
+            (message_id, guild_id, channel_id, style, title, max_roles, required_role_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (panel.message_id, panel.guild_id, panel.channel_id, panel.style, panel.title,
+              panel.max_roles, panel.required_role_id))
+        await db.execute("DELETE FROM role_panel_items WHERE message_id = ?", (panel.message_id,))
+        await db.executemany("""
+            INSERT INTO role_panel_items (message_id, role_id, label, emoji, position)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(panel.message_id, item.role_id, item.label, item.emoji, position)
+              for position, item in enumerate(panel.items)])
+        self._on_commit(lambda: self.role_panel_index.set(panel))
+    
+    async def add_role_panel(self, panel: RolePanel) -> bool:
+        """ロールパネルを保存"""
+        try:
+            async with self.transaction() as db:
+                await self._insert_role_panel(db, panel)
+            
+            self.logger.info(f"ロールパネルを保存: {panel.message_id} ({len(panel.items)}件)")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"ロールパネル保存エラー: {e}")
+            return False
+    
+    async def remove_role_panel(self, message_id: int) -> bool:
+        """ロールパネルを削除"""
+        try:
+            async with self.transaction() as db:
+                cursor = await db.execute("DELETE FROM role_panels WHERE message_id = ?", (message_id,))
+                await db.execute("DELETE FROM role_panel_items WHERE message_id = ?", (message_id,))
+                self._on_commit(lambda: self.role_panel_index.remove(message_id))
+            
+            return cursor.rowcount > 0
+            
+        except Exception as e:
+            self.logger.error(f"ロールパネル削除エラー: {e}")
+            return False
+    
+    async def migrate_reaction_roles_to_panel(self, source_message_id: int, panel: RolePanel) -> bool:
+        """リアクションロールのメッセージをロールパネルに置き換える（1トランザクション）"""
+        try:
+            async with self.transaction() as db:
+                await self._insert_role_panel(db, panel)
+                cursor = await db.execute("""
+                    SELECT emoji FROM reaction_roles WHERE message_id = ?
+                """, (source_message_id,))
+                emojis = [row['emoji'] for row in await cursor.fetchall()]
+                await db.execute("DELETE FROM reaction_roles WHERE message_id = ?", (source_message_id,))
+                await db.execute("""
+                    DELETE FROM reaction_role_groups WHERE message_id = ?
+                """, (source_message_id,))
+                
+                def update_index():
+                    for emoji in emojis:
+                        self.reaction_role_index.remove(source_message_id, emoji)
+                    self.reaction_role_index.remove_group(source_message_id)
+                self._on_commit(update_index)
+            
+            self.logger.info(f"リアクションロールをロールパネルに移行: {source_message_id} -> {panel.message_id}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"ロールパネル移行エラー: {e}")
+            return False
+    
     # ウェルカムゲート操作
     async def set_welcome_gate(self, guild_id: int, channel_id: int, initial_role_id: int,
                               final_role_id: int, message_content: str) -> bool:
         """ウェルカムゲートを設定"""
         try:
-            db = await self.get_connection()
-            await db.execute("""
-                INSERT OR REPLACE INTO welcome_gates 
-                (guild_id, channel_id, initial_role_id, final_role_id, message_content)
-                VALUES (?, ?, ?, ?, ?)
-            """, (guild_id, channel_id, initial_role_id, final_role_id, message_content))
-            await db.commit()
+            async with self.transaction() as db:
+                await db.execute("""
+                    INSERT OR REPLACE INTO welcome_gates 
+                    (guild_id, channel_id, initial_role_id, final_role_id, message_content)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (guild_id, channel_id, initial_role_id, final_role_id, message_content))
             
             self.logger.info(f"ウェルカムゲートを設定: guild {guild_id}")
             return True
@@ -193,12 +494,12 @@ class Database:
     async def get_welcome_gate(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """ウェルカムゲート設定を取得"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT * FROM welcome_gates WHERE guild_id = ?
-            """, (guild_id,))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM welcome_gates WHERE guild_id = ?
+                """, (guild_id,))
+                row = await cursor.fetchone()
+                return dict(row) if row else None
             
         except Exception as e:
             self.logger.error(f"ウェルカムゲート取得エラー: {e}")
@@ -207,11 +508,10 @@ class Database:
     async def update_welcome_gate_message(self, guild_id: int, message_id: int) -> bool:
         """ウェルカムゲートメッセージIDを更新"""
         try:
-            db = await self.get_connection()
-            await db.execute("""
-                UPDATE welcome_gates SET message_id = ? WHERE guild_id = ?
-            """, (message_id, guild_id))
-            await db.commit()
+            async with self.transaction() as db:
+                await db.execute("""
+                    UPDATE welcome_gates SET message_id = ? WHERE guild_id = ?
+                """, (message_id, guild_id))
             return True
             
         except Exception as e:
@@ -219,50 +519,553 @@ class Database:
             return False
     
     # ログイベント操作
-    async def add_log_event(self, guild_id: int, event_type: str, user_id: Optional[int] = None,
-                           channel_id: Optional[int] = None, message_id: Optional[int] = None,
-                           content: Optional[str] = None, additional_data: Optional[str] = None) -> bool:
-        """ログイベントを追加"""
-        try:
-            db = await self.get_connection()
-            await db.execute("""
-                INSERT INTO log_events 
-                (guild_id, event_type, user_id, channel_id, message_id, content, additional_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (guild_id, event_type, user_id, channel_id, message_id, content, additional_data))
+    def _start_log_writer(self):
+        """ログイベント書き込みタスクを開始"""
+        if self._log_writer_task and not self._log_writer_task.done():
+            return
+        
+        self._log_queue = asyncio.Queue(maxsize=self._log_queue_size)
+        self._log_writer_task = asyncio.create_task(self._log_writer_loop())
+    
+    async def _stop_log_writer(self):
+        """キューに残ったログイベントを書き出して書き込みタスクを停止"""
+        if not self._log_writer_task:
+            return
+        
+        if not self._log_writer_task.done():
+            await self._log_queue.put(_LOG_QUEUE_STOP)
+            try:
+                await self._log_writer_task
+            except Exception as e:
+                self.logger.error(f"ログ書き込みタスク停止エラー: {e}")
+        
+        self._log_writer_task = None
+        self._log_queue = None
+    
+    async def _log_writer_loop(self):
+        """キューからログイベントを取り出し、まとめて書き込む"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._log_queue.get()
+            if item is _LOG_QUEUE_STOP:
+                self._log_queue.task_done()
+                break
+            if isinstance(item, asyncio.Future):
+                # バリアより前のイベントは書き込み済み
+                self._log_queue.task_done()
+                if not item.done():
+                    item.set_result(None)
+                continue
+            
+            batch = [item]
+            barrier: Optional[asyncio.Future] = None
+            deadline = loop.time() + self.log_flush_interval
+            
+            # サイズまたは時間のしきい値に達するまでまとめる（バリアが来たらそこで区切る）
+            while len(batch) < self.log_batch_size:
+                try:
+                    item = self._log_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._log_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                
+                if item is _LOG_QUEUE_STOP:
+                    self._log_queue.task_done()
+                    stopping = True
+                    break
+                if isinstance(item, asyncio.Future):
+                    barrier = item
+                    break
+                batch.append(item)
+            
+            await self._write_log_batch(batch)
+            for _ in batch:
+                self._log_queue.task_done()
+            
+            if barrier is not None:
+                self._log_queue.task_done()
+                if not barrier.done():
+                    barrier.set_result(None)
+    
+    async def _load_last_log_id(self, db: aiosqlite.Connection) -> int:
+        """最後に採番したログイベントIDを取得"""
+        cursor = await db.execute("SELECT last_id FROM log_event_sequence")
+        row = await cursor.fetchone()
+        last_id = row[0] if row else 0
+        
+        if row is None:
+            await db.execute("INSERT INTO log_event_sequence (last_id) VALUES (0)")
             await db.commit()
+        
+        # 採番テーブルより新しいIDが残っている場合に備えて各パーティションの最大値も確認
+        for table in self._log_partitions.tables:
+            cursor = await db.execute(f"SELECT MAX(id) FROM {table}")
+            row = await cursor.fetchone()
+            if row and row[0]:
+                last_id = max(last_id, row[0])
+        
+        return last_id
+    
+    async def _write_log_batch(self, batch: List[Tuple]) -> bool:
+        """ログイベントを1トランザクションでまとめて書き込む"""
+        try:
+            async with self.transaction() as db:
+                # IDを採番し、タイムスタンプごとのパーティションに振り分ける
+                rows_by_table: Dict[str, List[Tuple]] = {}
+                last_id = self._last_log_id
+                for row in batch:
+                    last_id += 1
+                    table = self._log_partitions.table_for(row[6])
+                    rows_by_table.setdefault(table, []).append((last_id,) + tuple(row))
+                
+                for table, rows in rows_by_table.items():
+                    await self._log_partitions.ensure(db, table)
+                    await db.executemany(f"""
+                        INSERT INTO {table} ({DatabaseSchema.LOG_EVENTS_COLUMNS})
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, rows)
+                
+                # 本文のあるイベントは同じトランザクションで全文検索インデックスにも登録
+                search_rows = [
+                    (row[0], row[6], row[1], row[2], row[3], row[4], row[7])
+                    for rows in rows_by_table.values() for row in rows if row[6]
+                ]
+                if search_rows:
+                    await db.executemany("""
+                        INSERT INTO log_events_fts
+                        (rowid, content, guild_id, event_type, user_id, channel_id, timestamp)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, search_rows)
+                
+                # 時間単位の集計も同じトランザクションで加算
+                await db.executemany(UPSERT_HOURLY_COUNT, aggregate_hourly(
+                    (row[1], row[2], row[4], row[7])
+                    for rows in rows_by_table.values() for row in rows
+                ))
+                
+                await db.execute("UPDATE log_event_sequence SET last_id = ?", (last_id,))
+            
+            self._last_log_id = last_id
             return True
             
         except Exception as e:
-            self.logger.error(f"ログイベント追加エラー: {e}")
+            self.logger.error(f"ログイベント一括書き込みエラー ({len(batch)}件): {e}")
+            await self._recover_log_partitions()
             return False
     
+    async def _recover_log_partitions(self):
+        """書き込み失敗後にパーティション一覧をデータベースから読み直す"""
+        try:
+            async with self._read_connection() as db:
+                await self._log_partitions.load(db)
+        except Exception as e:
+            self.logger.error(f"ログパーティション再読み込みエラー: {e}")
+    
+    async def add_log_event(self, guild_id: int, event_type: str, user_id: Optional[int] = None,
+                           channel_id: Optional[int] = None, message_id: Optional[int] = None,
+                           content: Optional[str] = None, additional_data: Optional[str] = None,
+                           timestamp: Optional[str] = None) -> bool:
+        """ログイベントを追加（書き込みキュー経由で非同期に保存）"""
+        row = (guild_id, event_type, user_id, channel_id, message_id, content,
+               timestamp or format_timestamp(utc_now()), additional_data)
+        
+        # 書き込みタスクが動いていない場合は直接書き込む
+        if not self._log_writer_task or self._log_writer_task.done():
+            return await self._write_log_batch([row])
+        
+        # キューが満杯の場合は空きが出るまで待機（バックプレッシャー）
+        await self._log_queue.put(row)
+        return True
+    
+    async def add_log_events_bulk(self, events: List[Dict[str, Any]],
+                                  timestamp: Optional[str] = None) -> bool:
+        """複数のログイベントを1トランザクションでまとめて書き込む
+        
+        各要素は add_log_event と同じ名前のキー（guild_id, event_type, user_id, ...）を持つ辞書。
+        """
+        if not events:
+            return True
+        
+        timestamp = timestamp or format_timestamp(utc_now())
+        rows = [
+            (event['guild_id'], event['event_type'], event.get('user_id'), event.get('channel_id'),
+             event.get('message_id'), event.get('content'), timestamp, event.get('additional_data'))
+            for event in events
+        ]
+        return await self._write_log_batch(rows)
+    
+    async def attach_log_event_actor(self, guild_id: int, event_type: str, timestamp: str, actor_id: int,
+                                     key: str = 'actor_id', user_id: Optional[int] = None,
+                                     channel_id: Optional[int] = None,
+                                     message_id: Optional[int] = None,
+                                     role_id: Optional[int] = None) -> int:
+        """記録済みのログイベントに、後から分かった実行者を追加
+        
+        イベントは記録時のタイムスタンプと種別（指定があればユーザー・チャンネル・メッセージ、
+        ロールのイベントは additional_data の role_id）で特定し、additional_data の key に実行者のIDを設定する。user_id が未設定のイベント
+        （ロール更新など）は実行者を user_id にも設定する。更新した件数を返す。
+        """
+        try:
+            await self.flush_log_events()
+            table = self._log_partitions.table_for(timestamp)
+            if table not in self._log_partitions.tables:
+                return 0
+            
+            conditions = ["guild_id = ?", "timestamp = ?", "event_type = ?",
+                          "json_extract(COALESCE(additional_data, '{}'), '$.' || ?) IS NULL"]
+            params: List[Any] = [guild_id, timestamp, event_type, key]
+            for column, value in (('user_id', user_id), ('channel_id', channel_id), ('message_id', message_id)):
+                if value is not None:
+                    conditions.append(f"{column} = ?")
+                    params.append(value)
+            if role_id is not None:
+                conditions.append("json_extract(additional_data, '$.role_id') = ?")
+                params.append(role_id)
+            
+            async with self.transaction() as db:
+                cursor = await db.execute(f"""
+                    SELECT id, user_id FROM {table} WHERE {' AND '.join(conditions)}
+                """, params)
+                rows = await cursor.fetchall()
+                if not rows:
+                    return 0
+                
+                await db.executemany(f"""
+                    UPDATE {table}
+                    SET additional_data = json_set(COALESCE(additional_data, '{{}}'), '$.' || ?, ?),
+                        user_id = COALESCE(user_id, ?)
+                    WHERE id = ?
+                """, [(key, actor_id, actor_id, row['id']) for row in rows])
+                
+                # 全文検索のユーザー絞り込みでも見つかるよう、検索用の行の user_id も揃える
+                filled = [(actor_id, row['id']) for row in rows if row['user_id'] is None]
+                if filled:
+                    await db.executemany("""
+                        UPDATE log_events_fts SET user_id = ? WHERE rowid = ?
+                    """, filled)
+                return len(rows)
+            
+        except Exception as e:
+            self.logger.error(f"ログイベントの実行者追加エラー: {e}")
+            return 0
+    
+    async def flush_log_events(self):
+        """呼び出し時点までにキューに入ったログイベントの書き込み完了を待つ
+        
+        キューの末尾にバリアを入れ、そこまでの書き込みだけを待つ。後から届くイベントは
+        待たないため、書き込みが続いている間も読み取りが止まらない。
+        """
+        # トランザクション中に待つと書き込みタスクとデッドロックするため待たない
+        if _active_transaction.get() is self:
+            return
+        
+        if self._log_queue and self._log_writer_task and not self._log_writer_task.done():
+            barrier = asyncio.get_running_loop().create_future()
+            await self._log_queue.put(barrier)
+            # 書き込みタスクが停止した場合も待ち続けない
+            await asyncio.wait({barrier, self._log_writer_task}, return_when=asyncio.FIRST_COMPLETED)
+    
     async def get_log_events(self, guild_id: int, limit: int = 100) -> List[Dict[str, Any]]:
-        """最新のログイベントを取得"""
+        """最新のログイベントを取得（新しいパーティションから順に必要な分だけ読む）"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT * FROM log_events WHERE guild_id = ?
-                ORDER BY timestamp DESC LIMIT ?
-            """, (guild_id, limit))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            await self.flush_log_events()
+            results: List[Dict[str, Any]] = []
+            
+            async with self._read_connection() as db:
+                for table in reversed(self._log_partitions.tables):
+                    remaining = limit - len(results)
+                    if remaining <= 0:
+                        break
+                    
+                    cursor = await db.execute(f"""
+                        SELECT * FROM {table} WHERE guild_id = ?
+                        ORDER BY timestamp DESC, id DESC LIMIT ?
+                    """, (guild_id, remaining))
+                    rows = await cursor.fetchall()
+                    results.extend(dict(row) for row in rows)
+            
+            return results
             
         except Exception as e:
             self.logger.error(f"ログイベント取得エラー: {e}")
             return []
     
+    async def iter_log_events(self, guild_id: int, event_type: Optional[str] = None,
+                              user_id: Optional[int] = None, channel_id: Optional[int] = None,
+                              since: Optional[datetime] = None, until: Optional[datetime] = None,
+                              page_size: int = 500, descending: bool = True,
+                              cursor: Optional[Tuple[str, int]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """ログイベントを (timestamp, id) カーソルでページングしながら1件ずつ返す
+        
+        1ページ分の行しか保持しないため、件数に関係なく一定のメモリで走査できる。
+        cursor に前回最後の (timestamp, id) を渡すとその続きから読み出す。
+        """
+        await self.flush_log_events()
+        page_size = max(1, page_size)
+        
+        conditions = ["guild_id = ?"]
+        params: List[Any] = [guild_id]
+        for column, value in (('event_type', event_type), ('user_id', user_id), ('channel_id', channel_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(format_timestamp(since))
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(format_timestamp(until))
+        
+        comparison, order = ("<", "DESC") if descending else (">", "ASC")
+        tables = self._log_partitions.tables_between(since, until)
+        if descending:
+            tables = list(reversed(tables))
+        
+        for table in tables:
+            while True:
+                page_conditions = list(conditions)
+                page_params = list(params)
+                if cursor is not None:
+                    page_conditions.append(f"(timestamp, id) {comparison} (?, ?)")
+                    page_params.extend(cursor)
+                
+                try:
+                    # 呼び出し側の処理中は接続を保持しないよう、ページごとに借りて返す
+                    async with self._read_connection() as db:
+                        db_cursor = await db.execute(f"""
+                            SELECT * FROM {table} WHERE {' AND '.join(page_conditions)}
+                            ORDER BY timestamp {order}, id {order} LIMIT ?
+                        """, page_params + [page_size])
+                        rows = [dict(row) for row in await db_cursor.fetchall()]
+                except aiosqlite.OperationalError:
+                    # 走査中に保持期間切れで削除されたパーティションは読み飛ばす
+                    if table in self._log_partitions.tables:
+                        raise
+                    break
+                
+                for row in rows:
+                    yield row
+                
+                if len(rows) < page_size:
+                    break
+                cursor = (rows[-1]['timestamp'], rows[-1]['id'])
+    
+    async def search_log_events(self, guild_id: int, query: str, user_id: Optional[int] = None,
+                                since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                limit: int = 10, offset: int = 0) -> Optional[List[Dict[str, Any]]]:
+        """ログ本文を全文検索し、関連度順に返す（3文字以上の語がない場合はNone）"""
+        match, short_terms = build_match_query(query)
+        if match is None:
+            return None
+        
+        conditions = ["log_events_fts MATCH ?", "guild_id = ?"]
+        params: List[Any] = [match, guild_id]
+        # 短い語はインデックスで一致した行を部分一致で絞り込む
+        for term in short_terms:
+            conditions.append("content LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(term))
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(format_timestamp(since))
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(format_timestamp(until))
+        
+        try:
+            await self.flush_log_events()
+            async with self._read_connection() as db:
+                cursor = await db.execute(f"""
+                    SELECT rowid AS id, guild_id, event_type, user_id, channel_id, timestamp,
+                           snippet(log_events_fts, 0, '**', '**', '…', 16) AS snippet
+                    FROM log_events_fts WHERE {' AND '.join(conditions)}
+                    ORDER BY rank LIMIT ? OFFSET ?
+                """, params + [max(1, limit), max(0, offset)])
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+            
+        except Exception as e:
+            self.logger.error(f"ログ検索エラー: {e}")
+            return []
+    
+    async def get_log_stats(self, guild_id: int, since: datetime, until: Optional[datetime] = None,
+                            period: str = 'day', event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """集計テーブルから期間ごと・イベント種別ごとの件数を取得（period は hour / day / week）
+        
+        ログ本体は参照しないため、保持期間を過ぎて削除されたログも集計に含まれる。
+        """
+        period_expr = {
+            'hour': "hour",
+            'day': "substr(hour, 1, 10)",
+            # 月曜始まりの週の初日
+            'week': "date(hour, '-6 days', 'weekday 1')"
+        }.get(period)
+        if period_expr is None:
+            raise ValueError(f"不明な集計期間です: {period}")
+        
+        conditions = ["guild_id = ?", "hour >= ?", "hour < ?"]
+        params: List[Any] = [
+            guild_id, format_timestamp(since), format_timestamp(until or utc_now() + timedelta(hours=1))
+        ]
+        if event_type is not None:
+            conditions.append("event_type = ?")
+            params.append(event_type)
+        
+        try:
+            await self.flush_log_events()
+            async with self._read_connection() as db:
+                cursor = await db.execute(f"""
+                    SELECT {period_expr} AS period, event_type, SUM(count) AS count
+                    FROM log_event_hourly WHERE {' AND '.join(conditions)}
+                    GROUP BY period, event_type ORDER BY period
+                """, params)
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+            
+        except Exception as e:
+            self.logger.error(f"ログ集計取得エラー: {e}")
+            return []
+    
+    async def get_log_channel_stats(self, guild_id: int, since: datetime,
+                                    limit: int = 5) -> List[Dict[str, Any]]:
+        """集計テーブルから件数の多いチャンネルを取得"""
+        try:
+            await self.flush_log_events()
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT channel_id, SUM(count) AS count
+                    FROM log_event_hourly
+                    WHERE guild_id = ? AND hour >= ? AND channel_id != 0
+                    GROUP BY channel_id ORDER BY count DESC LIMIT ?
+                """, (guild_id, format_timestamp(since), max(1, limit)))
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+            
+        except Exception as e:
+            self.logger.error(f"ログ集計取得エラー: {e}")
+            return []
+    
+    async def cleanup_log_rollups(self, days: int) -> int:
+        """保持期間を過ぎた集計を削除"""
+        try:
+            cutoff = format_timestamp(utc_now() - timedelta(days=days))
+            async with self.transaction() as db:
+                cursor = await db.execute("DELETE FROM log_event_hourly WHERE hour < ?", (cutoff,))
+                return cursor.rowcount
+            
+        except Exception as e:
+            self.logger.error(f"ログ集計クリーンアップエラー: {e}")
+            return 0
+    
+    async def drop_expired_log_partitions(self, retention: Dict[int, int]) -> int:
+        """含まれる全ギルドの保持期間を過ぎたパーティションを丸ごと削除
+        
+        retention はギルドID -> 保持日数。含まれないギルド（ログ無効・保持期間0・退出済み）の
+        ログは無期限に残すため、そのギルドの行があるパーティションは削除しない。
+        """
+        try:
+            retention = {guild_id: days for guild_id, days in retention.items() if days > 0}
+            if not retention:
+                return 0
+            
+            await self.flush_log_events()
+            now = utc_now()
+            candidates = self._log_partitions.expired_tables(now - timedelta(days=min(retention.values())))
+            if not candidates:
+                return 0
+            
+            expired = []
+            async with self._read_connection() as db:
+                for table in candidates:
+                    cursor = await db.execute(f"SELECT DISTINCT guild_id FROM {table}")
+                    guild_ids = [row[0] for row in await cursor.fetchall()]
+                    if any(guild_id not in retention for guild_id in guild_ids):
+                        continue
+                    days = max((retention[guild_id] for guild_id in guild_ids), default=0)
+                    if table in self._log_partitions.expired_tables(now - timedelta(days=days)):
+                        expired.append(table)
+            if not expired:
+                return 0
+            
+            # 削除前にアーカイブへ書き出す
+            if self.log_archive:
+                for table in expired:
+                    await self._archive_partition(table)
+            
+            async with self.transaction() as db:
+                for table in expired:
+                    await db.execute(f"""
+                        DELETE FROM log_events_fts WHERE rowid IN (SELECT id FROM {table})
+                    """)
+                await self._log_partitions.drop(db, expired)
+            
+            self.logger.info(f"{len(expired)}個の古いログパーティションを削除しました")
+            return len(expired)
+            
+        except Exception as e:
+            self.logger.error(f"ログパーティション削除エラー: {e}")
+            await self._recover_log_partitions()
+            return 0
+    
+    async def _archive_partition(self, table: str, page_size: int = 1000) -> int:
+        """パーティションの全行をページ単位でアーカイブへ書き出す"""
+        archived = 0
+        async with self._read_connection() as db:
+            cursor = await db.execute(f"SELECT * FROM {table} ORDER BY id")
+            while True:
+                rows = await cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                archived += await asyncio.to_thread(
+                    self.log_archive.append, [dict(row) for row in rows]
+                )
+        
+        if archived:
+            self.logger.info(f"{table}: {archived}件のログをアーカイブしました")
+        return archived
+    
     async def cleanup_old_logs(self, guild_id: int, days: int = 7) -> int:
-        """古いログを削除"""
+        """古いログを削除（保持期間の境界にあるパーティションだけを一定件数ずつ削除）"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                DELETE FROM log_events 
-                WHERE guild_id = ? AND timestamp < datetime('now', '-{} days')
-            """.format(days), (guild_id,))
-            await db.commit()
+            await self.flush_log_events()
+            cutoff = utc_now() - timedelta(days=days)
+            cutoff_str = format_timestamp(cutoff)
+            chunk_size = self.log_cleanup_chunk_size
+            deleted_count = 0
+            
+            for table in self._log_partitions.tables_between(end=cutoff):
+                while True:
+                    # チャンクごとに別トランザクションにして書き込みロックを短く保つ
+                    if self.log_archive:
+                        deleted = await self._archive_and_delete_chunk(
+                            table, guild_id, cutoff_str, chunk_size
+                        )
+                    else:
+                        async with self.transaction() as db:
+                            cursor = await db.execute(f"""
+                                SELECT id FROM {table}
+                                WHERE guild_id = ? AND timestamp < ? LIMIT ?
+                            """, (guild_id, cutoff_str, chunk_size))
+                            ids = [row[0] for row in await cursor.fetchall()]
+                            await self._delete_log_rows(db, table, ids)
+                            deleted = len(ids)
+                    
+                    deleted_count += deleted
+                    if deleted < chunk_size:
+                        break
+                    
+                    # チャンクごとに他の書き込みへ処理を譲る
+                    await asyncio.sleep(0)
             
-            deleted_count = cursor.rowcount
             if deleted_count > 0:
                 self.logger.info(f"{deleted_count}件の古いログを削除しました")
             return deleted_count
@@ -271,16 +1074,53 @@ class Database:
             self.logger.error(f"ログクリーンアップエラー: {e}")
             return 0
     
+    async def _archive_and_delete_chunk(self, table: str, guild_id: int,
+                                        cutoff: str, chunk_size: int) -> int:
+        """期限切れの行を1チャンク分アーカイブしてから削除"""
+        async with self._read_connection() as db:
+            cursor = await db.execute(f"""
+                SELECT * FROM {table}
+                WHERE guild_id = ? AND timestamp < ? LIMIT ?
+            """, (guild_id, cutoff, chunk_size))
+            rows = [dict(row) for row in await cursor.fetchall()]
+        if not rows:
+            return 0
+        
+        await asyncio.to_thread(self.log_archive.append, rows)
+        
+        async with self.transaction() as db:
+            await self._delete_log_rows(db, table, [row['id'] for row in rows])
+        return len(rows)
+    
+    async def _delete_log_rows(self, db: aiosqlite.Connection, table: str, ids: List[int]):
+        """ログイベントを全文検索インデックスと合わせて削除"""
+        if not ids:
+            return
+        
+        placeholders = ", ".join("?" for _ in ids)
+        await db.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+        await db.execute(f"DELETE FROM log_events_fts WHERE rowid IN ({placeholders})", ids)
+    
+    async def iter_archived_log_events(self, guild_id: int, start: Optional[datetime] = None,
+                                       end: Optional[datetime] = None, user_id: Optional[int] = None,
+                                       event_type: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """アーカイブ済みのログイベントを条件付きで順に読み出す"""
+        if not self.log_archive:
+            return
+        
+        async for event in self.log_archive.aiter_events(guild_id, start, end, user_id, event_type):
+            yield event
+    
     # サブロール操作
     async def add_sub_role(self, guild_id: int, role_id: int, role_name: str) -> bool:
         """サブロールを追加"""
         try:
-            db = await self.get_connection()
-            await db.execute("""
-                INSERT OR REPLACE INTO sub_roles (guild_id, role_id, role_name)
-                VALUES (?, ?, ?)
-            """, (guild_id, role_id, role_name))
-            await db.commit()
+            async with self.transaction() as db:
+                await db.execute("""
+                    INSERT OR REPLACE INTO sub_roles (guild_id, role_id, role_name)
+                    VALUES (?, ?, ?)
+                """, (guild_id, role_id, role_name))
+                self._on_commit(lambda: self._sub_role_cache.add(guild_id, role_id))
             
             self.logger.info(f"サブロールを追加: {role_name}")
             return True
@@ -292,11 +1132,11 @@ class Database:
     async def remove_sub_role(self, guild_id: int, role_id: int) -> bool:
         """サブロールを削除"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                DELETE FROM sub_roles WHERE guild_id = ? AND role_id = ?
-            """, (guild_id, role_id))
-            await db.commit()
+            async with self.transaction() as db:
+                cursor = await db.execute("""
+                    DELETE FROM sub_roles WHERE guild_id = ? AND role_id = ?
+                """, (guild_id, role_id))
+                self._on_commit(lambda: self._sub_role_cache.discard(guild_id, role_id))
             
             return cursor.rowcount > 0
             
@@ -304,30 +1144,67 @@ class Database:
             self.logger.error(f"サブロール削除エラー: {e}")
             return False
     
+    async def remove_sub_roles_bulk(self, guild_id: int, role_ids: List[int]) -> int:
+        """複数のサブロールを1コミットで削除し、削除件数を返す"""
+        if not role_ids:
+            return 0
+        
+        try:
+            async with self.transaction() as db:
+                cursor = await db.executemany("""
+                    DELETE FROM sub_roles WHERE guild_id = ? AND role_id = ?
+                """, [(guild_id, role_id) for role_id in role_ids])
+                
+                def update_cache():
+                    for role_id in role_ids:
+                        self._sub_role_cache.discard(guild_id, role_id)
+                self._on_commit(update_cache)
+                return cursor.rowcount
+            
+        except Exception as e:
+            self.logger.error(f"サブロール一括削除エラー: {e}")
+            return 0
+    
     async def get_sub_roles(self, guild_id: int) -> List[Dict[str, Any]]:
         """ギルドのサブロール一覧を取得"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT * FROM sub_roles WHERE guild_id = ?
-                ORDER BY role_name
-            """, (guild_id,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            async with self._read_connection() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM sub_roles WHERE guild_id = ?
+                    ORDER BY role_name
+                """, (guild_id,))
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
             
         except Exception as e:
             self.logger.error(f"サブロール取得エラー: {e}")
             return []
     
+    async def get_sub_role_ids(self, guild_id: int) -> FrozenSet[int]:
+        """ギルドのサブロールID集合を取得（初回のみ1回のクエリで読み込む）"""
+        cached = self._sub_role_cache.get(guild_id)
+        if cached is not None:
+            return cached
+        
+        generation = self._sub_role_cache.generation(guild_id)
+        async with self._read_connection() as db:
+            cursor = await db.execute("""
+                SELECT role_id FROM sub_roles WHERE guild_id = ?
+            """, (guild_id,))
+            rows = await cursor.fetchall()
+        
+        role_ids = frozenset(row['role_id'] for row in rows)
+        self._sub_role_cache.store(guild_id, role_ids, generation)
+        return role_ids
+    
+    def evict_guild_cache(self, guild_id: int):
+        """ギルドのインメモリキャッシュを破棄"""
+        self._sub_role_cache.evict(guild_id)
+    
     async def is_sub_role(self, guild_id: int, role_id: int) -> bool:
-        """ロールがサブロールかどうかを判定"""
+        """ロールがサブロールかどうかを判定（キャッシュから）"""
         try:
-            db = await self.get_connection()
-            cursor = await db.execute("""
-                SELECT 1 FROM sub_roles WHERE guild_id = ? AND role_id = ?
-            """, (guild_id, role_id))
-            row = await cursor.fetchone()
-            return row is not None
+            return role_id in await self.get_sub_role_ids(guild_id)
             
         except Exception as e:
             self.logger.error(f"サブロール判定エラー: {e}")
@@ -0,0 +1,265 @@
+"""
+再起動後も残るメッセージ内容ストア
+"""
+
+import aiosqlite
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional, List, Tuple
+
+from utils.logger import get_logger
+from utils.message_cache import CachedMessage
+
+# Discordのスノーフレークのエポック（ミリ秒）
+DISCORD_EPOCH_MS = 1420070400000
+
+MESSAGE_STORE_TABLE = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    content BLOB,
+    compressed INTEGER NOT NULL DEFAULT 0,
+    attachments TEXT
+)
+"""
+
+def snowflake_before(seconds_ago: float) -> int:
+    """指定秒数前より古いメッセージIDの上限（スノーフレークは作成時刻順）"""
+    timestamp_ms = int((time.time() - seconds_ago) * 1000)
+    return max(0, timestamp_ms - DISCORD_EPOCH_MS) << 22
+
+class PersistentMessageStore:
+    """メッセージ内容を別のSQLiteファイルに保存し、再起動後の削除・編集ログに使う
+
+    書き込みはメモリ上にまとめて一定間隔でコミットする。保持期間を過ぎた行と、
+    ディスク上限を超えた分の古い行は compact() で削除する。
+    """
+
+    def __init__(self, path: str, ttl_days: float = 7, max_bytes: int = 256 * 1024 * 1024,
+                 flush_interval: float = 2.0, delete_chunk_size: int = 5000):
+        self.path = Path(path)
+        self.ttl_seconds = max(0.0, ttl_days * 86400)
+        self.max_bytes = max(0, max_bytes)
+        self.flush_interval = max(0.1, flush_interval)
+        self.delete_chunk_size = max(1, delete_chunk_size)
+        self.logger = get_logger(__name__)
+
+        self._db: Optional[aiosqlite.Connection] = None
+        self._pending: Dict[int, Optional[CachedMessage]] = {}
+        # コミット中の書き込み（完了までは読み取りでもこちらを参照する）
+        self._flushing: Dict[int, Optional[CachedMessage]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        """ストアを開き、書き込みタスクを開始"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = await aiosqlite.connect(self.path)
+        # 削除した領域をファイルから返せるよう、テーブル作成前に設定する
+        await self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await self._db.execute("PRAGMA journal_mode = WAL")
+        await self._db.execute("PRAGMA synchronous = NORMAL")
+        await self._db.execute(MESSAGE_STORE_TABLE)
+        await self._db.commit()
+
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """未書き込み分を保存して閉じる"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        if self._db:
+            await self.flush()
+            await self._db.close()
+            self._db = None
+
+    def put(self, entry: CachedMessage):
+        """メッセージを保存（次のフラッシュでまとめて書き込む）"""
+        self._pending[entry.message_id] = entry
+
+    def delete(self, message_id: int):
+        """メッセージを削除（次のフラッシュでまとめて書き込む）"""
+        self._pending[message_id] = None
+
+    async def get(self, message_id: int) -> Optional[CachedMessage]:
+        """メッセージを取得"""
+        return (await self.get_many([message_id])).get(message_id)
+
+    async def get_many(self, message_ids: List[int]) -> Dict[int, CachedMessage]:
+        """複数のメッセージを1回のクエリで取得"""
+        found: Dict[int, CachedMessage] = {}
+        missing = []
+        for message_id in message_ids:
+            for buffered in (self._pending, self._flushing):
+                if message_id in buffered:
+                    entry = buffered[message_id]
+                    if entry is not None:
+                        found[message_id] = entry
+                    break
+            else:
+                missing.append(message_id)
+
+        if not missing or self._db is None:
+            return found
+
+        placeholders = ", ".join("?" for _ in missing)
+        cursor = await self._db.execute(f"""
+            SELECT message_id, guild_id, channel_id, author_id, author_name,
+                   content, compressed, attachments
+            FROM messages WHERE message_id IN ({placeholders})
+        """, missing)
+
+        for row in await cursor.fetchall():
+            message_id, guild_id, channel_id, author_id, author_name, content, compressed, attachments = row
+            found[message_id] = CachedMessage.restore(
+                message_id, guild_id, channel_id, author_id, author_name,
+                content if compressed else (content or ""), compressed,
+                tuple(json.loads(attachments)) if attachments else ()
+            )
+
+        return found
+
+    async def _flush_loop(self):
+        """一定間隔で書き込み待ちをコミット"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"メッセージストア書き込みエラー: {e}")
+
+    async def flush(self) -> int:
+        """書き込み待ちを1トランザクションで保存し、件数を返す"""
+        if not self._pending or self._db is None:
+            return 0
+
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+
+            upserts: List[Tuple] = []
+            deletes: List[Tuple[int]] = []
+            for message_id, entry in pending.items():
+                if entry is None:
+                    deletes.append((message_id,))
+                    continue
+                content, compressed = entry.stored_content
+                upserts.append((
+                    message_id, entry.guild_id, entry.channel_id, entry.author_id,
+                    entry.author_name, content, int(compressed),
+                    json.dumps(list(entry.attachments), ensure_ascii=False) if entry.attachments else None
+                ))
+
+            try:
+                if upserts:
+                    await self._db.executemany("""
+                        INSERT OR REPLACE INTO messages
+                        (message_id, guild_id, channel_id, author_id, author_name,
+                         content, compressed, attachments)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, upserts)
+                if deletes:
+                    await self._db.executemany("DELETE FROM messages WHERE message_id = ?", deletes)
+                await self._db.commit()
+            except Exception:
+                await self._db.rollback()
+                # 失敗した分は新しい更新を優先して書き込み待ちに戻す
+                pending.update(self._pending)
+                self._pending = pending
+                raise
+            finally:
+                self._flushing = {}
+
+        return len(pending)
+
+    async def disk_usage(self) -> int:
+        """データベースファイルの使用バイト数（空きページを除く）"""
+        cursor = await self._db.execute("PRAGMA page_count")
+        page_count = (await cursor.fetchone())[0]
+        cursor = await self._db.execute("PRAGMA freelist_count")
+        free_count = (await cursor.fetchone())[0]
+        cursor = await self._db.execute("PRAGMA page_size")
+        page_size = (await cursor.fetchone())[0]
+        return (page_count - free_count) * page_size
+
+    async def compact(self) -> int:
+        """保持期間切れと容量超過の行を古い順に削除し、削除件数を返す"""
+        if self._db is None:
+            return 0
+
+        await self.flush()
+        deleted = 0
+
+        # スノーフレークは作成時刻順のため主キーの範囲で期限切れを削除できる
+        if self.ttl_seconds:
+            cutoff = snowflake_before(self.ttl_seconds)
+            while True:
+                removed = await self._delete_oldest(cutoff)
+                deleted += removed
+                if removed < self.delete_chunk_size:
+                    break
+
+        if self.max_bytes:
+            deleted += await self._trim_to_capacity()
+
+        if deleted:
+            async with self._lock:
+                # incremental_vacuum は1ページずつ進むため最後まで実行させる
+                await self._db.executescript("PRAGMA incremental_vacuum;")
+            self.logger.info(f"メッセージストアから{deleted}件を削除しました")
+
+        return deleted
+
+    async def _trim_to_capacity(self) -> int:
+        """ディスク使用量が上限の9割になるまで古い行を削除"""
+        usage = await self.disk_usage()
+        if usage <= self.max_bytes:
+            return 0
+
+        cursor = await self._db.execute("SELECT COUNT(*) FROM messages")
+        count = (await cursor.fetchone())[0]
+        if count == 0:
+            return 0
+
+        # 1行あたりの平均サイズから削除する行数を見積もる
+        target = self.max_bytes * 0.9
+        remaining = min(count, int(count * (usage - target) / usage) + 1)
+
+        deleted = 0
+        while remaining > 0:
+            removed = await self._delete_oldest(limit=min(remaining, self.delete_chunk_size))
+            if removed == 0:
+                break
+            deleted += removed
+            remaining -= removed
+        return deleted
+
+    async def _delete_oldest(self, before_id: Optional[int] = None, limit: Optional[int] = None) -> int:
+        """古い順に1チャンク分を削除（書き込みロックを短く保つ）"""
+        limit = limit or self.delete_chunk_size
+        condition = "WHERE message_id < ?" if before_id is not None else ""
+        params = (before_id, limit) if before_id is not None else (limit,)
+
+        async with self._lock:
+            cursor = await self._db.execute(f"""
+                DELETE FROM messages WHERE message_id IN (
+                    SELECT message_id FROM messages {condition}
+                    ORDER BY message_id LIMIT ?
+                )
+            """, params)
+            await self._db.commit()
+
+        # チャンクごとに他の処理へ譲る
+        await asyncio.sleep(0)
+        return cursor.rowcount
@@ -0,0 +1,219 @@
+"""
+スキーママイグレーション
+"""
+
+import aiosqlite
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Callable, Awaitable
+
+from .models import DatabaseSchema
+from .partitions import (
+    partition_table_name, create_partition_table, create_log_events_view, list_partition_tables
+)
+from .search import create_fts_table
+from .rollups import create_rollup_table
+from utils.logger import get_logger
+
+@dataclass
+class Migration:
+    """1つのスキーマバージョンへの変更"""
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+    # SQLだけで表現できない変更を行う場合の追加処理
+    apply: Optional[Callable[[aiosqlite.Connection], Awaitable[None]]] = None
+
+async def _partition_log_events(db: aiosqlite.Connection):
+    """既存の log_events テーブルを日単位のパーティションへ移し、ビューに置き換える"""
+    cursor = await db.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'log_events'"
+    )
+    row = await cursor.fetchone()
+    if row is None or row[0] != 'table':
+        await create_log_events_view(db, await list_partition_tables(db))
+        return
+
+    day_expr = "strftime('%Y%m%d', COALESCE(timestamp, CURRENT_TIMESTAMP))"
+    cursor = await db.execute(f"SELECT DISTINCT {day_expr} FROM log_events")
+    keys = [row[0] for row in await cursor.fetchall()]
+
+    for key in keys:
+        table = partition_table_name(key)
+        await create_partition_table(db, table)
+        await db.execute(f"""
+            INSERT INTO {table} ({DatabaseSchema.LOG_EVENTS_COLUMNS})
+            SELECT id, guild_id, event_type, user_id, channel_id, message_id, content,
+                   COALESCE(timestamp, CURRENT_TIMESTAMP), additional_data
+            FROM log_events WHERE {day_expr} = ?
+        """, (key,))
+
+    await db.execute("""
+        INSERT INTO log_event_sequence (last_id)
+        SELECT COALESCE(MAX(id), 0) FROM log_events
+    """)
+    await db.execute("DROP TABLE log_events")
+    await create_log_events_view(db, await list_partition_tables(db))
+
+async def _create_log_search_index(db: aiosqlite.Connection):
+    """全文検索インデックスを作成し、既存のログ本文を取り込む"""
+    await create_fts_table(db)
+    await db.execute("""
+        INSERT INTO log_events_fts (rowid, content, guild_id, event_type, user_id, channel_id, timestamp)
+        SELECT id, content, guild_id, event_type, user_id, channel_id, timestamp
+        FROM log_events WHERE content IS NOT NULL AND content != ''
+    """)
+
+# バージョン順のマイグレーション一覧（適用済みのものは変更しないこと）
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="初期スキーマ",
+        statements=DatabaseSchema.get_all_tables()
+    ),
+    Migration(
+        version=2,
+        description="ホットクエリ用のインデックスを追加",
+        statements=[
+            DatabaseSchema.LOG_EVENTS_GUILD_TIMESTAMP_INDEX,
+            DatabaseSchema.REACTION_ROLES_GUILD_INDEX,
+            DatabaseSchema.SUB_ROLES_GUILD_NAME_INDEX
+        ]
+    ),
+    Migration(
+        version=3,
+        description="log_events を時間パーティションに分割",
+        statements=[DatabaseSchema.LOG_EVENT_SEQUENCE_TABLE],
+        apply=_partition_log_events
+    ),
+    Migration(
+        version=4,
+        description="ログ本文の全文検索インデックスを追加",
+        apply=_create_log_search_index
+    ),
+    Migration(
+        version=5,
+        description="ログイベントの時間単位の集計テーブルを追加",
+        apply=create_rollup_table
+    ),
+    Migration(
+        version=6,
+        description="リアクションロールのグループ設定を追加",
+        statements=[DatabaseSchema.REACTION_ROLE_GROUPS_TABLE]
+    ),
+    Migration(
+        version=7,
+        description="ボタン・セレクトメニューのロールパネルを追加",
+        statements=[DatabaseSchema.ROLE_PANELS_TABLE, DatabaseSchema.ROLE_PANEL_ITEMS_TABLE]
+    )
+]
+
+# インデックスの使用を確認するホットクエリ（名前 -> (SQL, パラメータ)）
+# {log_table} にはログイベントのパーティションテーブル名が入る
+HOT_QUERIES: Dict[str, Tuple[str, tuple]] = {
+    'get_log_events': (
+        "SELECT * FROM {log_table} WHERE guild_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (0, 100)
+    ),
+    'iter_log_events': (
+        "SELECT * FROM {log_table} WHERE guild_id = ? AND timestamp >= ? "
+        "AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (0, '1970-01-01 00:00:00', '9999-12-31 23:59:59', 0, 500)
+    ),
+    'cleanup_old_logs': (
+        "DELETE FROM {log_table} WHERE id IN "
+        "(SELECT id FROM {log_table} WHERE guild_id = ? AND timestamp < ? LIMIT ?)",
+        (0, '1970-01-01 00:00:00', 500)
+    ),
+    'get_log_stats': (
+        "SELECT hour, event_type, SUM(count) FROM log_event_hourly "
+        "WHERE guild_id = ? AND hour >= ? AND hour < ? GROUP BY hour, event_type",
+        (0, '1970-01-01 00:00:00', '9999-12-31 23:59:59')
+    ),
+    'get_all_reaction_roles': (
+        "SELECT * FROM reaction_roles WHERE guild_id = ? ORDER BY message_id, emoji",
+        (0,)
+    ),
+    'get_sub_roles': (
+        "SELECT * FROM sub_roles WHERE guild_id = ? ORDER BY role_name",
+        (0,)
+    )
+}
+
+class MigrationRunner:
+    """PRAGMA user_version でバージョンを管理し、未適用のマイグレーションを順に適用する"""
+
+    def __init__(self, migrations: Optional[List[Migration]] = None):
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+        self.logger = get_logger(__name__)
+
+    @property
+    def latest_version(self) -> int:
+        """最新のスキーマバージョン"""
+        return self.migrations[-1].version if self.migrations else 0
+
+    async def get_version(self, db: aiosqlite.Connection) -> int:
+        """現在のスキーマバージョンを取得"""
+        cursor = await db.execute("PRAGMA user_version")
+        row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def run(self, db: aiosqlite.Connection) -> int:
+        """未適用のマイグレーションを適用し、適用後のバージョンを返す"""
+        current = await self.get_version(db)
+
+        if current > self.latest_version:
+            raise RuntimeError(
+                f"データベースのスキーマバージョン ({current}) がBotの対応バージョン "
+                f"({self.latest_version}) より新しいです"
+            )
+
+        for migration in self.migrations:
+            if migration.version <= current:
+                continue
+
+            self.logger.info(f"マイグレーション {migration.version} を適用中: {migration.description}")
+            try:
+                # 各マイグレーションを1トランザクションで適用
+                await db.execute("BEGIN")
+                for statement in migration.statements:
+                    await db.execute(statement)
+                if migration.apply:
+                    await migration.apply(db)
+                await db.execute(f"PRAGMA user_version = {int(migration.version)}")
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                self.logger.error(f"マイグレーション {migration.version} の適用に失敗しました")
+                raise
+
+            current = migration.version
+
+        return current
+
+async def check_query_plans(db: aiosqlite.Connection, log_table: Optional[str] = None,
+                            queries: Optional[Dict[str, Tuple[str, tuple]]] = None) -> Dict[str, List[str]]:
+    """EXPLAIN QUERY PLAN で各クエリがインデックスを使うか確認し、問題のある計画を返す"""
+    problems: Dict[str, List[str]] = {}
+
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        if '{log_table}' in sql:
+            if log_table is None:
+                continue
+            sql = sql.format(log_table=log_table)
+
+        cursor = await db.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        rows = await cursor.fetchall()
+
+        bad_steps = []
+        for row in rows:
+            detail = row[-1]
+            # インデックスを使わない全件走査と、ソート用の一時B-Treeを検出
+            if detail.startswith("SCAN") and "INDEX" not in detail:
+                bad_steps.append(detail)
+            elif "USE TEMP B-TREE" in detail:
+                bad_steps.append(detail)
+
+        if bad_steps:
+            problems[name] = bad_steps
+
+    return problems
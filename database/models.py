@@ -79,6 +79,44 @@ class DatabaseSchema:
         )
     """
     
+    # メッセージ単位のリアクションロールのグループ（排他・上限・必須ロール）
+    REACTION_ROLE_GROUPS_TABLE = """
+        CREATE TABLE IF NOT EXISTS reaction_role_groups (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            exclusive INTEGER NOT NULL DEFAULT 0,
+            max_roles INTEGER NOT NULL DEFAULT 0,
+            required_role_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    
+    # ボタン・セレクトメニューのロールパネル
+    ROLE_PANELS_TABLE = """
+        CREATE TABLE IF NOT EXISTS role_panels (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            style TEXT NOT NULL,
+            title TEXT NOT NULL,
+            max_roles INTEGER NOT NULL DEFAULT 0,
+            required_role_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    
+    # ロールパネルの項目（表示順は position）
+    ROLE_PANEL_ITEMS_TABLE = """
+        CREATE TABLE IF NOT EXISTS role_panel_items (
+            message_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            emoji TEXT,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (message_id, role_id)
+        )
+    """
+    
     WELCOME_GATES_TABLE = """
         CREATE TABLE IF NOT EXISTS welcome_gates (
             guild_id INTEGER PRIMARY KEY,
@@ -106,6 +144,38 @@ class DatabaseSchema:
         )
     """
     
+    # 時間パーティション化したログイベントテーブル（{table} にテーブル名が入る）
+    LOG_EVENTS_COLUMNS = (
+        "id, guild_id, event_type, user_id, channel_id, message_id, "
+        "content, timestamp, additional_data"
+    )
+    
+    LOG_EVENTS_PARTITION_TABLE = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            user_id INTEGER,
+            channel_id INTEGER,
+            message_id INTEGER,
+            content TEXT,
+            timestamp TIMESTAMP NOT NULL,
+            additional_data TEXT
+        )
+    """
+    
+    LOG_EVENTS_PARTITION_INDEX = """
+        CREATE INDEX IF NOT EXISTS idx_{table}_guild_timestamp
+        ON {table} (guild_id, timestamp)
+    """
+    
+    # パーティションをまたいで一意なログイベントIDの採番
+    LOG_EVENT_SEQUENCE_TABLE = """
+        CREATE TABLE IF NOT EXISTS log_event_sequence (
+            last_id INTEGER NOT NULL
+        )
+    """
+    
     SUB_ROLES_TABLE = """
         CREATE TABLE IF NOT EXISTS sub_roles (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -126,6 +196,22 @@ class DatabaseSchema:
         )
     """
     
+    # クエリに合わせたインデックス
+    LOG_EVENTS_GUILD_TIMESTAMP_INDEX = """
+        CREATE INDEX IF NOT EXISTS idx_log_events_guild_timestamp
+        ON log_events (guild_id, timestamp)
+    """
+    
+    REACTION_ROLES_GUILD_INDEX = """
+        CREATE INDEX IF NOT EXISTS idx_reaction_roles_guild
+        ON reaction_roles (guild_id, message_id, emoji)
+    """
+    
+    SUB_ROLES_GUILD_NAME_INDEX = """
+        CREATE INDEX IF NOT EXISTS idx_sub_roles_guild_name
+        ON sub_roles (guild_id, role_name)
+    """
+    
     @classmethod
     def get_all_tables(cls) -> List[str]:
         """すべてのテーブル作成SQLを取得"""
@@ -135,4 +221,4 @@ class DatabaseSchema:
             cls.LOG_EVENTS_TABLE,
             cls.SUB_ROLES_TABLE,
             cls.SERVER_CONFIGS_TABLE
-        ]
\ No newline at end of file
+        ]
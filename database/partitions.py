@@ -0,0 +1,142 @@
+"""
+ログイベントの時間パーティション管理
+"""
+
+import aiosqlite
+from datetime import datetime, date, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from .models import DatabaseSchema
+
+# パーティションテーブル名の接頭辞（log_events_p20240101 / log_events_p2024w01）
+PARTITION_PREFIX = "log_events_p"
+
+# 対応するパーティションの粒度
+GRANULARITIES = ('day', 'week')
+
+# log_events に保存するタイムスタンプの形式（SQLiteの CURRENT_TIMESTAMP と同じ）
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def format_timestamp(value: datetime) -> str:
+    """datetimeを log_events のタイムスタンプ形式（UTC）に変換"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+def utc_now() -> datetime:
+    """現在時刻（UTC、タイムゾーン情報なし）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def partition_key(value: datetime, granularity: str = 'day') -> str:
+    """日時が属するパーティションのキーを取得"""
+    if granularity == 'week':
+        iso = value.isocalendar()
+        return f"{iso[0]:04d}w{iso[1]:02d}"
+    return value.strftime('%Y%m%d')
+
+def partition_table_name(key: str) -> str:
+    """パーティションキーからテーブル名を作成"""
+    return f"{PARTITION_PREFIX}{key}"
+
+def partition_bounds(table_name: str) -> Tuple[datetime, datetime]:
+    """パーティションが保持する期間 [開始, 終了) を取得"""
+    key = table_name[len(PARTITION_PREFIX):]
+
+    if 'w' in key:
+        year, week = key.split('w')
+        start = date.fromisocalendar(int(year), int(week), 1)
+        end = start + timedelta(days=7)
+    else:
+        start = datetime.strptime(key, '%Y%m%d').date()
+        end = start + timedelta(days=1)
+
+    return (
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end, datetime.min.time())
+    )
+
+async def list_partition_tables(db: aiosqlite.Connection) -> List[str]:
+    """既存のパーティションテーブルを古い順に取得"""
+    cursor = await db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+        (f"{PARTITION_PREFIX}[0-9]*",)
+    )
+    rows = await cursor.fetchall()
+    return sorted((row[0] for row in rows), key=partition_bounds)
+
+async def create_partition_table(db: aiosqlite.Connection, table_name: str):
+    """パーティションテーブルとインデックスを作成"""
+    await db.execute(DatabaseSchema.LOG_EVENTS_PARTITION_TABLE.format(table=table_name))
+    await db.execute(DatabaseSchema.LOG_EVENTS_PARTITION_INDEX.format(table=table_name))
+
+async def create_log_events_view(db: aiosqlite.Connection, tables: List[str]):
+    """全パーティションを束ねる log_events ビューを作り直す"""
+    await db.execute("DROP VIEW IF EXISTS log_events")
+
+    if tables:
+        body = "\nUNION ALL\n".join(
+            f"SELECT {DatabaseSchema.LOG_EVENTS_COLUMNS} FROM {table}" for table in tables
+        )
+    else:
+        # パーティションがない場合は同じ列を持つ空のビュー
+        columns = ", ".join(
+            f"NULL AS {column.strip()}" for column in DatabaseSchema.LOG_EVENTS_COLUMNS.split(",")
+        )
+        body = f"SELECT {columns} WHERE 0"
+
+    await db.execute(f"CREATE VIEW log_events AS {body}")
+
+class LogPartitionManager:
+    """パーティションの一覧を保持し、書き込み先の振り分けと削除を行う"""
+
+    def __init__(self, granularity: str = 'day'):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"未対応のパーティション粒度です: {granularity}")
+        self.granularity = granularity
+        self.tables: List[str] = []
+
+    async def load(self, db: aiosqlite.Connection):
+        """既存のパーティション一覧を読み込む"""
+        self.tables = await list_partition_tables(db)
+
+    def table_for(self, timestamp: str) -> str:
+        """タイムスタンプの書き込み先パーティション"""
+        value = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+        return partition_table_name(partition_key(value, self.granularity))
+
+    async def ensure(self, db: aiosqlite.Connection, table_name: str) -> bool:
+        """パーティションがなければ作成し、ビューを更新（作成した場合はTrue）"""
+        if table_name in self.tables:
+            return False
+
+        await create_partition_table(db, table_name)
+        self.tables = sorted(set(self.tables) | {table_name}, key=partition_bounds)
+        await create_log_events_view(db, self.tables)
+        return True
+
+    def expired_tables(self, cutoff: datetime) -> List[str]:
+        """期間全体が cutoff より前のパーティション"""
+        return [table for table in self.tables if partition_bounds(table)[1] <= cutoff]
+
+    def tables_between(self, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> List[str]:
+        """期間 [start, end) と重なるパーティション（古い順）"""
+        tables = []
+        for table in self.tables:
+            table_start, table_end = partition_bounds(table)
+            if start is not None and table_end <= start:
+                continue
+            if end is not None and table_start >= end:
+                continue
+            tables.append(table)
+        return tables
+
+    async def drop(self, db: aiosqlite.Connection, tables: List[str]):
+        """パーティションをまとめて削除し、ビューを更新"""
+        if not tables:
+            return
+
+        for table in tables:
+            await db.execute(f"DROP TABLE IF EXISTS {table}")
+        self.tables = [table for table in self.tables if table not in tables]
+        await create_log_events_view(db, self.tables)
@@ -0,0 +1,113 @@
+"""
+WALモードの接続プール
+"""
+
+import aiosqlite
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+from utils.logger import get_logger
+
+# プールモードで使用するPRAGMAの既定値
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,  # 負の値はKiB単位（約16MB）
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT'
+}
+
+# 文字列で指定可能なPRAGMAの値
+_PRAGMA_CHOICES = {
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'}
+}
+
+def build_pragma_profile(overrides: Optional[Dict[str, Any]] = None,
+                         defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """PRAGMA設定を検証し、既定値とマージしたプロファイルを作成"""
+    profile = dict(defaults or {})
+
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_PRAGMAS:
+            raise ValueError(f"未対応のPRAGMAです: {name}")
+
+        if isinstance(value, str):
+            value = value.upper()
+            if name not in _PRAGMA_CHOICES or value not in _PRAGMA_CHOICES[name]:
+                raise ValueError(f"PRAGMA '{name}' の値が不正です: {value}")
+        elif isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"PRAGMA '{name}' の値が不正です: {value}")
+
+        profile[name] = value
+
+    return profile
+
+async def apply_pragmas(db: aiosqlite.Connection, profile: Dict[str, Any]):
+    """接続にPRAGMAプロファイルを適用"""
+    # 値は build_pragma_profile で検証済みのためそのまま埋め込む
+    for name, value in profile.items():
+        await db.execute(f"PRAGMA {name} = {value}")
+
+class ConnectionPool:
+    """書き込み用接続1本と読み取り専用接続N本を管理するプール"""
+
+    def __init__(self, db_path: Path, readers: int = 4, pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = Path(db_path)
+        self.reader_count = max(1, readers)
+        self.pragmas = build_pragma_profile(pragmas, DEFAULT_PRAGMAS)
+        self.logger = get_logger(__name__)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+
+    @property
+    def writer(self) -> aiosqlite.Connection:
+        """書き込み用接続"""
+        if self._writer is None:
+            raise RuntimeError("接続プールが開かれていません")
+        return self._writer
+
+    async def open(self):
+        """接続を開く"""
+        # 書き込み用接続でWALモードに切り替えてから読み取り接続を開く
+        self._writer = await aiosqlite.connect(self.db_path)
+        self._writer.row_factory = aiosqlite.Row
+        await self._writer.execute("PRAGMA journal_mode = WAL")
+        await apply_pragmas(self._writer, self.pragmas)
+
+        self._idle_readers = asyncio.Queue()
+        uri = f"file:{self.db_path.resolve().as_posix()}?mode=ro"
+        for _ in range(self.reader_count):
+            reader = await aiosqlite.connect(uri, uri=True)
+            reader.row_factory = aiosqlite.Row
+            await apply_pragmas(reader, self.pragmas)
+            await reader.execute("PRAGMA query_only = ON")
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+
+        self.logger.info(f"接続プールを開きました (読み取り接続: {self.reader_count})")
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """空いている読み取り専用接続を借りる"""
+        if self._idle_readers is None:
+            raise RuntimeError("接続プールが開かれていません")
+
+        connection = await self._idle_readers.get()
+        try:
+            yield connection
+        finally:
+            self._idle_readers.put_nowait(connection)
+
+    async def close(self):
+        """すべての接続を閉じる"""
+        for reader in self._readers:
+            await reader.close()
+        self._readers.clear()
+        self._idle_readers = None
+
+        if self._writer:
+            await self._writer.close()
+            self._writer = None
@@ -0,0 +1,49 @@
+"""
+ログイベントの時間単位の集計（ロールアップ）
+"""
+
+import aiosqlite
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+# 時間・ギルド・イベント種別・チャンネルごとの件数（チャンネルのないイベントは 0）
+LOG_EVENT_HOURLY_TABLE = """
+CREATE TABLE IF NOT EXISTS log_event_hourly (
+    guild_id INTEGER NOT NULL,
+    hour TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    channel_id INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, hour, event_type, channel_id)
+) WITHOUT ROWID
+"""
+
+UPSERT_HOURLY_COUNT = """
+INSERT INTO log_event_hourly (guild_id, hour, event_type, channel_id, count)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (guild_id, hour, event_type, channel_id)
+DO UPDATE SET count = count + excluded.count
+"""
+
+def hour_bucket(timestamp: str) -> str:
+    """'YYYY-MM-DD HH:MM:SS' 形式のタイムスタンプをその時間の先頭に丸める"""
+    return timestamp[:13] + ":00:00"
+
+def aggregate_hourly(rows: Iterable[Tuple[int, str, int, str]]) -> List[Tuple[int, str, str, int, int]]:
+    """(guild_id, event_type, channel_id, timestamp) の行を時間ごとの件数にまとめる"""
+    counts: Counter = Counter(
+        (guild_id, hour_bucket(timestamp), event_type, channel_id or 0)
+        for guild_id, event_type, channel_id, timestamp in rows
+    )
+    return [key + (count,) for key, count in counts.items()]
+
+async def create_rollup_table(db: aiosqlite.Connection):
+    """集計テーブルを作成し、既存のログを取り込む"""
+    await db.execute(LOG_EVENT_HOURLY_TABLE)
+    await db.execute("""
+        INSERT INTO log_event_hourly (guild_id, hour, event_type, channel_id, count)
+        SELECT guild_id, substr(timestamp, 1, 13) || ':00:00', event_type,
+               COALESCE(channel_id, 0), COUNT(*)
+        FROM log_events
+        GROUP BY guild_id, substr(timestamp, 1, 13), event_type, COALESCE(channel_id, 0)
+    """)
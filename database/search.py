@@ -0,0 +1,47 @@
+"""
+ログ本文の全文検索（FTS5）
+"""
+
+import aiosqlite
+from typing import List, Optional, Tuple
+
+# trigramトークナイザーは3文字未満の語を検索できない
+MIN_TERM_LENGTH = 3
+
+# 全文検索インデックスに保存する列（content以外は検索対象外）
+FTS_COLUMNS = "content, guild_id UNINDEXED, event_type UNINDEXED, user_id UNINDEXED, channel_id UNINDEXED, timestamp UNINDEXED"
+
+async def create_fts_table(db: aiosqlite.Connection):
+    """全文検索用のFTS5テーブルを作成（日本語も部分一致できるtrigramを優先）"""
+    try:
+        await db.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS log_events_fts
+            USING fts5({FTS_COLUMNS}, tokenize = 'trigram')
+        """)
+    except aiosqlite.OperationalError:
+        # trigram非対応の古いSQLiteでは標準のトークナイザーを使う
+        await db.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS log_events_fts
+            USING fts5({FTS_COLUMNS})
+        """)
+
+def build_match_query(query: str) -> Tuple[Optional[str], List[str]]:
+    """ユーザー入力をFTS5のMATCH式と、インデックスで引けない短い語に分ける
+
+    各語はフレーズとして扱いAND検索する（FTS5の演算子は解釈させない）。
+    3文字以上の語がない場合、MATCH式はNoneになる。
+    """
+    terms = query.split()
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+
+    if not long_terms:
+        return None, short_terms
+
+    match = " ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+    return match, short_terms
+
+def like_pattern(term: str) -> str:
+    """部分一致用のLIKEパターン（ワイルドカードはエスケープする）"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
@@ -0,0 +1,29 @@
+"""
+メッセージ編集の差分表示のテスト
+"""
+
+import pytest
+
+from utils.text_diff import apply_diff, render_diff, word_diff
+
+@pytest.mark.parametrize("before, after, expected", [
+    ("hello world", "hello\nworld", "hello\nworld"),
+    ("see you tomorrow", "see you  tomorrow", "see you  tomorrow"),
+    ("line one\nline two", "line one\n\nline two changed", "line one\n\nline two **changed**"),
+    ("the cat sat", "the dog sat", "the ~~cat~~**dog** sat"),
+])
+def test_render_diff_keeps_whitespace_edits(before, after, expected):
+    assert render_diff(before, word_diff(before, after)) == expected
+
+@pytest.mark.parametrize("before, after", [
+    ("hello world", "hello\nworld"),
+    ("see you tomorrow", "see you  tomorrow"),
+    ("line one\nline two", "line one\n\nline two changed"),
+    ("今日は晴れ", "今日は雨"),
+])
+def test_apply_diff_restores_after(before, after):
+    assert apply_diff(before, word_diff(before, after)) == after
+
+def test_render_diff_marks_outside_whitespace():
+    rendered = render_diff("a b", word_diff("a b", "a b c"))
+    assert rendered == "a b **c**"
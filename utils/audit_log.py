@@ -0,0 +1,130 @@
+"""
+監査ログによるログイベントの実行者の補完
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import discord
+
+from utils.logger import get_logger
+
+@dataclass
+class AuditActor:
+    """イベントを実行したユーザー"""
+    user_id: int
+    name: str
+    reason: Optional[str] = None
+
+@dataclass
+class _GuildAuditState:
+    """ギルドごとの監査ログのキャッシュ"""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    fetched_at: Optional[datetime] = None
+    entries: Dict[int, discord.AuditLogEntry] = field(default_factory=dict)
+    # エントリが作成・更新されたのを確認した時刻（メッセージ削除は同じエントリの件数が増える）
+    observed_at: Dict[int, datetime] = field(default_factory=dict)
+    counts: Dict[int, int] = field(default_factory=dict)
+
+class AuditLogEnricher:
+    """監査ログをギルドごとに一定間隔でまとめて取得し、イベントに実行者を対応付ける
+
+    同じギルドのイベントは1回の取得結果を共有するため、イベント数が増えても
+    監査ログAPIの呼び出しは window 秒に1回までに抑えられる。
+    """
+
+    def __init__(self, window: float = 5.0, settle: float = 1.0, tolerance: float = 30.0,
+                 retention: float = 600.0, fetch_limit: int = 100):
+        self.window = timedelta(seconds=max(0.0, window))
+        # イベントの通知後、監査ログに反映されるまで待つ時間
+        self.settle = timedelta(seconds=max(0.0, settle))
+        # イベントと監査ログの時刻のずれの許容範囲
+        self.tolerance = timedelta(seconds=max(0.0, tolerance))
+        self.retention = timedelta(seconds=max(0.0, retention))
+        self.fetch_limit = fetch_limit
+        self.logger = get_logger(__name__)
+
+        self._guilds: Dict[int, _GuildAuditState] = {}
+        self.fetches = 0
+
+    async def find_actor(self, guild: discord.Guild, action: discord.AuditLogAction,
+                         target_id: int, channel_id: Optional[int] = None) -> Optional[AuditActor]:
+        """直前のイベントに対応する監査ログから実行者を探す"""
+        if not guild.me or not guild.me.guild_permissions.view_audit_log:
+            return None
+
+        when = discord.utils.utcnow()
+        state = self._guilds.setdefault(guild.id, _GuildAuditState())
+
+        async with state.lock:
+            # 他のイベントのために取得した結果で足りる場合は再取得しない
+            ready_at = when + self.settle
+            if state.fetched_at is None or state.fetched_at < ready_at:
+                fetch_at = ready_at
+                if state.fetched_at is not None:
+                    fetch_at = max(fetch_at, state.fetched_at + self.window)
+                delay = (fetch_at - discord.utils.utcnow()).total_seconds()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not await self._fetch(guild, state):
+                    return None
+
+        return self._match(state, action, target_id, channel_id, when)
+
+    async def _fetch(self, guild: discord.Guild, state: _GuildAuditState) -> bool:
+        """最新の監査ログを取得してキャッシュを更新"""
+        now = discord.utils.utcnow()
+        try:
+            async for entry in guild.audit_logs(limit=self.fetch_limit):
+                count = getattr(entry.extra, 'count', None) if entry.extra else None
+                if entry.id not in state.entries:
+                    # 初めて見るエントリは作成時刻で扱う（起動直後の古いエントリを誤って対応付けない）
+                    state.observed_at[entry.id] = entry.created_at
+                elif state.counts.get(entry.id) != count:
+                    state.observed_at[entry.id] = now
+                state.entries[entry.id] = entry
+                state.counts[entry.id] = count
+        except discord.HTTPException as e:
+            self.logger.error(f"監査ログ取得エラー (guild {guild.id}): {e}")
+            return False
+        finally:
+            state.fetched_at = now
+            self.fetches += 1
+
+        # 古いエントリを破棄
+        cutoff = now - self.retention
+        for entry_id in [entry_id for entry_id, seen in state.observed_at.items() if seen < cutoff]:
+            state.entries.pop(entry_id, None)
+            state.observed_at.pop(entry_id, None)
+            state.counts.pop(entry_id, None)
+        return True
+
+    def _match(self, state: _GuildAuditState, action: discord.AuditLogAction, target_id: int,
+               channel_id: Optional[int], when: datetime) -> Optional[AuditActor]:
+        """対象と時刻が一致する最新のエントリを探す"""
+        earliest = when - self.tolerance
+        best: Optional[discord.AuditLogEntry] = None
+
+        for entry in state.entries.values():
+            if entry.action != action or entry.user is None:
+                continue
+            if getattr(entry.target, 'id', None) != target_id:
+                continue
+            if channel_id is not None:
+                channel = getattr(entry.extra, 'channel', None) if entry.extra else None
+                if channel is not None and channel.id != channel_id:
+                    continue
+            if max(entry.created_at, state.observed_at.get(entry.id, entry.created_at)) < earliest:
+                continue
+            if best is None or entry.id > best.id:
+                best = entry
+
+        if best is None:
+            return None
+        return AuditActor(best.user.id, str(best.user), best.reason)
+
+    def evict(self, guild_id: int):
+        """ギルドのキャッシュを破棄"""
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,148 @@
+"""
+ログチャンネルへのEmbed配信キュー
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import discord
+
+from utils.logger import get_logger
+
+# 1メッセージに添付できるEmbedの最大数と合計文字数（Discordの制限）
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# キューの優先度（小さいほど先に送信）
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+class LogDeliveryQueue:
+    """チャンネルごとにEmbedをまとめて送信する配信キュー
+
+    送信待ちが10個未満の場合は window 秒待ち、その間に溜まったEmbedを最大10個ずつ
+    1メッセージにまとめて送る。優先イベントを先に送り、同じ優先度の中では
+    追加された順序を保つ。
+    """
+
+    def __init__(self, window: float = 1.0):
+        self.window = max(0.0, window)
+        self.logger = get_logger(__name__)
+
+        # チャンネルID -> (優先度, 連番, 追加時刻, Embed) のキュー
+        self._queues: Dict[int, asyncio.PriorityQueue] = {}
+        self._channels: Dict[int, discord.abc.Messageable] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._sequence = itertools.count()
+
+        # 配信状況のメトリクス
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.send_failures = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def enqueue(self, channel: discord.abc.Messageable, embed: discord.Embed, priority: bool = False):
+        """Embedを配信キューに追加"""
+        channel_id = channel.id
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = asyncio.PriorityQueue()
+
+        # チャンネル名の変更などに備えて最新のオブジェクトを使う
+        self._channels[channel_id] = channel
+        rank = PRIORITY_HIGH if priority else PRIORITY_NORMAL
+        queue.put_nowait((rank, next(self._sequence), time.monotonic(), embed))
+
+        worker = self._workers.get(channel_id)
+        if worker is None or worker.done():
+            self._workers[channel_id] = asyncio.create_task(self._worker(channel_id))
+
+    async def _worker(self, channel_id: int):
+        """チャンネルのキューを空になるまで送信する"""
+        queue = self._queues[channel_id]
+
+        while not queue.empty():
+            # 1メッセージ分に満たない場合は、まとめて送れるよう一定時間待つ
+            if self.window and queue.qsize() < MAX_EMBEDS_PER_MESSAGE:
+                await asyncio.sleep(self.window)
+
+            batch = self._take_batch(queue)
+            if not batch:
+                continue
+
+            await self._send(channel_id, batch)
+            for _ in batch:
+                queue.task_done()
+
+    def _take_batch(self, queue: asyncio.PriorityQueue) -> List[Tuple]:
+        """1メッセージに収まる分のEmbedを優先度・追加順に取り出す"""
+        batch = []
+        total_chars = 0
+
+        while len(batch) < MAX_EMBEDS_PER_MESSAGE and not queue.empty():
+            item = queue.get_nowait()
+            size = len(item[3])
+            if batch and total_chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                # 収まらない分は次のメッセージに回す（順序はキーで保たれる）
+                queue.put_nowait(item)
+                queue.task_done()
+                break
+            batch.append(item)
+            total_chars += size
+
+        return batch
+
+    async def _send(self, channel_id: int, batch: List[Tuple]):
+        """まとめたEmbedを1メッセージで送信"""
+        channel = self._channels.get(channel_id)
+        embeds = [item[3] for item in batch]
+
+        try:
+            await channel.send(embeds=embeds)
+            self.messages_sent += 1
+            self.embeds_sent += len(embeds)
+        except Exception as e:
+            self.send_failures += 1
+            self.logger.error(f"ログ配信エラー (channel {channel_id}, {len(embeds)}件): {e}")
+
+        # 最も古いEmbedが追加されてから送信完了までの遅延
+        lag = time.monotonic() - min(item[2] for item in batch)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+    @property
+    def queue_depth(self) -> int:
+        """送信待ちのEmbedの総数"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        """配信キューのメトリクス"""
+        return {
+            'queue_depth': self.queue_depth,
+            'channels': sum(1 for worker in self._workers.values() if not worker.done()),
+            'messages_sent': self.messages_sent,
+            'embeds_sent': self.embeds_sent,
+            'send_failures': self.send_failures,
+            'last_lag': round(self.last_lag, 3),
+            'max_lag': round(self.max_lag, 3)
+        }
+
+    async def flush(self, timeout: Optional[float] = None):
+        """送信待ちのEmbedがなくなるまで待つ"""
+        waiters = [queue.join() for queue in self._queues.values()]
+        if waiters:
+            await asyncio.wait_for(asyncio.gather(*waiters), timeout)
+
+    async def close(self, timeout: Optional[float] = 10.0):
+        """残りを送信してから配信タスクを停止"""
+        try:
+            await self.flush(timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"ログ配信の完了を待てませんでした（残り{self.queue_depth}件）")
+
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
@@ -0,0 +1,148 @@
+"""
+ログのエクスポート（圧縮したCSV/JSONLを上限サイズごとのファイルに分割）
+"""
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+import zlib
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional
+
+# エクスポートする列（log_events の列順）
+EXPORT_COLUMNS = [
+    'id', 'guild_id', 'event_type', 'user_id', 'channel_id',
+    'message_id', 'content', 'timestamp', 'additional_data'
+]
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+@dataclass
+class ExportPart:
+    """書き終えた1ファイル分"""
+    file: BinaryIO
+    filename: str
+    rows: int
+    size: int
+
+class LogExportWriter:
+    """ログを1行ずつ圧縮しながら一時ファイルに書き、上限サイズに達したら次のファイルに切り替える
+
+    一時ファイルは spool_size を超えるとディスクに移るため、出力全体の大きさに
+    関係なくメモリ使用量は一定に保たれる。
+    """
+
+    def __init__(self, fmt: str, max_bytes: int, basename: str = "logs",
+                 flush_every: int = 256 * 1024, spool_size: int = 1024 * 1024):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不明なエクスポート形式です: {fmt}")
+
+        self.fmt = fmt
+        self.basename = basename
+        # 圧縮器に溜まっている分を書き出す間隔（未圧縮のバイト数）
+        self.flush_every = max(1024, flush_every)
+        # 次の書き出しまでに flush_every と1行分増えても上限を超えないようにする
+        self.max_bytes = max_bytes - self.flush_every - 64 * 1024
+        if self.max_bytes <= 0:
+            raise ValueError("ファイルサイズの上限が小さすぎます")
+        self.spool_size = spool_size
+
+        self.parts_written = 0
+        self.rows_written = 0
+        self._spool: Optional[tempfile.SpooledTemporaryFile] = None
+        self._gzip: Optional[gzip.GzipFile] = None
+        self._rows = 0
+        self._unflushed = 0
+
+        self._line = io.StringIO()
+        self._csv = csv.writer(self._line)
+
+    @property
+    def extension(self) -> str:
+        return f"{self.fmt}.gz"
+
+    def _open_part(self):
+        """新しいファイルを開始"""
+        self._spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        self._gzip = gzip.GzipFile(fileobj=self._spool, mode='wb')
+        self._rows = 0
+        self._unflushed = 0
+        if self.fmt == 'csv':
+            self._gzip.write(self._encode_csv(EXPORT_COLUMNS))
+
+    def _encode_csv(self, values: List[Any]) -> bytes:
+        """1行分のCSVをバイト列にする"""
+        self._line.seek(0)
+        self._line.truncate()
+        self._csv.writerow(values)
+        return self._line.getvalue().encode('utf-8')
+
+    def _encode(self, row: Dict[str, Any]) -> bytes:
+        """ログイベント1件を出力形式のバイト列にする"""
+        if self.fmt == 'csv':
+            return self._encode_csv([row.get(column) for column in EXPORT_COLUMNS])
+
+        record = {column: row.get(column) for column in EXPORT_COLUMNS}
+        # 追加データは文字列ではなくJSONのまま出力する
+        if record['additional_data']:
+            try:
+                record['additional_data'] = json.loads(record['additional_data'])
+            except (TypeError, ValueError):
+                pass
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def write(self, row: Dict[str, Any]) -> Optional[ExportPart]:
+        """1件書き込み、上限に達して書き終えたファイルがあれば返す"""
+        if self._gzip is None:
+            self._open_part()
+
+        data = self._encode(row)
+        self._gzip.write(data)
+        self._rows += 1
+        self.rows_written += 1
+        self._unflushed += len(data)
+
+        if self._unflushed < self.flush_every:
+            return None
+
+        # 圧縮後のサイズを正確に知るため、圧縮器の内部バッファを書き出す
+        self._gzip.flush(zlib.Z_SYNC_FLUSH)
+        self._unflushed = 0
+        if self._spool.tell() < self.max_bytes:
+            return None
+        return self._close_part()
+
+    def finish(self) -> Optional[ExportPart]:
+        """最後のファイルを書き終えて返す（1件も書いていなければNone）"""
+        if self._gzip is None or self._rows == 0:
+            self.discard()
+            return None
+        return self._close_part()
+
+    def _close_part(self) -> ExportPart:
+        """現在のファイルを閉じ、先頭に戻して返す"""
+        self._gzip.close()
+        size = self._spool.tell()
+        self._spool.seek(0)
+        self.parts_written += 1
+
+        part = ExportPart(
+            file=self._spool,
+            filename=f"{self.basename}_part{self.parts_written}.{self.extension}",
+            rows=self._rows,
+            size=size
+        )
+        self._spool = None
+        self._gzip = None
+        return part
+
+    def discard(self):
+        """書きかけのファイルを破棄"""
+        if self._gzip is not None:
+            self._gzip.close()
+        if self._spool is not None:
+            self._spool.close()
+        self._spool = None
+        self._gzip = None
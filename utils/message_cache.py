@@ -0,0 +1,181 @@
+"""
+ログ用のメッセージ内容キャッシュ
+"""
+
+import sys
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import discord
+
+from utils.helpers import format_user
+
+# OrderedDictのエントリとスロットオブジェクト自体のおおよそのサイズ
+_ENTRY_OVERHEAD = 200
+
+class CachedMessage:
+    """削除・編集のログに必要な情報だけを保持したメッセージ"""
+
+    __slots__ = (
+        'message_id', 'guild_id', 'channel_id', 'author_id', 'author_name',
+        'attachments', '_content', '_compressed', 'size'
+    )
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, author_id: int,
+                 author_name: str, content: str, attachments: Tuple[str, ...] = (),
+                 compress_min_length: Optional[int] = None):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        # 同じ投稿者の名前は1つの文字列を共有する
+        self.author_name = sys.intern(author_name)
+        self.attachments = tuple(sys.intern(name) for name in attachments)
+        self._set_content(content, compress_min_length)
+
+    @classmethod
+    def from_message(cls, message: discord.Message,
+                     compress_min_length: Optional[int] = None) -> 'CachedMessage':
+        """discord.Message から必要な情報を取り出す"""
+        return cls(
+            message.id,
+            message.guild.id if message.guild else 0,
+            message.channel.id,
+            message.author.id,
+            format_user(message.author),
+            message.content or "",
+            tuple(att.filename for att in message.attachments),
+            compress_min_length
+        )
+
+    @classmethod
+    def restore(cls, message_id: int, guild_id: int, channel_id: int, author_id: int,
+                author_name: str, stored_content: Any, compressed: bool,
+                attachments: Tuple[str, ...] = ()) -> 'CachedMessage':
+        """stored_content で保存した形のまま復元（展開は読み出し時に行う）"""
+        entry = cls.__new__(cls)
+        entry.message_id = message_id
+        entry.guild_id = guild_id
+        entry.channel_id = channel_id
+        entry.author_id = author_id
+        entry.author_name = sys.intern(author_name)
+        entry.attachments = tuple(sys.intern(name) for name in attachments)
+        entry._content = stored_content
+        entry._compressed = bool(compressed)
+        entry._update_size()
+        return entry
+
+    def _set_content(self, content: str, compress_min_length: Optional[int]):
+        """本文を保存（一定以上の長さで縮む場合のみzlib圧縮）"""
+        self._compressed = False
+        self._content: Any = content
+
+        if compress_min_length is not None and len(content) >= compress_min_length:
+            encoded = content.encode('utf-8')
+            compressed = zlib.compress(encoded)
+            if len(compressed) < len(encoded):
+                self._content = compressed
+                self._compressed = True
+
+        self._update_size()
+
+    def _update_size(self):
+        """エントリのおおよそのメモリ使用量を計算"""
+        self.size = (
+            _ENTRY_OVERHEAD + sys.getsizeof(self._content)
+            + sys.getsizeof(self.attachments)
+            + sum(sys.getsizeof(name) for name in self.attachments)
+        )
+
+    @property
+    def stored_content(self) -> Tuple[Any, bool]:
+        """保存されている形の本文と圧縮の有無"""
+        return self._content, self._compressed
+
+    @property
+    def content(self) -> str:
+        """本文（圧縮されている場合は展開）"""
+        if self._compressed:
+            return zlib.decompress(self._content).decode('utf-8')
+        return self._content
+
+class MessageContentCache:
+    """メモリ使用量の上限付きLRUキャッシュ（message_id -> CachedMessage）
+
+    discord.py のメッセージキャッシュより軽い形でメッセージを保持し、
+    キャッシュ外のメッセージの削除・編集もログに残せるようにする。
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, compress: bool = True,
+                 compress_min_length: int = 256):
+        self.max_bytes = max(0, max_bytes)
+        self.compress_min_length = compress_min_length if compress else None
+        self._messages: "OrderedDict[int, CachedMessage]" = OrderedDict()
+        self.bytes_used = 0
+
+        # ヒット率の確認用
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put_message(self, message: discord.Message) -> Optional[CachedMessage]:
+        """discord.Message をキャッシュに追加"""
+        return self.put(CachedMessage.from_message(message, self.compress_min_length))
+
+    def put(self, entry: CachedMessage) -> Optional[CachedMessage]:
+        """エントリを追加し、上限を超えた分を古い順に破棄"""
+        if entry.size > self.max_bytes:
+            return None
+
+        self.pop(entry.message_id)
+        self._messages[entry.message_id] = entry
+        self.bytes_used += entry.size
+
+        while self.bytes_used > self.max_bytes:
+            _, evicted = self._messages.popitem(last=False)
+            self.bytes_used -= evicted.size
+            self.evictions += 1
+
+        return entry
+
+    def get(self, message_id: int) -> Optional[CachedMessage]:
+        """エントリを取得（最近使われたものとして扱う）"""
+        entry = self._messages.get(message_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._messages.move_to_end(message_id)
+        return entry
+
+    def pop(self, message_id: int) -> Optional[CachedMessage]:
+        """エントリを取り出して削除"""
+        entry = self._messages.pop(message_id, None)
+        if entry is not None:
+            self.bytes_used -= entry.size
+        return entry
+
+    def update_content(self, message_id: int, content: str) -> Optional[CachedMessage]:
+        """編集後の本文に置き換える"""
+        entry = self.pop(message_id)
+        if entry is None:
+            return None
+
+        entry._set_content(content, self.compress_min_length)
+        return self.put(entry)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュの使用状況"""
+        return {
+            'entries': len(self._messages),
+            'bytes_used': self.bytes_used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,136 @@
+"""
+メッセージIDからメッセージを探す
+"""
+
+import asyncio
+import re
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import discord
+
+from utils.logger import get_logger
+
+# https://discord.com/channels/<guild>/<channel>/<message>
+MESSAGE_LINK_PATTERN = re.compile(
+    r'https?://(?:(?:ptb|canary)\.)?discord(?:app)?\.com/channels/(?:\d+|@me)/(\d+)/(\d+)'
+)
+# <channel>:<message>（Discordの「IDをコピー」で得られる <channel>-<message> も受け付ける）
+CHANNEL_MESSAGE_PATTERN = re.compile(r'(\d+)[:-](\d+)')
+
+def parse_message_reference(text: str) -> Optional[Tuple[Optional[int], int]]:
+    """メッセージリンク・チャンネルID:メッセージID・メッセージIDを (チャンネルID, メッセージID) に変換"""
+    text = (text or "").strip()
+
+    match = MESSAGE_LINK_PATTERN.fullmatch(text) or CHANNEL_MESSAGE_PATTERN.fullmatch(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+
+    if text.isdigit():
+        return None, int(text)
+
+    return None
+
+class MessageLocator:
+    """メッセージを次の順で探す
+
+    1. 指定されたチャンネル
+    2. reaction_roles に保存されたチャンネル
+    3. 以前見つけたメッセージのチャンネル（LRU）
+    4. 全テキストチャンネルの並列検索（同時実行数を制限し、最初に見つかった時点で打ち切る）
+    """
+
+    def __init__(self, db, cache_size: int = 1024, concurrency: int = 8):
+        self.db = db
+        self.cache_size = max(1, cache_size)
+        self.concurrency = max(1, concurrency)
+        self.logger = get_logger(__name__)
+
+        # メッセージID -> チャンネルID
+        self._channels: "OrderedDict[int, int]" = OrderedDict()
+
+    def remember(self, message_id: int, channel_id: int):
+        """メッセージのチャンネルを記録"""
+        self._channels[message_id] = channel_id
+        self._channels.move_to_end(message_id)
+        while len(self._channels) > self.cache_size:
+            self._channels.popitem(last=False)
+
+    def forget(self, message_id: int):
+        """メッセージのチャンネルの記録を破棄"""
+        self._channels.pop(message_id, None)
+
+    async def locate(self, guild: discord.Guild, message_id: int,
+                     channel_id: Optional[int] = None) -> Optional[discord.Message]:
+        """メッセージを探し、見つからなければNoneを返す"""
+        tried = set()
+
+        message = await self._try_channel(guild, channel_id, message_id, tried)
+        if message is None:
+            stored = await self.db.get_reaction_role_channel(message_id)
+            message = await self._try_channel(guild, stored, message_id, tried)
+        if message is None:
+            message = await self._try_channel(guild, self._channels.get(message_id), message_id, tried)
+        if message is not None:
+            self.remember(message_id, message.channel.id)
+            return message
+
+        message = await self._search(guild, message_id, exclude=tried)
+        if message:
+            self.remember(message_id, message.channel.id)
+        else:
+            self.forget(message_id)
+        return message
+
+    async def _try_channel(self, guild: discord.Guild, channel_id: Optional[int],
+                           message_id: int, tried: set) -> Optional[discord.Message]:
+        """候補のチャンネルからメッセージを取得（試したチャンネルは tried に記録）"""
+        if channel_id is None or channel_id in tried:
+            return None
+        tried.add(channel_id)
+
+        channel = guild.get_channel_or_thread(channel_id)
+        if channel is None or not hasattr(channel, 'fetch_message'):
+            return None
+        return await self._fetch(channel, message_id)
+
+    async def _fetch(self, channel: discord.abc.Messageable, message_id: int) -> Optional[discord.Message]:
+        """チャンネルからメッセージを取得"""
+        try:
+            return await channel.fetch_message(message_id)
+        except (discord.NotFound, discord.Forbidden):
+            return None
+        except discord.HTTPException as e:
+            self.logger.warning(f"メッセージ取得エラー (channel {channel.id}): {e}")
+            return None
+
+    async def _search(self, guild: discord.Guild, message_id: int,
+                      exclude: set) -> Optional[discord.Message]:
+        """テキストチャンネルを並列に検索し、最初に見つかったメッセージを返す"""
+        channels = [
+            channel for channel in guild.text_channels
+            if channel.id not in exclude
+            # スノーフレークは作成時刻順のため、メッセージより後に作られたチャンネルは除外
+            and channel.id <= message_id
+            and channel.permissions_for(guild.me).read_message_history
+        ]
+        if not channels:
+            return None
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(channel: discord.TextChannel) -> Optional[discord.Message]:
+            async with semaphore:
+                return await self._fetch(channel, message_id)
+
+        tasks = [asyncio.create_task(probe(channel)) for channel in channels]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                message = await next_done
+                if message:
+                    return message
+            return None
+        finally:
+            # 見つかった時点で残りの検索を取り消す
+            for task in tasks:
+                task.cancel()
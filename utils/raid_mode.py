@@ -0,0 +1,120 @@
+"""
+参加の急増（レイド）の検知と集計
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+class SlidingWindowCounter:
+    """直近 window 秒間の件数を1秒単位のバケットで数える"""
+
+    def __init__(self, window: float = 10.0):
+        self.window = max(1.0, window)
+        self._buckets: Deque[Tuple[int, int]] = deque()
+        self._total = 0
+
+    def _expire(self, now: float):
+        """全体がウィンドウから外れたバケットを捨てる"""
+        cutoff = now - self.window
+        while self._buckets and self._buckets[0][0] + 1 <= cutoff:
+            _, count = self._buckets.popleft()
+            self._total -= count
+
+    def add(self, now: Optional[float] = None) -> int:
+        """1件記録し、ウィンドウ内の件数を返す"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1] = (second, self._buckets[-1][1] + 1)
+        else:
+            self._buckets.append((second, 1))
+        self._total += 1
+        return self._total
+
+    def count(self, now: Optional[float] = None) -> int:
+        """ウィンドウ内の件数"""
+        self._expire(time.monotonic() if now is None else now)
+        return self._total
+
+@dataclass
+class RaidJoin:
+    """レイド中に参加したメンバー"""
+    user_id: int
+    name: str
+    created_at: datetime
+    joined_at: datetime
+    new_account: bool
+
+@dataclass
+class RaidState:
+    """ギルドのレイドモードの状態"""
+    started_at: datetime
+    last_join: float = field(default_factory=time.monotonic)
+    pending: List[RaidJoin] = field(default_factory=list)
+    total: int = 0
+    total_new_accounts: int = 0
+
+    def add(self, join: RaidJoin):
+        """参加を記録（次の要約でまとめて書き出す）"""
+        self.pending.append(join)
+        self.total += 1
+        if join.new_account:
+            self.total_new_accounts += 1
+        self.last_join = time.monotonic()
+
+    def take_pending(self) -> List[RaidJoin]:
+        """まだ要約していない参加を取り出す"""
+        pending, self.pending = self.pending, []
+        return pending
+
+class RaidDetector:
+    """ギルドごとの参加数を数え、しきい値を超えたらレイドモードにする"""
+
+    def __init__(self, threshold: int = 10, window: float = 10.0, quiet: float = 60.0):
+        self.threshold = max(1, threshold)
+        self.window = window
+        # この秒数参加がなく、参加数がしきい値を下回ったらレイドモードを終了
+        self.quiet = quiet
+        self._counters: Dict[int, SlidingWindowCounter] = {}
+        self.raids: Dict[int, RaidState] = {}
+
+    def record_join(self, guild_id: int) -> Tuple[Optional[RaidState], bool]:
+        """参加を数え、(レイド状態, 今回レイドモードに入ったか) を返す"""
+        counter = self._counters.get(guild_id)
+        if counter is None:
+            counter = self._counters[guild_id] = SlidingWindowCounter(self.window)
+        count = counter.add()
+
+        state = self.raids.get(guild_id)
+        if state is not None:
+            return state, False
+
+        if count >= self.threshold:
+            state = self.raids[guild_id] = RaidState(started_at=datetime.now())
+            return state, True
+
+        return None, False
+
+    def should_end(self, guild_id: int) -> bool:
+        """レイドモードを終了できるか"""
+        state = self.raids.get(guild_id)
+        if state is None:
+            return False
+
+        counter = self._counters.get(guild_id)
+        quiet_for = time.monotonic() - state.last_join
+        return quiet_for >= self.quiet and (counter is None or counter.count() < self.threshold)
+
+    def end(self, guild_id: int) -> Optional[RaidState]:
+        """レイドモードを終了"""
+        return self.raids.pop(guild_id, None)
+
+    def evict(self, guild_id: int):
+        """ギルドの状態を破棄"""
+        self._counters.pop(guild_id, None)
+        self.raids.pop(guild_id, None)
@@ -0,0 +1,120 @@
+"""
+不要になったリアクションのバックグラウンド削除
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import discord
+
+from utils.logger import get_logger
+
+@dataclass(frozen=True)
+class StaleReaction:
+    """外すリアクションと、それに対応するロール"""
+    guild_id: int
+    channel_id: int
+    message_id: int
+    emoji: str
+    user_id: int
+    role_id: int
+
+class ReactionCleanupQueue:
+    """外すべきリアクションを集め、一定間隔でまとめて順に削除する
+
+    batch_window 秒の間に集まった分を1つのバッチとして、重複を除いてから
+    interval 秒ずつ間隔を空けて削除する。削除の直前に is_stale で確認し、
+    その間にロールを選び直していた場合は削除しない。
+    """
+
+    def __init__(self, bot, is_stale: Callable[[StaleReaction], bool],
+                 batch_window: float = 2.0, interval: float = 0.3):
+        self.bot = bot
+        self.is_stale = is_stale
+        self.batch_window = max(0.0, batch_window)
+        self.interval = max(0.0, interval)
+        self.logger = get_logger(__name__)
+
+        # 挿入順を保った重複のないキュー
+        self._queue: Dict[StaleReaction, None] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+        # メトリクス
+        self.removed = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def enqueue(self, item: StaleReaction):
+        """リアクションを削除待ちに追加"""
+        self._queue[item] = None
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        """処理を停止（削除待ちは破棄する）"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._queue.clear()
+
+    def _take_batch(self) -> List[StaleReaction]:
+        """削除待ちをすべて取り出す"""
+        batch = list(self._queue)
+        self._queue.clear()
+        self._wakeup.clear()
+        return batch
+
+    async def _run(self):
+        """削除待ちをバッチごとに処理"""
+        while True:
+            await self._wakeup.wait()
+            # 続けて届く分をまとめてから処理する
+            await asyncio.sleep(self.batch_window)
+            batch = self._take_batch()
+
+            # 同じメッセージへの削除は続けて行う
+            batch.sort(key=lambda item: (item.channel_id, item.message_id))
+            for item in batch:
+                await self._remove(item)
+
+            if not self._queue:
+                return
+
+    async def _remove(self, item: StaleReaction):
+        """リアクションを1件削除"""
+        if not self.is_stale(item):
+            self.skipped += 1
+            return
+
+        channel = self.bot.get_channel(item.channel_id)
+        if channel is None or not hasattr(channel, 'get_partial_message'):
+            self.skipped += 1
+            return
+
+        message = channel.get_partial_message(item.message_id)
+        try:
+            await message.remove_reaction(item.emoji, discord.Object(id=item.user_id))
+            self.removed += 1
+        except discord.NotFound:
+            self.skipped += 1
+        except discord.HTTPException as e:
+            self.failures += 1
+            if e.status == 429:
+                # ライブラリの再試行でも解消しなかった場合は後で再試行
+                retry_after = getattr(e, 'retry_after', None) or 5.0
+                self.logger.warning(f"リアクション削除がレート制限されました。{retry_after}秒後に再試行します")
+                self._queue[item] = None
+                self._wakeup.set()
+                await asyncio.sleep(retry_after)
+                return
+            self.logger.error(f"リアクション削除エラー (message {item.message_id}): {e}")
+
+        # 同じチャンネルのリアクション削除はレート制限を共有するため間隔を空ける
+        await asyncio.sleep(self.interval)
@@ -0,0 +1,249 @@
+"""
+リアクションロールとロールの付与状況の同期
+"""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import discord
+
+from database.cache import ReactionRoleGroup
+from utils.logger import get_logger
+from utils.role_coalescer import RoleChangeCoalescer
+
+@dataclass
+class ReconcileResult:
+    """同期の結果"""
+    messages: int = 0
+    missing_messages: int = 0
+    members_changed: int = 0
+    roles_added: int = 0
+    roles_removed: int = 0
+    failures: int = 0
+
+    def merge(self, other: 'ReconcileResult'):
+        """別の結果を合算"""
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+class ReactionRoleReconciler:
+    """保存済みのリアクションロールについて、リアクションした人とロールを持つ人の差分だけを適用する
+
+    リアクションしたユーザーはページ単位でまとめて取得し、ロールのメンバーとの差は
+    集合演算で求める。メンバーごとの変更は1回の member.edit にまとめ、interval 秒ずつ
+    間隔を空けて順に適用する。同時に処理するギルドの数は guild_concurrency までに抑える。
+    """
+
+    def __init__(self, bot, role_changes: RoleChangeCoalescer, guild_concurrency: int = 2,
+                 interval: float = 0.5, remove_unreacted: bool = False):
+        self.bot = bot
+        self.role_changes = role_changes
+        self.interval = max(0.0, interval)
+        # リアクションしていないメンバーからロールを外すか（既定は付与のみ）
+        self.remove_unreacted = remove_unreacted
+        self.logger = get_logger(__name__)
+
+        self._guild_semaphore = asyncio.Semaphore(max(1, guild_concurrency))
+        self._running: Dict[int, asyncio.Task] = {}
+        # 同期中にリアクションを操作したメンバー（取得済みの状態が古いため変更しない）
+        self._touched: Dict[int, Set[int]] = {}
+
+    def touch(self, guild_id: int, user_id: int):
+        """同期中のギルドでメンバーがリアクションを操作したことを記録"""
+        touched = self._touched.get(guild_id)
+        if touched is not None:
+            touched.add(user_id)
+
+    def is_running(self, guild_id: int) -> bool:
+        """ギルドの同期が実行中か"""
+        task = self._running.get(guild_id)
+        return task is not None and not task.done()
+
+    async def reconcile_all(self) -> ReconcileResult:
+        """全ギルドを同期"""
+        total = ReconcileResult()
+        results = await asyncio.gather(
+            *(self.reconcile_guild(guild) for guild in self.bot.guilds),
+            return_exceptions=True
+        )
+        for guild, result in zip(self.bot.guilds, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"リアクションロール同期エラー ({guild.name}): {result}")
+                continue
+            total.merge(result)
+        return total
+
+    async def reconcile_guild(self, guild: discord.Guild) -> ReconcileResult:
+        """ギルドを同期（実行中ならその完了を待つ）"""
+        task = self._running.get(guild.id)
+        if task is None or task.done():
+            task = self._running[guild.id] = asyncio.create_task(self._reconcile_guild(guild))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done() and self._running.get(guild.id) is task:
+                del self._running[guild.id]
+
+    async def _reconcile_guild(self, guild: discord.Guild) -> ReconcileResult:
+        """ギルドの全リアクションロールの差分を求めて適用"""
+        entries = await self.bot.db.get_all_reaction_roles(guild.id)
+        if not entries:
+            return ReconcileResult()
+
+        async with self._guild_semaphore:
+            self._touched[guild.id] = set()
+            try:
+                return await self._reconcile_entries(guild, entries)
+            finally:
+                del self._touched[guild.id]
+
+    async def _reconcile_entries(self, guild: discord.Guild, entries: List[dict]) -> ReconcileResult:
+        """リアクションとロールの付与状況の差分を求めて適用"""
+        result = ReconcileResult()
+        # ロールのメンバーを正しく得るためにメンバー一覧を揃える
+        if not guild.chunked:
+            await guild.chunk()
+
+        messages: Dict[int, List[dict]] = defaultdict(list)
+        for entry in entries:
+            messages[entry['message_id']].append(entry)
+
+        # ロールID -> リアクションしているユーザー（同じロールの全メッセージ分、
+        # リアクションが1つもないロールは空集合）
+        reactors: Dict[int, Set[int]] = defaultdict(set)
+        changes: Dict[int, Dict[int, bool]] = defaultdict(dict)
+        # 外す対象にしないロール（リアクションの取得に失敗したロールと、
+        # ロールパネルなどリアクション以外でも付与されるロール）
+        protected: Set[int] = set()
+        if self.remove_unreacted:
+            protected |= await self._managed_elsewhere(guild)
+
+        for message_id, message_entries in messages.items():
+            users = await self._fetch_reactors(guild, message_entries)
+            if users is None:
+                result.missing_messages += 1
+                protected.update(entry['role_id'] for entry in message_entries)
+                continue
+            result.messages += 1
+
+            group = self.bot.db.reaction_role_index.get_group(message_id)
+            for role_id, user_ids in self._apply_group(guild, group, users).items():
+                reactors[role_id] |= user_ids
+
+        for role_id, user_ids in reactors.items():
+            role = guild.get_role(role_id)
+            if role is None:
+                continue
+            holders = {member.id for member in role.members}
+
+            for user_id in user_ids - holders:
+                changes[user_id][role_id] = True
+            if self.remove_unreacted and role_id not in protected:
+                for user_id in holders - user_ids:
+                    changes[user_id][role_id] = False
+
+        await self._apply_changes(guild, changes, result)
+
+        self.logger.info(
+            f"リアクションロール同期 ({guild.name}): メッセージ{result.messages}件, "
+            f"付与{result.roles_added}件, 解除{result.roles_removed}件, "
+            f"メンバー{result.members_changed}人"
+        )
+        return result
+
+    async def _managed_elsewhere(self, guild: discord.Guild) -> Set[int]:
+        """ロールパネル・ウェルカムゲートなど、リアクション以外でも付与されるロール"""
+        role_ids: Set[int] = set()
+        for panel in self.bot.db.role_panel_index:
+            if panel.guild_id == guild.id:
+                role_ids |= panel.role_ids
+
+        gate = await self.bot.db.get_welcome_gate(guild.id)
+        if gate:
+            role_ids.update((gate['initial_role_id'], gate['final_role_id']))
+        return role_ids
+
+    async def _fetch_reactors(self, guild: discord.Guild,
+                              entries: List[dict]) -> Optional[Dict[int, Set[int]]]:
+        """メッセージの各リアクションロールについて、リアクションしたメンバーをページ単位で取得"""
+        channel = guild.get_channel_or_thread(entries[0]['channel_id'])
+        if channel is None:
+            return None
+
+        try:
+            message = await channel.fetch_message(entries[0]['message_id'])
+        except (discord.NotFound, discord.Forbidden):
+            return None
+
+        role_by_emoji = {entry['emoji']: entry['role_id'] for entry in entries}
+        users: Dict[int, Set[int]] = {role_id: set() for role_id in role_by_emoji.values()}
+
+        for reaction in message.reactions:
+            role_id = role_by_emoji.get(str(reaction.emoji))
+            if role_id is None:
+                continue
+            # users() は100件ずつのページで取得する
+            async for user in reaction.users(limit=None):
+                if not user.bot:
+                    users[role_id].add(user.id)
+
+        return users
+
+    def _apply_group(self, guild: discord.Guild, group: Optional[ReactionRoleGroup],
+                     users: Dict[int, Set[int]]) -> Dict[int, Set[int]]:
+        """グループのルールに合わないリアクションを付与の対象から除く"""
+        if group is None:
+            return users
+
+        filtered = {role_id: set(user_ids) for role_id, user_ids in users.items()}
+
+        if group.required_role_id:
+            required = guild.get_role(group.required_role_id)
+            allowed = {member.id for member in required.members} if required else set()
+            for user_ids in filtered.values():
+                user_ids &= allowed
+
+        limit = group.limit
+        if limit:
+            counts: Dict[int, int] = defaultdict(int)
+            for user_ids in filtered.values():
+                for user_id in user_ids:
+                    counts[user_id] += 1
+            # 上限を超えてリアクションしているメンバーはどれを選んだか分からないため、
+            # 現在の付与状況をそのまま残す
+            over = {user_id for user_id, count in counts.items() if count > limit}
+            for role_id, user_ids in filtered.items():
+                role = guild.get_role(role_id)
+                holders = {member.id for member in role.members} if role else set()
+                filtered[role_id] = (user_ids - over) | (over & holders)
+
+        return filtered
+
+    async def _apply_changes(self, guild: discord.Guild, changes: Dict[int, Dict[int, bool]],
+                             result: ReconcileResult):
+        """メンバーごとの変更を間隔を空けて順に適用"""
+        touched = self._touched.get(guild.id, set())
+        for user_id, member_changes in changes.items():
+            member = guild.get_member(user_id)
+            if member is None or member.bot or user_id in touched:
+                continue
+
+            # 権限の範囲外のロールは変更しない
+            member_changes = {
+                role_id: add for role_id, add in member_changes.items()
+                if (role := guild.get_role(role_id)) and role.is_assignable()
+            }
+            if not member_changes:
+                continue
+
+            applied = await self.role_changes.apply(member, member_changes, reason="リアクションロールの同期")
+
+            if applied is None:
+                result.failures += 1
+            elif applied:
+                result.members_changed += 1
+                result.roles_added += sum(1 for add in member_changes.values() if add)
+                result.roles_removed += sum(1 for add in member_changes.values() if not add)
+                await asyncio.sleep(self.interval)
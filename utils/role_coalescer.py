@@ -0,0 +1,201 @@
+"""
+メンバーごとのロール変更のまとめ適用
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+from utils.logger import get_logger
+
+@dataclass
+class PendingRoleChange:
+    """適用待ちのロール変更"""
+    guild: discord.Guild
+    member_id: int
+    # ロールID -> 付与するか（同じロールへの変更は後のものが優先され、順序も保つ）
+    changes: "OrderedDict[int, bool]" = field(default_factory=OrderedDict)
+    requests: int = 0
+    first_at: float = field(default_factory=time.monotonic)
+    last_at: float = field(default_factory=time.monotonic)
+    task: Optional[asyncio.Task] = None
+    # 監査ログに残す理由（省略時は既定の理由）
+    reason: Optional[str] = None
+
+class RoleChangeCoalescer:
+    """短時間に届いたロールの付与・解除をメンバーごとにまとめ、1回の member.edit で適用する
+
+    最後の変更から window 秒経つか、最初の変更から max_delay 秒経った時点で適用する。
+    同じメンバーへの適用は順番に行い、前回の適用結果を基準に次の変更を計算する。
+    """
+
+    def __init__(self, window: float = 1.5, max_delay: float = 5.0, reason: str = "リアクションロール"):
+        self.window = max(0.0, window)
+        self.max_delay = max(self.window, max_delay)
+        self.reason = reason
+        self.logger = get_logger(__name__)
+
+        self._pending: Dict[Tuple[int, int], PendingRoleChange] = {}
+        self._locks: Dict[Tuple[int, int], asyncio.Lock] = {}
+        # ロックを使用中・待機中の適用の数（0になったらロックを破棄）
+        self._lock_users: Dict[Tuple[int, int], int] = {}
+        # 直前の適用でAPIが返したロール（ゲートウェイのキャッシュ更新が遅れても巻き戻さない）
+        self._applied: Dict[Tuple[int, int], Tuple[float, Set[int]]] = {}
+        # 適用中（ロック待ち・APIの応答待ち）の変更
+        self._in_flight: Dict[Tuple[int, int], List[PendingRoleChange]] = {}
+
+        # メトリクス
+        self.requested = 0
+        self.api_calls = 0
+        self.failures = 0
+
+    @property
+    def saved_calls(self) -> int:
+        """まとめたことで省略できたAPI呼び出しの回数"""
+        return self.requested - self.api_calls - self.failures
+
+    def metrics(self) -> Dict[str, int]:
+        """まとめ適用の状況"""
+        return {
+            'requested': self.requested,
+            'api_calls': self.api_calls,
+            'saved_calls': self.saved_calls,
+            'failures': self.failures,
+            'pending_members': len(self._pending)
+        }
+
+    def _base_role_ids(self, key: Tuple[int, int], member: discord.Member) -> Set[int]:
+        """変更を重ねる基準のロール（直前の適用結果があればそちらを優先）"""
+        applied = self._applied.get(key)
+        if applied and time.monotonic() - applied[0] < self.max_delay:
+            return set(applied[1])
+        return {role.id for role in member.roles if not role.is_default()}
+
+    def effective_role_ids(self, member: discord.Member) -> Set[int]:
+        """適用中・適用待ちの変更を反映した後のメンバーのロール"""
+        key = (member.guild.id, member.id)
+        roles = self._base_role_ids(key, member)
+        batches = list(self._in_flight.get(key, ()))
+        if key in self._pending:
+            batches.append(self._pending[key])
+        for pending in batches:
+            for role_id, add in pending.changes.items():
+                if add:
+                    roles.add(role_id)
+                else:
+                    roles.discard(role_id)
+        return roles
+
+    def request(self, member: discord.Member, role: discord.abc.Snowflake, add: bool):
+        """ロールの付与（add=True）または解除を予約"""
+        key = (member.guild.id, member.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = PendingRoleChange(member.guild, member.id)
+
+        pending.changes.pop(role.id, None)
+        pending.changes[role.id] = add
+        pending.requests += 1
+        pending.last_at = time.monotonic()
+        self.requested += 1
+
+        if pending.task is None:
+            pending.task = asyncio.create_task(self._apply_later(key, pending))
+
+    async def _apply_later(self, key: Tuple[int, int], pending: PendingRoleChange):
+        """変更が落ち着くまで待ってから適用"""
+        while True:
+            deadline = min(pending.last_at + self.window, pending.first_at + self.max_delay)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        await self._apply(key, pending)
+
+    async def apply(self, member: discord.Member, changes: Dict[int, bool],
+                    reason: Optional[str] = None) -> Optional[bool]:
+        """ロールID -> 付与するか の変更を待たずに1回の member.edit で適用
+
+        変更した場合はTrue、変更が不要だった場合はFalse、失敗した場合はNoneを返す。
+        """
+        pending = PendingRoleChange(member.guild, member.id, OrderedDict(changes),
+                                    requests=len(changes), reason=reason)
+        self.requested += len(changes)
+        return await self._apply((member.guild.id, member.id), pending)
+
+    async def flush(self):
+        """適用待ちの変更をすべて今すぐ適用"""
+        for key, pending in list(self._pending.items()):
+            if pending.task:
+                pending.task.cancel()
+            await self._apply(key, pending)
+
+    async def _apply(self, key: Tuple[int, int], pending: PendingRoleChange) -> Optional[bool]:
+        """まとめた変更を1回の member.edit で適用（変更したか、失敗した場合はNone）"""
+        # 適用中に届いた変更は次のまとまりとして扱う
+        if self._pending.get(key) is pending:
+            del self._pending[key]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        self._in_flight.setdefault(key, []).append(pending)
+        try:
+            async with lock:
+                member = pending.guild.get_member(pending.member_id)
+                if member is None:
+                    return False
+
+                current = self._base_role_ids(key, member)
+                desired = set(current)
+                for role_id, add in pending.changes.items():
+                    if add:
+                        desired.add(role_id)
+                    else:
+                        desired.discard(role_id)
+
+                if desired == current:
+                    return False
+
+                roles = [discord.Object(id=role_id) for role_id in desired]
+                try:
+                    edited = await member.edit(roles=roles, reason=pending.reason or self.reason)
+                except discord.HTTPException as e:
+                    self.failures += 1
+                    self.logger.error(f"ロール変更の適用エラー ({member}): {e}")
+                    return None
+
+                self.api_calls += 1
+                if edited is not None:
+                    self._applied[key] = (
+                        time.monotonic(), {role.id for role in edited.roles if not role.is_default()}
+                    )
+                else:
+                    self._applied[key] = (time.monotonic(), desired)
+
+                added = len(desired - current)
+                removed = len(current - desired)
+                self.logger.info(
+                    f"ロール変更をまとめて適用: {member} (+{added} -{removed}, "
+                    f"{pending.requests}件の変更を1回で適用)"
+                )
+                return True
+        finally:
+            self._in_flight[key].remove(pending)
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            self._lock_users[key] -= 1
+            if self._lock_users[key] == 0:
+                del self._lock_users[key]
+                del self._locks[key]
+                self._prune_applied()
+
+    def _prune_applied(self):
+        """古い適用結果を破棄"""
+        cutoff = time.monotonic() - self.max_delay
+        for key in [key for key, (applied_at, _) in self._applied.items() if applied_at < cutoff]:
+            del self._applied[key]
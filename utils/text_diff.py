@@ -0,0 +1,95 @@
+"""
+メッセージ編集の単語単位の差分
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import List, Union
+
+# 単語・空白・記号に分割（結合すると元の文字列に戻る）
+# 空白で区切られない日本語（かな・漢字・全角文字）は1文字ずつ扱う
+_TOKEN_PATTERN = re.compile(r'\s+|[^\W\u3040-\u30ff\u3400-\u9fff\uff00-\uffef]+|\S')
+
+# 差分の1操作: ["=", 保持するトークン数] / ["-", 削除するトークン数] / ["+", 挿入する文字列]
+DiffOp = List[Union[str, int]]
+
+def tokenize(text: str) -> List[str]:
+    """テキストを単語単位のトークンに分割"""
+    return _TOKEN_PATTERN.findall(text or "")
+
+def word_diff(before: str, after: str) -> List[DiffOp]:
+    """編集前から編集後への差分を、保持・削除はトークン数だけで表す形で作成"""
+    before_tokens = tokenize(before)
+    after_tokens = tokenize(after)
+    matcher = SequenceMatcher(None, before_tokens, after_tokens, autojunk=False)
+
+    ops: List[DiffOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(["=", i2 - i1])
+            continue
+        if tag in ('replace', 'delete'):
+            ops.append(["-", i2 - i1])
+        if tag in ('replace', 'insert'):
+            ops.append(["+", "".join(after_tokens[j1:j2])])
+    return ops
+
+def apply_diff(before: str, ops: List[DiffOp]) -> str:
+    """差分を適用して編集後のテキストを復元"""
+    tokens = tokenize(before)
+    position = 0
+    result = []
+
+    for op, value in ops:
+        if op == "=":
+            result.extend(tokens[position:position + value])
+            position += value
+        elif op == "-":
+            position += value
+        elif op == "+":
+            result.append(value)
+
+    return "".join(result)
+
+def inserted_text(ops: List[DiffOp]) -> str:
+    """差分で追加された部分だけを取り出す"""
+    return " ".join(value.strip() for op, value in ops if op == "+" and value.strip())
+
+def render_diff(before: str, ops: List[DiffOp], context: int = 8) -> str:
+    """差分をDiscord向けに表示（削除は取り消し線、追加は太字、変更のない長い部分は省略）"""
+    tokens = tokenize(before)
+    position = 0
+    parts = []
+
+    for index, (op, value) in enumerate(ops):
+        if op == "=":
+            kept = tokens[position:position + value]
+            position += value
+            # 変更箇所の前後だけを残す
+            head = kept[:context] if index > 0 else []
+            tail = kept[-context:] if index < len(ops) - 1 else []
+            if len(kept) > len(head) + len(tail):
+                parts.append(_escape("".join(head)) + "…" + _escape("".join(tail)))
+            else:
+                parts.append(_escape("".join(kept)))
+        elif op == "-":
+            removed = "".join(tokens[position:position + value])
+            position += value
+            # 空白だけの削除は編集後の文に残らないため表示しない
+            if removed.strip():
+                parts.append(_mark(removed, "~~"))
+        elif op == "+":
+            # 空白・改行だけの追加は装飾せずそのまま表示（単語がつながらないように）
+            parts.append(_mark(value, "**") if value.strip() else _escape(value))
+
+    return "".join(parts)
+
+def _mark(text: str, marker: str) -> str:
+    """前後の空白を装飾の外に出して装飾（Markdownは空白で始まる装飾を認識しない）"""
+    core = text.strip()
+    start = text.index(core)
+    return f"{_escape(text[:start])}{marker}{_escape(core)}{marker}{_escape(text[start + len(core):])}"
+
+def _escape(text: str) -> str:
+    """差分の装飾と衝突するMarkdown記号をエスケープ"""
+    return re.sub(r'([*_~`|\\])', r'\\\1', text)